@@ -0,0 +1,245 @@
+import argparse
+import copy
+import json
+import sys
+import numpy as np
+from pathlib import Path
+from scripts.numpy_model import ARCHITECTURE_PATH, MODEL_DIR, WEIGHTS_PATH, WEIGHT_NAMES, NumpyModel
+
+KERAS_MODEL_PATH = MODEL_DIR / "model.h5"
+
+# Inputs and Keras outputs the NumPy runtime is checked against
+REFERENCE_PATH = MODEL_DIR / "model_reference.npz"
+
+# Largest acceptable difference between Keras and NumPy probabilities
+PARITY_TOLERANCE = 1e-4
+
+REFERENCE_RANDOM_IMAGES = 16
+
+# Committed parity fixture: a few images and the Keras logits of model.json
+# with pinned_weights, so --check-fixture needs neither TensorFlow nor the
+# trained model. Regenerate it after changing model.json with
+#   pip install tensorflow-cpu==2.18.0 keras==3.6.0
+#   python ExportNumpyModel.py --export-fixture
+FIXTURE_PATH = MODEL_DIR / "parity_fixture.npz"
+
+# Largest acceptable difference between Keras and NumPy logits, relative to the largest logit
+FIXTURE_TOLERANCE = 1e-4
+
+FIXTURE_SIZE = 128
+
+
+def _weight_names(layer):
+    class_name = type(layer).__name__
+    if class_name == "BatchNormalization":
+        config = layer.get_config()
+        return (["gamma"] if config.get("scale", True) else []) + \
+               (["beta"] if config.get("center", True) else []) + ["moving_mean", "moving_variance"]
+    return WEIGHT_NAMES.get(class_name, [])
+
+
+def _walk(layer):
+    for child in getattr(layer, "layers", []):
+        yield child
+        yield from _walk(child)
+
+
+def _named_weights(model):
+    """
+    Yield ("<layer name>/<weight name>", array) for every weight of the model.
+    """
+    for layer in _walk(model):
+        if getattr(layer, "layers", None):
+            continue  # A nested model; its layers are walked themselves
+        values = layer.get_weights()
+        names = _weight_names(layer)
+        if values and len(values) > len(names):
+            raise ValueError(f"Don't know how to name the weights of {type(layer).__name__} '{layer.name}'")
+        for name, value in zip(names, values):
+            yield f"{layer.name}/{name}", value
+
+
+def export_weights(model, weights_path=WEIGHTS_PATH):
+    """
+    Write every layer's weights as "<layer name>/<weight name>" arrays.
+    """
+    arrays = {key: value.astype(np.float32) for key, value in _named_weights(model)}
+    np.savez(weights_path, **arrays)
+    print(f"Wrote {len(arrays)} arrays to {weights_path}")
+
+
+def reference_inputs():
+    """
+    The sample photo shipped with the repo plus seeded random images.
+    """
+    from scripts.model_utils import preprocess_image
+    inputs = []
+    sample = Path(__file__).resolve().parent / "test.jpeg"
+    if sample.exists():
+        inputs.append(preprocess_image(sample.read_bytes())[0].copy())
+    rng = np.random.default_rng(0)
+    inputs.extend(rng.random((REFERENCE_RANDOM_IMAGES, 128, 128, 3), dtype=np.float32))
+    return np.stack(inputs)
+
+
+def export(keras_model_path=KERAS_MODEL_PATH):
+    """
+    Export the Keras model's weights and reference outputs (needs TensorFlow).
+    """
+    import tensorflow as tf
+    model = tf.keras.models.load_model(keras_model_path)
+    export_weights(model)
+
+    inputs = reference_inputs()
+    outputs = np.asarray(model.predict(inputs, verbose=0), dtype=np.float32)
+    np.savez(REFERENCE_PATH, inputs=inputs, outputs=outputs)
+    print(f"Wrote {len(inputs)} reference predictions to {REFERENCE_PATH}")
+
+
+def check(tolerance=PARITY_TOLERANCE):
+    """
+    Compare the NumPy runtime with the stored Keras reference outputs.
+    :return: True if every probability is within tolerance and every top-1 class agrees.
+    """
+    with np.load(REFERENCE_PATH) as reference:
+        inputs, expected = reference["inputs"], reference["outputs"]
+
+    model = NumpyModel.load()
+    actual = model.predict_on_batch(inputs)
+
+    max_difference = float(np.abs(actual - expected).max())
+    top1 = actual.argmax(axis=1) == expected.argmax(axis=1)
+    print(f"{len(inputs)} images: max |difference| {max_difference:.2e} (tolerance {tolerance:.0e}), "
+          f"top-1 agreement {top1.sum()}/{len(top1)}")
+    return max_difference <= tolerance and bool(top1.all())
+
+
+def logits_architecture(architecture):
+    """
+    Copy of a model.json architecture whose last layer outputs logits, so a
+    comparison is not flattened by saturated probabilities.
+    """
+    architecture = copy.deepcopy(architecture)
+    architecture["config"]["layers"][-1]["config"]["activation"] = "linear"
+    return architecture
+
+
+def _hashed_uniform(count, stream):
+    # splitmix64 of (stream, position) in exact uint64 arithmetic: values in
+    # [-1, 1) that are the same on every platform and NumPy version
+    with np.errstate(over="ignore"):
+        z = np.arange(count, dtype=np.uint64) + np.uint64(stream << 32) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -52 - 1.0
+
+
+def pinned_weights(shapes):
+    """
+    Deterministic weights for {"<layer name>/<weight name>": shape}, hashed
+    from their position rather than drawn from a random generator so that
+    Keras and the check rebuild exactly the same values. Kernels are scaled
+    by their fan-in and batch norm statistics stay near identity, which keeps
+    activations in range through the whole network.
+    """
+    weights = {}
+    for index, key in enumerate(sorted(shapes)):
+        shape = tuple(shapes[key])
+        noise = _hashed_uniform(int(np.prod(shape)), index).reshape(shape)
+        kind = key.rsplit("/", 1)[1]
+        if kind == "moving_variance":
+            value = 1.0 + 0.5 * noise ** 2
+        elif kind == "gamma":
+            value = 1.0 + 0.1 * noise
+        elif kind in ("kernel", "depthwise_kernel"):
+            fan_in = np.prod(shape[:2] if kind == "depthwise_kernel" else shape[:-1])
+            value = noise * np.sqrt(6.0 / fan_in)
+        else:  # beta, moving_mean, bias
+            value = 0.05 * noise
+        weights[key] = value.astype(np.float32)
+    return weights
+
+
+def fixture_images():
+    """
+    The sample photo shipped with the repo plus two synthetic patterns, as uint8.
+    """
+    from PIL import Image
+    images = []
+    sample = Path(__file__).resolve().parent / "test.jpeg"
+    if sample.exists():
+        with Image.open(sample) as image:
+            images.append(np.asarray(image.convert("RGB").resize((FIXTURE_SIZE, FIXTURE_SIZE))))
+    y, x = np.mgrid[0:FIXTURE_SIZE, 0:FIXTURE_SIZE] / FIXTURE_SIZE
+    images.append(np.stack([x, y, (x + y) / 2], axis=-1) * 255)
+    images.append(np.stack([np.sin(12 * x) * np.cos(9 * y), np.sin(20 * x * y), np.cos(7 * y)], axis=-1) * 127 + 128)
+    return np.stack(images).round().astype(np.uint8)
+
+
+def export_fixture(fixture_path=FIXTURE_PATH):
+    """
+    Write the parity fixture from Keras (needs TensorFlow, not the trained model).
+    """
+    import keras
+    with open(ARCHITECTURE_PATH, "r", encoding="utf-8") as f:
+        model = keras.models.model_from_json(json.dumps(logits_architecture(json.load(f))))
+    shapes = {key: list(value.shape) for key, value in _named_weights(model)}
+    weights = pinned_weights(shapes)
+    for layer in _walk(model):
+        if layer.get_weights() and not getattr(layer, "layers", None):
+            layer.set_weights([weights[f"{layer.name}/{name}"]
+                               for name in _weight_names(layer)[:len(layer.get_weights())]])
+
+    images = fixture_images()
+    logits = np.asarray(model.predict(images.astype(np.float32) / 255, verbose=0), dtype=np.float32)
+    np.savez_compressed(fixture_path, images=images, logits=logits, shapes=json.dumps(shapes, sort_keys=True))
+    print(f"Wrote {len(images)} reference logits to {fixture_path}")
+
+
+def check_fixture(tolerance=FIXTURE_TOLERANCE, fixture_path=FIXTURE_PATH):
+    """
+    Compare the NumPy runtime with the committed Keras logits, using the
+    pinned weights instead of the trained ones.
+    :return: True if every logit is within tolerance and every top-1 class agrees.
+    """
+    with np.load(fixture_path) as fixture:
+        images, expected = fixture["images"], fixture["logits"]
+        shapes = json.loads(str(fixture["shapes"]))
+    with open(ARCHITECTURE_PATH, "r", encoding="utf-8") as f:
+        model = NumpyModel(logits_architecture(json.load(f)), pinned_weights(shapes))
+    actual = model.predict_on_batch(images.astype(np.float32) / 255)
+
+    difference = float(np.abs(actual - expected).max() / np.abs(expected).max())
+    top1 = actual.argmax(axis=1) == expected.argmax(axis=1)
+    print(f"{len(images)} fixture images: max relative |difference| {difference:.2e} (tolerance {tolerance:.0e}), "
+          f"top-1 agreement {top1.sum()}/{len(top1)}")
+    return difference <= tolerance and bool(top1.all())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the ingredient classifier for the TensorFlow-free NumPy runtime."
+    )
+    parser.add_argument("--export", action="store_true",
+                        help=f"Export weights and reference outputs from {KERAS_MODEL_PATH.name} (needs TensorFlow)")
+    parser.add_argument("--check", action="store_true",
+                        help="Check the NumPy runtime against the reference outputs")
+    parser.add_argument("--tolerance", type=float, default=PARITY_TOLERANCE)
+    parser.add_argument("--export-fixture", action="store_true",
+                        help=f"Write {FIXTURE_PATH.name} from Keras with pinned weights (needs TensorFlow)")
+    parser.add_argument("--check-fixture", action="store_true",
+                        help=f"Check the NumPy runtime against {FIXTURE_PATH.name}; needs no TensorFlow "
+                             "or trained weights, so it can run in CI")
+    args = parser.parse_args()
+
+    if not (args.export or args.check or args.export_fixture or args.check_fixture):
+        parser.error("nothing to do, pass --export, --check, --export-fixture and/or --check-fixture")
+    if args.export:
+        export()
+    if args.export_fixture:
+        export_fixture()
+    if args.check and not check(args.tolerance):
+        sys.exit(1)
+    if args.check_fixture and not check_fixture():
+        sys.exit(1)
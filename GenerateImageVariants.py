@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PIL import Image
+from scripts.image_variants import (
+    CACHE_DIR, FORMATS, IMAGE_DIR, MANIFEST_PATH, PREGENERATED_DIR, VARIANT_SIZES,
+    encode_image, fit_image, variant_key, variant_name, write_atomically
+)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# The manifest is rewritten after this many images, so an interrupted run
+# resumes close to where it stopped
+CHECKPOINT_EVERY = 500
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Load the manifest of a previous (possibly interrupted) run.
+    :return: Dictionary filename -> entry; empty if there is none.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("images", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(images, path=MANIFEST_PATH):
+    data = {
+        "sizes": [f"{width}x{height}" for width, height in VARIANT_SIZES],
+        "formats": list(FORMATS),
+        "images": images,
+    }
+    write_atomically(Path(path), json.dumps(data, sort_keys=True).encode("utf-8"))
+
+
+def _describe(path, data):
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+    return {
+        "path": path.relative_to(CACHE_DIR).as_posix(),
+        "width": width,
+        "height": height,
+        "bytes": len(data),
+        "sha1": hashlib.sha1(data).hexdigest(),
+    }
+
+
+def generate_image_variants(task):
+    """
+    Produce every configured variant of one image (runs in a worker process).
+    A variant is skipped when the previous manifest lists it for the same
+    source size and mtime and its file is still there. Files written by an
+    interrupted run that never reached the manifest are picked up, not redone.
+    :param task: (filename, previous manifest entry or None, force).
+    :return: (filename, manifest entry or None, generated, skipped, error).
+    """
+    filename, previous, force = task
+    source = IMAGE_DIR / filename
+    try:
+        stat = source.stat()
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "variants": {}}
+        unchanged = (
+            previous is not None
+            and previous.get("size") == stat.st_size
+            and previous.get("mtime_ns") == stat.st_mtime_ns
+        )
+
+        generated = skipped = 0
+        for size in VARIANT_SIZES:
+            image = None  # Decoded once per size, shared by all formats
+            for image_format, (_, _, extension, _) in FORMATS.items():
+                name = variant_name(size, image_format)
+                key = variant_key(filename, size, image_format, stat)
+                path = PREGENERATED_DIR / key[:2] / f"{key}.{extension}"
+
+                known = previous["variants"].get(name) if unchanged else None
+                if not force and path.is_file():
+                    if known is None or known["bytes"] != path.stat().st_size:
+                        known = _describe(path, path.read_bytes())
+                    entry["variants"][name] = known
+                    skipped += 1
+                    continue
+
+                if image is None:
+                    image = fit_image(source, size)
+                data = encode_image(image, image_format)
+                write_atomically(path, data)
+                entry["variants"][name] = _describe(path, data)
+                generated += 1
+        return filename, entry, generated, skipped, None
+    except Exception as e:
+        return filename, None, 0, 0, str(e)
+
+
+def remove_unreferenced(images):
+    """
+    Delete pregenerated files no manifest entry points at any more
+    (variants of replaced or deleted images).
+    :return: Number of files removed.
+    """
+    referenced = {
+        variant["path"] for entry in images.values() for variant in entry["variants"].values()
+    }
+    removed = 0
+    for path in PREGENERATED_DIR.glob("*/*"):
+        if path.relative_to(CACHE_DIR).as_posix() not in referenced:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))  # Respects CPU pinning in containers
+    return os.cpu_count() or 1
+
+
+def generate_all_image_variants(workers=None, force=False):
+    """
+    Generate all configured size/format variants of every image in the
+    image directory in parallel, and write the manifest used by the image route.
+
+    :param workers: Worker processes (default: one per available core).
+    :param force: Regenerate variants even if they are up to date.
+    """
+    workers = workers or available_cores()
+
+    image_files = sorted(
+        f for f in os.listdir(IMAGE_DIR) if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    previous = load_manifest()
+    images = {}
+    tasks = [(filename, previous.get(filename), force) for filename in image_files]
+
+    generated = skipped = 0
+    failures = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(generate_image_variants, tasks, chunksize=16)
+        for done, (filename, entry, made, kept, error) in enumerate(results, start=1):
+            if error is not None:
+                failures.append((filename, error))
+                if filename in previous:
+                    # Keep serving the variants of the last good run; the image
+                    # route ignores them once the source no longer matches
+                    images[filename] = previous[filename]
+            else:
+                images[filename] = entry
+            generated += made
+            skipped += kept
+
+            if done % CHECKPOINT_EVERY == 0:
+                # Keep entries not reached yet so a restart can still skip them
+                save_manifest({**previous, **images})
+                elapsed = time.perf_counter() - started
+                print(f"{done}/{len(tasks)} images, {generated} generated, {skipped} up to date "
+                      f"({done / elapsed:.0f} images/s)")
+
+    save_manifest(images)
+    removed = remove_unreferenced(images)
+
+    elapsed = time.perf_counter() - started
+    for filename, error in failures:
+        print(f"Failed to process '{filename}': {error}")
+    print(f"Processed {len(tasks)} images with {workers} workers in {elapsed:.1f}s: "
+          f"{generated} variants generated, {skipped} up to date, {removed} stale removed, "
+          f"{len(failures)} images failed.")
+    print(f"Manifest written to {MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate resized/WebP variants of recipe images.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="Regenerate variants that are up to date")
+    args = parser.parse_args()
+
+    generate_all_image_variants(workers=args.workers, force=args.force)
@@ -1,66 +1,231 @@
+import argparse
+import json
 import os
-from scripts.data_storage import get_db_connection
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scripts.data_storage import get_db_connection, DB_PATH
 from fuzzywuzzy import fuzz
 
-def update_all_recipe_images(image_directory):
+IMAGE_URL_PREFIX = "https://backend-nwyn.onrender.com"
+
+# Minimum fuzz.ratio for a title/image pair to count as a match
+MATCH_THRESHOLD = 55
+
+# Images scored per title: those whose character trigrams overlap it most
+SHORTLIST_SIZE = 50
+
+# Titles handed to a worker process at a time
+CHUNK_SIZE = 256
+
+# Images and titles seen by the last run, for --incremental
+STATE_PATH = DB_PATH.with_name("image_match_state.json")
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def clean_title(title):
+    return title.lower().replace(" ", "-")  # Replace spaces with dashes in the title
+
+
+def image_key(image_file):
+    return os.path.splitext(image_file)[0].lower()  # Remove extension for comparison
+
+
+def trigrams(text):
+    """
+    Character trigrams of a name, ignoring punctuation and dashes.
+    """
+    text = f" {_NON_ALNUM.sub(' ', text).strip()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ImageMatcher:
+    """
+    Finds the image whose name best matches a recipe title.
+    Instead of scoring every image, a title is only scored against a
+    shortlist of images with the most similar character trigrams, found
+    through an inverted trigram index.
+    """
+
+    def __init__(self, image_files, shortlist_size=SHORTLIST_SIZE, threshold=MATCH_THRESHOLD):
+        self.image_files = image_files
+        self.image_names = [image_key(image_file) for image_file in image_files]
+        self.shortlist_size = shortlist_size
+        self.threshold = threshold
+
+        postings = {}
+        self.gram_counts = np.zeros(len(image_files), dtype=np.float64)
+        for image_id, name in enumerate(self.image_names):
+            grams = trigrams(name)
+            self.gram_counts[image_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(image_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def shortlist(self, title_clean):
+        """
+        Ids of the images whose trigram sets are most similar (Dice
+        coefficient) to a title's, in directory order so that ties resolve
+        like a full scan would.
+        """
+        grams = trigrams(title_clean)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.image_files))
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > self.shortlist_size:
+            similarity = shared[candidates] / (len(grams) + self.gram_counts[candidates])
+            top = np.argpartition(similarity, -self.shortlist_size)[-self.shortlist_size:]
+            candidates = np.sort(candidates[top])
+        return candidates
+
+    def best_match(self, title):
+        """
+        :return: (image_file, score) of the best match, or (None, 0).
+        """
+        title_clean = clean_title(title)
+
+        best_match = None
+        best_score = 0
+        for image_id in self.shortlist(title_clean):
+            score = fuzz.ratio(title_clean, self.image_names[image_id])
+            if score > best_score and score >= self.threshold:  # Set a threshold for match
+                best_score = score
+                best_match = self.image_files[image_id]
+        return best_match, best_score
+
+
+_matcher = None
+
+
+def _init_worker(image_files, shortlist_size):
+    global _matcher
+    _matcher = ImageMatcher(image_files, shortlist_size)
+
+
+def _match_titles(titles):
+    return [(title, *_matcher.best_match(title)) for title in titles]
+
+
+def match_titles(titles, image_files, workers=None, shortlist_size=SHORTLIST_SIZE):
+    """
+    Match titles to images across a pool of worker processes, each holding
+    its own copy of the trigram index.
+    :return: List of (title, image_file or None, score), in the order of titles.
+    """
+    chunks = [titles[i:i + CHUNK_SIZE] for i in range(0, len(titles), CHUNK_SIZE)]
+    if not chunks or not image_files:
+        return [(title, None, 0) for title in titles]
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(image_files, shortlist_size)
+    ) as executor:
+        return [match for matches in executor.map(_match_titles, chunks) for match in matches]
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return set(state["images"]), set(state["titles"])
+    except (OSError, ValueError, KeyError):
+        return set(), set()
+
+
+def save_state(images, titles, path=STATE_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"images": sorted(images), "titles": sorted(titles)}, f)
+
+
+def update_all_recipe_images(image_directory, incremental=False, dry_run=False, workers=None,
+                             shortlist_size=SHORTLIST_SIZE):
     """
     Update the "image" field in the "recipes" table for all rows using
     images in the specified directory.
 
+    Only recipes without an image are considered (others are never
+    overwritten). With incremental=True, recipes that were already tried by a
+    previous run are only scored against images added since then.
+
     :param image_directory: Directory containing recipe images.
+    :param incremental: Skip work a previous run has already done.
+    :param dry_run: Report matches and scores without updating the database.
+    :param workers: Worker processes (default: one per core).
+    :param shortlist_size: Images scored per title.
     """
+    started = time.perf_counter()
+
     # Get list of image files in the directory
-    image_files = [f for f in os.listdir(image_directory) 
+    image_files = [f for f in os.listdir(image_directory)
                    if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
 
     # Replace spaces with dashes in image file names
-    image_files = [f.replace(" ", "-") for f in image_files]
+    image_files = sorted(f.replace(" ", "-") for f in image_files)
 
     # Establish database connection
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Fetch all recipe titles from the database
-    cursor.execute("SELECT title FROM recipes")
-    recipes = cursor.fetchall()
+    # Fetch the titles of recipes that still need an image
+    cursor.execute("SELECT DISTINCT title FROM recipes WHERE image IS NULL AND title IS NOT NULL")
+    titles = [title for (title,) in cursor.fetchall()]
 
-    for recipe in recipes:
-        (title,) = recipe
-        title_clean = title.lower().replace(" ", "-")  # Replace spaces with dashes in the title
+    if incremental:
+        seen_images, tried_titles = load_state()
+        new_images = [f for f in image_files if f not in seen_images]
+        new_titles = [title for title in titles if title not in tried_titles]
+        retried = [title for title in titles if title in tried_titles]
+        matches = match_titles(new_titles, image_files, workers, shortlist_size)
+        matches += match_titles(retried, new_images, workers, shortlist_size)
+        print(f"Incremental run: {len(new_titles)} new recipes against {len(image_files)} images, "
+              f"{len(retried)} earlier recipes against {len(new_images)} new images.")
+    else:
+        matches = match_titles(titles, image_files, workers, shortlist_size)
 
-        best_match = None
-        best_score = 0
+    updates = [
+        (f"{IMAGE_URL_PREFIX}/{image_directory}/{best_match}", title)
+        for title, best_match, _ in matches if best_match
+    ]
 
-        for image_file in image_files:
-            # Remove extension for comparison
-            image_name = os.path.splitext(image_file)[0].lower()
+    for title, best_match, best_score in matches:
+        if best_match:
+            print(f"{best_score:3d}  '{title}' -> '{best_match}'")
 
-            # Calculate similarity score
-            score = fuzz.ratio(title_clean, image_name)
+    if dry_run:
+        print("Dry run: the database was not changed.")
+    else:
+        # Update the database with all matched image paths in one transaction
+        cursor.executemany(
+            "UPDATE recipes SET image = ? WHERE title = ? AND image IS NULL",
+            updates
+        )
+        conn.commit()
+        save_state(image_files, titles)
+    conn.close()
 
-            if score > best_score and score >= 55:  # Set a threshold for match
-                best_score = score
-                best_match = image_file
+    elapsed = time.perf_counter() - started
+    print(f"Image update process completed in {elapsed:.1f}s: {len(matches)} recipes scored, "
+          f"{len(updates)} matched, {len(matches) - len(updates)} without a match.")
 
-        if best_match:
-            # Construct the image path
-            image_path = f"https://backend-nwyn.onrender.com/{image_directory}/{best_match}"
-
-            # Update the database with the matched image path
-            cursor.execute(
-                "UPDATE recipes SET image = ? WHERE title = ? AND image IS NULL",
-                (image_path, title)
-            )
-            print(f"Updated recipe '{title}' with image '{image_path}'")
-
-    # Commit changes and close the connection
-    conn.commit()
-    conn.close()
-    print("Image update process completed.")
 
 if __name__ == "__main__":
-    # Define the image directory (adjust the path as needed)
-    image_dir = "image"
+    parser = argparse.ArgumentParser(description="Match recipe titles to image files.")
+    parser.add_argument("--image-dir", default="image", help="Directory containing recipe images")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only score new recipes and images added since the last run")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Print matches and scores without updating the database")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--shortlist", type=int, default=SHORTLIST_SIZE, help="Images scored per title")
+    args = parser.parse_args()
 
     # Run the image update script
-    update_all_recipe_images(image_dir)
+    update_all_recipe_images(
+        args.image_dir,
+        incremental=args.incremental,
+        dry_run=args.dry_run,
+        workers=args.workers,
+        shortlist_size=args.shortlist
+    )
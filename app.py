@@ -1,29 +1,67 @@
 import os
 from flask import Flask
-from flask import Flask, send_from_directory
+from flask import Flask, abort, jsonify, request, send_file, send_from_directory
 from routes.user_routes import user_blueprint
 from routes.recipe_routes import recipe_blueprint
 from routes.meal_plan_routes import meal_plan_blueprint
 from routes.recipe_details_routes import recipe_details_blueprint
 from routes.daily_recommendation_routes import daily_recommendations_blueprint 
-## from routes.image_classification_routes import image_classification_blueprint
+from routes.image_classification_routes import image_classification_blueprint
 from routes.user_auth import auth_blueprint
+from routes.metrics_routes import metrics_blueprint
+from scripts import http_middleware, metrics
+from scripts.json_provider import FastJSONProvider
+from scripts.image_variants import InvalidVariant, get_image_variant
 
 app = Flask(__name__)
 
+# orjson-backed JSON encoding (json module fallback), aware of pre-rendered fragments
+app.json = FastJSONProvider(app)
+
+# Per-request latency, SQL, serialization and error accounting, exposed at /metrics.
+# Installed first so that responses answered early by later hooks are counted too.
+metrics.init_app(app)
+
+# ETags, conditional GETs and response compression for every blueprint
+http_middleware.init_app(app)
+
 # Register Blueprints
 app.register_blueprint(user_blueprint, url_prefix="/user")
 app.register_blueprint(recipe_blueprint, url_prefix="/recipes")
 app.register_blueprint(meal_plan_blueprint, url_prefix="/meal_plan")
 app.register_blueprint(recipe_details_blueprint, url_prefix="/recipe_details")
 app.register_blueprint(daily_recommendations_blueprint, url_prefix="/daily-recommendations")  # Changed from underscore to hyphen
-# app.register_blueprint(image_classification_blueprint, url_prefix="/image")
+app.register_blueprint(image_classification_blueprint, url_prefix="/image")
 app.register_blueprint(auth_blueprint, url_prefix="/auth")
+app.register_blueprint(metrics_blueprint, url_prefix="/metrics")
 
 @app.route('/image/<path:filename>')
 def serve_image(filename):
     return send_from_directory('image', filename)
 
+# Variant URLs are not content-addressed, so clients keep them only briefly
+# and then revalidate with the content-hash ETag (a 304 when unchanged)
+VARIANT_MAX_AGE = 3600
+
+@app.route('/image/<int:width>x<int:height>/<path:filename>')
+def serve_image_variant(width, height, filename):
+    """
+    Serve a resized copy of an image, e.g. /image/320x320/<filename>?format=webp
+    """
+    try:
+        path, etag, mimetype = get_image_variant(filename, (width, height), request.args.get("format"))
+        response = send_file(path, mimetype=mimetype, etag=etag, max_age=VARIANT_MAX_AGE, conditional=True)
+    except InvalidVariant as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError:
+        abort(404)
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+    response.cache_control.public = True
+    return response
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,323 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+import bcrypt
+import numpy as np
+
+# Run as "python benchmarks/generate_dataset.py" only this directory is on
+# sys.path; the repository root is needed for scripts/
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from scripts.recipe_flags import FLAG_COLUMNS, MEAL_TYPES
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "NutriDish.bench.db")
+
+IMAGE_URL_PREFIX = "https://backend-nwyn.onrender.com/image"
+
+# Password of every generated user (hashed once, with a cheap work factor)
+USER_PASSWORD = "benchmark"
+
+# Registration date of every generated user; later updates keep it, which
+# tells generated users apart from accounts registered by benchmark runs
+DATE_REGISTERED = "2024-01-01 12:00:00"
+
+# Rows generated and inserted per batch
+BATCH_SIZE = 10000
+
+# Share of recipes with each flag set, roughly as in the Epicurious data the
+# real catalog comes from. Dependencies between flags are applied afterwards.
+FLAG_RATES = {
+    "is_breakfast": 0.08, "is_lunch": 0.14, "is_dinner": 0.30, "is_snack": 0.07, "is_dessert": 0.17,
+    "is_vegetarian": 0.34, "is_vegan": 0.09, "is_pescatarian": 0.30, "is_paleo": 0.14,
+    "is_dairy_free": 0.28, "is_fat_free": 0.05, "is_peanut_free": 0.41, "is_soy_free": 0.40,
+    "is_wheat_free": 0.31, "is_low_carb": 0.12, "is_low_cal": 0.15, "is_low_fat": 0.08,
+    "is_low_sodium": 0.12, "is_low_sugar": 0.07, "is_low_cholesterol": 0.11,
+    "is_winter": 0.16, "is_spring": 0.15, "is_summer": 0.23, "is_fall": 0.21,
+    "has_pork": 0.06, "has_alcohol": 0.11, "has_beef": 0.05, "has_bread": 0.07, "has_butter": 0.12,
+    "has_cabbage": 0.02, "has_carrot": 0.08, "has_cheese": 0.12, "has_chicken": 0.10, "has_egg": 0.12,
+    "has_eggplant": 0.01, "has_fish": 0.05, "has_onion": 0.24, "has_pasta": 0.05, "has_peanut": 0.02,
+    "has_potato": 0.06, "has_rice": 0.05, "has_shrimp": 0.03, "has_tofu": 0.01, "has_tomato": 0.17,
+    "has_zucchini": 0.02,
+}
+
+MEAT = ["has_pork", "has_beef", "has_chicken"]
+SEAFOOD = ["has_fish", "has_shrimp"]
+ANIMAL = MEAT + SEAFOOD + ["has_butter", "has_cheese", "has_egg"]
+
+WORDS = (
+    "roasted grilled spicy sweet sour braised crispy creamy smoky tangy classic rustic quick summer "
+    "winter lemon garlic ginger herb honey maple chili coconut basil mint chicken salmon tomato "
+    "potato rice pasta salad soup stew tart cake bread curry tacos risotto gratin frittata skewers "
+    "chutney slaw pilaf noodles dumplings pie crumble sauce glaze with and of in"
+).split()
+
+UNITS = ["cup", "cups", "tablespoon", "tablespoons", "teaspoon", "pound", "ounces", "large", "medium", "pinch of"]
+
+CATEGORIES = [
+    "Bake", "Quick & Easy", "Dinner", "Lunch", "Side", "Vegetarian", "Kid-Friendly", "Healthy", "Gourmet",
+    "Bon Appétit", "Summer", "Winter", "Sauté", "Roast", "Grill", "Vegetable", "Fruit", "Dairy", "Herb",
+    "Party", "Christmas", "Thanksgiving", "Low Fat", "Peanut Free", "Wheat/Gluten-Free",
+]
+
+
+# Distinct generated phrases of each kind; rows are assembled from these
+PHRASE_POOL_SIZE = 4096
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS, words))
+
+
+class PhrasePools:
+    """
+    Pre-generated titles, ingredient lines, direction steps and descriptions.
+    Assembling rows from pools keeps 1M recipes generating in minutes while
+    text lengths still vary like the real data.
+    """
+
+    def __init__(self, rng, size=PHRASE_POOL_SIZE):
+        self.titles = [_sentence(rng, int(rng.integers(2, 6))).title() for _ in range(size)]
+        self.ingredients = [
+            f"{int(rng.integers(1, 5))} {rng.choice(UNITS)} {_sentence(rng, int(rng.integers(1, 5)))}"
+            for _ in range(size)
+        ]
+        self.directions = [_sentence(rng, int(rng.integers(10, 60))).capitalize() + "." for _ in range(size)]
+        self.descriptions = [_sentence(rng, int(rng.integers(0, 50))).capitalize() or None for _ in range(size)]
+
+
+def _pick_lists(rng, pool, counts):
+    """
+    One list per row of counts[i] entries drawn from pool.
+    """
+    picks = rng.integers(0, len(pool), int(counts.sum()))
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    return [[pool[j] for j in picks[bounds[i]:bounds[i + 1]]] for i in range(len(counts))]
+
+
+def _flag_matrix(rng, count):
+    """
+    0/1 matrix of FLAG_COLUMNS with FLAG_RATES and the obvious dependencies
+    (vegans are vegetarian, vegetarians eat no meat or seafood, ...).
+    """
+    flags = np.column_stack([
+        rng.random(count) < FLAG_RATES[column] for column in FLAG_COLUMNS
+    ]).astype(np.int8)
+    column = {name: i for i, name in enumerate(FLAG_COLUMNS)}
+
+    flags[:, column["is_vegetarian"]] |= flags[:, column["is_vegan"]]
+    flags[:, column["is_pescatarian"]] |= flags[:, column["is_vegetarian"]]
+    for name in MEAT:
+        flags[flags[:, column["is_pescatarian"]] == 1, column[name]] = 0
+    for name in SEAFOOD:
+        flags[flags[:, column["is_vegetarian"]] == 1, column[name]] = 0
+    for name in ANIMAL:
+        flags[flags[:, column["is_vegan"]] == 1, column[name]] = 0
+    for name in ("has_butter", "has_cheese"):
+        flags[flags[:, column["is_dairy_free"]] == 1, column[name]] = 0
+    flags[flags[:, column["is_peanut_free"]] == 1, column["has_peanut"]] = 0
+    flags[flags[:, column["is_paleo"]] == 1, column["has_bread"]] = 0
+    flags[flags[:, column["is_paleo"]] == 1, column["has_pasta"]] = 0
+    return flags
+
+
+def recipe_rows(rng, pools, start, count):
+    """
+    Generate recipes rows in table column order.
+    Text lengths follow long-tailed distributions like the real data:
+    mostly 5-15 ingredients and a few paragraphs of directions.
+    """
+    flags = _flag_matrix(rng, count).tolist()
+    nutrition = np.round(rng.lognormal([6.0, 2.8, 2.9, 6.0], [0.7, 0.9, 0.9, 1.0], (count, 4)), 1).tolist()
+    missing_nutrition = rng.random(count) < 0.2
+    ratings = rng.choice([0.0, 1.25, 2.5, 3.125, 3.75, 4.375, 5.0], count, p=[.09, .01, .03, .12, .25, .40, .10])
+    missing_rating = rng.random(count) < 0.01
+    ingredients = _pick_lists(rng, pools.ingredients, np.clip(rng.lognormal(2.2, 0.4, count).astype(int), 1, 40))
+    directions = _pick_lists(rng, pools.directions, np.clip(rng.lognormal(1.2, 0.5, count).astype(int), 1, 20))
+    categories = _pick_lists(rng, CATEGORIES, rng.integers(2, 16, count))
+    titles = rng.integers(0, len(pools.titles), count)
+    descriptions = rng.integers(0, len(pools.descriptions), count)
+    has_image = rng.random(count) < 0.7
+    days = rng.integers(0, 7300, count)
+    first_day = date(2004, 1, 1)
+
+    rows = []
+    for i in range(count):
+        title = f"{pools.titles[titles[i]]} {start + i}"
+        rows.append((
+            title,
+            f"{IMAGE_URL_PREFIX}/{title.lower().replace(' ', '-')}.jpg" if has_image[i] else None,
+            *flags[i],
+            *((None,) * 4 if missing_nutrition[i] else nutrition[i]),
+            json.dumps(ingredients[i]),
+            json.dumps(directions[i]),
+            json.dumps(sorted(set(categories[i]))),
+            None if missing_rating[i] else float(ratings[i]),
+            pools.descriptions[descriptions[i]],
+            (first_day + timedelta(days=int(days[i]))).isoformat() + "T04:00:00.000Z",
+        ))
+    return rows
+
+
+def create_schema(conn):
+    flag_defs = ", ".join(f"{column} INTEGER" for column in FLAG_COLUMNS)
+    conn.execute(
+        f"CREATE TABLE recipes (title TEXT, image TEXT, {flag_defs}, calories REAL, protein REAL, fat REAL, "
+        f"sodium REAL, ingredients TEXT, directions TEXT, categories TEXT, rating REAL, desc TEXT, date TEXT)"
+    )
+    conn.execute(
+        "CREATE TABLE users (userId INTEGER PRIMARY KEY AUTOINCREMENT, dateReg TEXT, userName TEXT, email TEXT, "
+        "password BLOB, dateBirth TEXT, age INTEGER, loc TEXT, temp REAL, cons_pork INTEGER DEFAULT 1, "
+        "cons_alcohol INTEGER DEFAULT 1)"
+    )
+    conn.execute(
+        f"CREATE TABLE mealPlan (userId INTEGER, recipeTitle TEXT, mealType TEXT, dateUsed TEXT, image TEXT, "
+        f"calories REAL, protein REAL, fat REAL, sodium REAL, {flag_defs}, ingredients TEXT, directions TEXT, "
+        f"categories TEXT, rating REAL, date TEXT, desc TEXT)"
+    )
+
+
+def insert_recipes(conn, rng, count):
+    pools = PhrasePools(rng)
+    placeholders = ", ".join("?" for _ in range(len(FLAG_COLUMNS) + 12))
+    for start in range(1, count + 1, BATCH_SIZE):
+        conn.executemany(
+            f"INSERT INTO recipes VALUES ({placeholders})",
+            recipe_rows(rng, pools, start, min(BATCH_SIZE, count + 1 - start))
+        )
+        print(f"  {min(start + BATCH_SIZE - 1, count)} recipes")
+
+
+def insert_users(conn, rng, count, rounds):
+    password = bcrypt.hashpw(USER_PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds))
+    today = date.today()
+    rows = []
+    for user_id in range(1, count + 1):
+        birth = today - timedelta(days=int(rng.integers(18 * 365, 70 * 365)))
+        rows.append((
+            user_id, DATE_REGISTERED, f"Bench User {user_id}", f"bench{user_id}@example.com", password,
+            birth.isoformat(), (today - birth).days // 365, None, None,
+            int(rng.random() >= 0.15), int(rng.random() >= 0.20),
+        ))
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def insert_meal_plans(conn, rng, users, weeks):
+    """
+    Fill mealPlan like generate_meal_plan would: per user and week, one
+    recipe of each meal type per day, copied with its recipe columns.
+    """
+    copied = ["image", "calories", "protein", "fat", "sodium"] + FLAG_COLUMNS + \
+             ["ingredients", "directions", "categories", "rating", "date", "desc"]
+    pools = {
+        meal_type: np.array([rowid for (rowid,) in conn.execute(f"SELECT rowid FROM recipes WHERE is_{meal_type} = 1")])
+        for meal_type in MEAL_TYPES
+    }
+    select = f"SELECT title, {', '.join(copied)} FROM recipes WHERE rowid = ?"
+    insert = (
+        f"INSERT INTO mealPlan (userId, recipeTitle, mealType, dateUsed, {', '.join(copied)}) "
+        f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in copied)})"
+    )
+    today = date.today()
+    for user_id in range(1, users + 1):
+        rows = []
+        for week in range(weeks):
+            date_used = (today - timedelta(days=7 * week)).isoformat()
+            for meal_type, pool in pools.items():
+                if not len(pool):
+                    continue
+                for rowid in rng.choice(pool, 7):
+                    recipe = conn.execute(select, (int(rowid),)).fetchone()
+                    rows.append((user_id, recipe[0], meal_type, date_used, *recipe[1:]))
+        conn.executemany(insert, rows)
+
+
+def details_path(path):
+    """
+    Recipe_Details.json counterpart of a generated database, served through
+    NUTRIDISH_DETAILS_PATH.
+    """
+    return os.path.splitext(path)[0] + ".details.json"
+
+
+def write_details(conn, path):
+    """
+    Write every recipe as a Recipe_Details.json record, streamed one at a time.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        rows = conn.execute(
+            "SELECT title, desc, calories, protein, fat, sodium, rating, ingredients, directions, categories, date "
+            "FROM recipes ORDER BY rowid"
+        )
+        for i, row in enumerate(rows):
+            title, desc, calories, protein, fat, sodium, rating, ingredients, directions, categories, day = row
+            record = {
+                "title": title, "desc": desc, "calories": calories, "protein": protein, "fat": fat,
+                "sodium": sodium, "rating": rating, "ingredients": json.loads(ingredients),
+                "directions": json.loads(directions), "categories": json.loads(categories), "date": day,
+            }
+            f.write((",\n" if i else "") + json.dumps(record, ensure_ascii=False))
+        f.write("\n]\n")
+
+
+def generate_dataset(path=DEFAULT_PATH, recipes=10000, users=1000, weeks=1, seed=0, rounds=4, force=False):
+    """
+    Build a database with the real recipes/users/mealPlan schema and
+    synthetic content at the given scale.
+    :param recipes: Number of recipes (e.g. 10_000 up to 1_000_000).
+    :param users: Number of users, ids 1..users, emails bench<id>@example.com.
+    :param weeks: Weekly meal plans already generated per user.
+    :param rounds: bcrypt work factor of the stored passwords.
+    The matching details file is written to details_path(path).
+    """
+    if os.path.exists(path):
+        if not force:
+            raise FileExistsError(f"{path} exists, pass --force to replace it")
+        stale = [path + suffix for suffix in ("", "-wal", "-shm")]
+        stale.append(details_path(path))
+        stale.append(os.path.splitext(details_path(path))[0] + ".idx.json")
+        for stale_path in stale:
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")  # Built from scratch; nothing to recover
+    conn.execute("PRAGMA synchronous = OFF")
+    create_schema(conn)
+
+    print(f"Generating {recipes} recipes, {users} users and {weeks} week(s) of meal plans into {path}")
+    insert_recipes(conn, rng, recipes)
+    insert_users(conn, rng, users, rounds)
+    insert_meal_plans(conn, rng, users, weeks)
+    conn.commit()
+    write_details(conn, details_path(path))
+    conn.close()
+
+    size = os.path.getsize(path) / 1e6
+    print(f"Done in {time.perf_counter() - started:.1f}s, {size:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic NutriDish database for benchmarks.",
+        epilog="Usage: python benchmarks/generate_dataset.py [options], from any directory.",
+    )
+    parser.add_argument("--out", default=DEFAULT_PATH, help="Database file to create")
+    parser.add_argument("--recipes", type=int, default=10000, help="Number of recipes (10k to 1M)")
+    parser.add_argument("--users", type=int, default=1000, help="Number of users")
+    parser.add_argument("--weeks", type=int, default=1, help="Weeks of meal plans per user")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt work factor of the stored passwords")
+    parser.add_argument("--force", action="store_true", help="Replace an existing database")
+    args = parser.parse_args()
+
+    generate_dataset(args.out, args.recipes, args.users, args.weeks, args.seed, args.rounds, args.force)
@@ -0,0 +1,444 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote, urlencode, urlsplit
+import numpy as np
+
+# Run as "python benchmarks/run_benchmarks.py" only this directory is on
+# sys.path; the repository root is needed for app, scripts/ and benchmarks/
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate_dataset import DATE_REGISTERED, DEFAULT_PATH, USER_PASSWORD, WORDS, details_path
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+SAMPLE_IMAGE = os.path.join(REPO_ROOT, "test.jpeg")
+
+FILTERS = ["breakfast", "lunch", "dinner", "vegetarian", "vegan", "low_carb", "dairy_free", "peanut_free"]
+PANTRY = ["egg", "tomato", "onion", "cheese", "chicken", "rice", "potato", "butter", "pasta", "carrot", "fish"]
+
+# Seconds to wait for a spawned gunicorn to answer
+SERVER_START_TIMEOUT = 60
+
+# p95 increase (relative) reported as a regression by --compare
+REGRESSION_THRESHOLD = 0.10
+
+
+class Request:
+    def __init__(self, method, path, json_body=None, files=None):
+        self.method = method
+        self.path = path
+        self.json_body = json_body
+        self.files = files
+
+
+class Scenario:
+    """
+    One endpoint under test.
+    :param make_request: Callable(rng, context, i) returning a Request.
+    :param writes: Whether the scenario modifies the database.
+    :param available: Optional callable telling whether it can run here.
+    """
+
+    def __init__(self, name, make_request, writes=False, available=None):
+        self.name = name
+        self.make_request = make_request
+        self.writes = writes
+        self.available = available or (lambda: True)
+
+
+def _query(rng):
+    return " ".join(rng.sample(WORDS[:-4], rng.randint(1, 2)))
+
+
+def _user_id(rng, context, writable=False):
+    # Updates overwrite the stored password, so they use the upper half of the ids and logins the lower half
+    half = max(context["users"] // 2, 1)
+    return rng.randint(half + 1, max(context["users"], half + 1)) if writable else rng.randint(1, half)
+
+
+def _update_user(rng, context):
+    user_id = _user_id(rng, context, writable=True)
+    return Request("POST", "/user/", {
+        "userId": user_id, "userName": f"Bench User {user_id}", "email": f"bench{user_id}@example.com",
+        "dateBirth": "1990-05-15", "cons_pork": rng.randint(0, 1), "cons_alcohol": rng.randint(0, 1),
+    })
+
+
+def _model_available():
+    model_dir = os.path.join(REPO_ROOT, "model")
+    return any(os.path.exists(os.path.join(model_dir, name)) for name in ("model.h5", "model_weights.npz"))
+
+
+SCENARIOS = [
+    Scenario("recipes.search_post", lambda rng, context, i: Request(
+        "POST", "/recipes/?view=summary&page_size=20",
+        {"query": _query(rng), "filters": {name: True for name in rng.sample(FILTERS, rng.randint(0, 2))}}
+    )),
+    Scenario("recipes.search_get", lambda rng, context, i: Request(
+        "GET", "/recipes/search?" + urlencode({
+            "query": _query(rng), "filters": ",".join(rng.sample(FILTERS, rng.randint(0, 2))), "page_size": 20
+        })
+    )),
+    Scenario("recipes.search_cursor", lambda rng, context, i: Request(
+        "GET", "/recipes/search?" + urlencode({
+            "filters": rng.choice(FILTERS), "cursor": "", "view": "summary", "page_size": 50
+        })
+    )),
+    Scenario("recipes.pantry", lambda rng, context, i: Request(
+        "POST", "/recipes/pantry?view=summary",
+        {"ingredients": rng.sample(PANTRY, rng.randint(2, 6)), "limit": 20}
+    )),
+    Scenario("recipe_details.get", lambda rng, context, i: Request(
+        "GET", f"/recipe_details/{quote(rng.choice(context['titles']), safe='')}/"
+    )),
+    Scenario("daily_recommendations.post", lambda rng, context, i: Request(
+        "POST", "/daily-recommendations/?view=summary",
+        {"userId": _user_id(rng, context), "current_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"}
+    )),
+    Scenario("meal_plan.get", lambda rng, context, i: Request(
+        "GET", f"/meal_plan/{_user_id(rng, context)}/?view=summary"
+    )),
+    Scenario("user.get", lambda rng, context, i: Request("GET", f"/user/{_user_id(rng, context)}")),
+    Scenario("auth.login", lambda rng, context, i: Request(
+        "POST", "/auth/login",
+        {"email": f"bench{_user_id(rng, context)}@example.com", "password": USER_PASSWORD}
+    )),
+    Scenario("image.classify", lambda rng, context, i: Request(
+        "POST", "/image/", files={"image": ("test.jpeg", context["image"], "image/jpeg")}
+    ), available=_model_available),
+    Scenario("meal_plan.create", lambda rng, context, i: Request(
+        "POST", "/meal_plan/", {"userId": _user_id(rng, context, writable=True)}
+    ), writes=True),
+    Scenario("user.update", lambda rng, context, i: _update_user(rng, context), writes=True),
+    Scenario("auth.register", lambda rng, context, i: Request(
+        "POST", "/auth/register",
+        {"email": f"new-{context['run_id']}-{i}@example.com", "password": USER_PASSWORD, "userName": "New"}
+    ), writes=True),
+]
+
+
+def load_context(db_path):
+    """
+    What request generators need to know about the dataset.
+    """
+    conn = sqlite3.connect(db_path)
+    recipes = conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+    # Generated users only; accounts registered by earlier runs are skipped
+    users = conn.execute(
+        "SELECT COALESCE(MAX(userId), 0) FROM users WHERE dateReg = ?", (DATE_REGISTERED,)
+    ).fetchone()[0]
+    titles = [title for (title,) in conn.execute(
+        "SELECT title FROM recipes WHERE title IS NOT NULL ORDER BY random() LIMIT 1000"
+    )]
+    conn.close()
+    image = b""
+    if os.path.exists(SAMPLE_IMAGE):
+        with open(SAMPLE_IMAGE, "rb") as f:
+            image = f.read()
+    return {"recipes": recipes, "users": users, "titles": titles, "image": image, "run_id": uuid.uuid4().hex[:8]}
+
+
+def _multipart(files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, (filename, content, mimetype) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {mimetype}\r\n\r\n".encode("utf-8") + content + b"\r\n"
+        )
+    return b"".join(parts) + f"--{boundary}--\r\n".encode("utf-8"), f"multipart/form-data; boundary={boundary}"
+
+
+class ClientDriver:
+    """
+    Sends requests in-process through the Flask test client.
+    """
+
+    name = "client"
+
+    def __init__(self):
+        from app import app  # Imported late so NUTRIDISH_* settings apply
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, request):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        kwargs = {}
+        if request.json_body is not None:
+            kwargs["json"] = request.json_body
+        if request.files:
+            body, content_type = _multipart(request.files)
+            kwargs.update(data=body, content_type=content_type)
+        response = client.open(request.path, method=request.method, **kwargs)
+        return response.status_code, len(response.get_data())
+
+
+class HttpDriver:
+    """
+    Sends requests over HTTP keep-alive connections, one per thread.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    def send(self, request):
+        headers = {}
+        body = None
+        if request.json_body is not None:
+            body = json.dumps(request.json_body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if request.files:
+            body, headers["Content-Type"] = _multipart(request.files)
+
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                conn.request(request.method, request.path, body=body, headers=headers)
+                response = conn.getresponse()
+                return response.status, len(response.read())
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self._local.conn = None  # The server closed the keep-alive connection; reconnect once
+                if attempt:
+                    raise
+
+
+def run_scenario(driver, scenario, context, requests, concurrency, warmup, seed):
+    """
+    Send requests for one scenario from concurrency threads.
+    :return: Summary dictionary (latency percentiles in milliseconds).
+    """
+    rng = random.Random(seed)
+    planned = [scenario.make_request(rng, context, i) for i in range(warmup + requests)]
+    for request in planned[:warmup]:
+        driver.send(request)
+
+    latencies = np.zeros(requests)
+    statuses = Counter()
+    failures = Counter()
+    sizes = []
+    lock = threading.Lock()
+
+    def send(i):
+        started = time.perf_counter()
+        try:
+            status, size = driver.send(planned[warmup + i])
+        except Exception as e:
+            status, size = None, 0
+            with lock:
+                failures[type(e).__name__] += 1
+        latencies[i] = time.perf_counter() - started
+        with lock:
+            statuses[status] += 1
+            sizes.append(size)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 2),
+        "mean_ms": round(float(latencies.mean() * 1000), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(latencies.max() * 1000), 3),
+        "mean_response_bytes": round(float(np.mean(sizes)), 1),
+        "status": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "errors": sum(count for status, count in statuses.items() if status is None or status >= 500),
+        "exceptions": dict(failures),
+    }
+
+
+def start_gunicorn(port, workers, threads, env):
+    """
+    Start gunicorn serving app:app on localhost and wait until it answers.
+    """
+    command = [
+        sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers), "--threads", str(threads), "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/recipes/search?page_size=1")
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not answer within {SERVER_START_TIMEOUT}s")
+
+
+def print_results(mode, results):
+    print(f"\n{mode}: {'scenario':<28} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{'':<{len(mode) + 2}}{name:<28} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}")
+
+
+def compare(baseline_path, report, threshold=REGRESSION_THRESHOLD):
+    """
+    Print the change of every metric against a saved baseline.
+    :return: Names of the scenarios whose p95 got worse by more than threshold.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit', '?')}, "
+          f"{baseline['meta'].get('recipes')} recipes):")
+    for mode, results in report["results"].items():
+        for name, result in results.items():
+            before = baseline["results"].get(mode, {}).get(name)
+            if before is None:
+                continue
+            changes = []
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                change = (result[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+                changes.append(f"{metric} {change:+.0%}")
+            if before["p95_ms"] and (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] > threshold:
+                regressions.append(f"{mode}/{name}")
+            print(f"  {mode}/{name:<28} {', '.join(changes)}")
+    if regressions:
+        print(f"p95 regressions over {threshold:.0%}: {', '.join(regressions)}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark every blueprint, in-process and over HTTP.",
+        epilog="Usage: python benchmarks/generate_dataset.py, then python benchmarks/run_benchmarks.py "
+               "[options], from any directory.",
+    )
+    parser.add_argument("--db", default=DEFAULT_PATH, help="Database built by benchmarks/generate_dataset.py")
+    parser.add_argument("--mode", choices=["client", "http", "both"], default="client",
+                        help="Flask test client, HTTP against gunicorn, or both")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--port", type=int, default=8099, help="Port of the spawned gunicorn")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Client threads")
+    parser.add_argument("--scenarios", help="Comma-separated scenario name prefixes to run (default: all)")
+    parser.add_argument("--read-only", action="store_true", help="Skip scenarios that write to the database")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Where to write the JSON report (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", help="Baseline JSON report to compare with")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative p95 increase counted as a regression")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist, run python -m benchmarks.generate_dataset first")
+
+    # Applies to the in-process app and to the spawned server alike
+    os.environ["NUTRIDISH_DB_PATH"] = os.path.abspath(args.db)
+    if os.path.exists(details_path(args.db)):
+        os.environ["NUTRIDISH_DETAILS_PATH"] = os.path.abspath(details_path(args.db))
+    os.environ.setdefault("NUTRIDISH_BCRYPT_ROUNDS", "4")
+    if args.no_cache:
+        os.environ["NUTRIDISH_CACHE_TTL"] = "0"
+
+    wanted = [prefix.strip() for prefix in (args.scenarios or "").split(",") if prefix.strip()]
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if (not wanted or any(scenario.name.startswith(prefix) for prefix in wanted))
+        and not (args.read_only and scenario.writes)
+    ]
+    for scenario in [scenario for scenario in scenarios if not scenario.available()]:
+        print(f"Skipping {scenario.name}: not available here")
+        scenarios.remove(scenario)
+
+    context = load_context(args.db)
+    modes = ["client", "http"] if args.mode == "both" else [args.mode]
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "recipes": context["recipes"],
+            "users": context["users"],
+            "settings": {key: value for key, value in vars(args).items() if key not in ("save", "compare")},
+        },
+        "results": {},
+    }
+
+    for mode in modes:
+        server = None
+        if mode == "client":
+            driver = ClientDriver()
+        elif args.url:
+            driver = HttpDriver(args.url)
+        else:
+            server = start_gunicorn(args.port, args.workers, args.threads, dict(os.environ))
+            driver = HttpDriver(f"http://127.0.0.1:{args.port}")
+        try:
+            results = {}
+            for i, scenario in enumerate(scenarios):
+                print(f"[{mode}] {scenario.name} ...", flush=True)
+                results[scenario.name] = run_scenario(
+                    driver, scenario, context, args.requests, args.concurrency, args.warmup, args.seed + i
+                )
+            report["results"][mode] = results
+            print_results(mode, results)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    save_path = args.save or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+    with open(save_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {save_path}")
+
+    if args.compare and compare(args.compare, report, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
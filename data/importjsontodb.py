@@ -1,61 +1,232 @@
-import sqlite3
+import argparse
 import json
+import os
+import sqlite3
+import time
+from itertools import islice
+import ijson
 
 # Path ke file JSON dan SQLite
 json_file = "data/Recipe_Details.json"
 db_file = "data/NutriDish.db"
 
-# Load data dari file JSON
-with open(json_file, "r") as file:
-    recipes = json.load(file)  # JSON ini diharapkan sebagai list
-
-# Koneksi ke database SQLite
-conn = sqlite3.connect(db_file)
-cursor = conn.cursor()
-
-# Iterasi setiap resep
-for recipe_data in recipes:
-    # Pastikan data memiliki kunci 'title'
-    if "title" not in recipe_data:
-        print("Data tanpa title ditemukan. Melewatkan data ini:", recipe_data)
-        continue  # Lewati data ini
-
-    # Data dari JSON yang ingin ditambahkan dengan tipe datanya
-    columns_to_add = {
-        "calories": ("REAL", recipe_data.get("calories")),
-        "protein": ("REAL", recipe_data.get("protein")),
-        "fat": ("REAL", recipe_data.get("fat")),
-        "sodium": ("REAL", recipe_data.get("sodium")),
-        "ingredients": ("TEXT", json.dumps(recipe_data.get("ingredients")) if recipe_data.get("ingredients") else None),
-        "directions": ("TEXT", json.dumps(recipe_data.get("directions")) if recipe_data.get("directions") else None),
-        "categories": ("TEXT", json.dumps(recipe_data.get("categories")) if recipe_data.get("categories") else None),
-        "rating": ("REAL", recipe_data.get("rating")),
-        "desc": ("TEXT", recipe_data.get("desc")),
-        "date": ("TEXT", recipe_data.get("date"))
-    }
-
-    # Periksa apakah title dari JSON ada di database
-    title_to_check = recipe_data["title"].strip()
-
-    cursor.execute("SELECT title FROM recipes WHERE title = ?", (title_to_check,))
-    result = cursor.fetchone()
-
-    if result:
-        # Title cocok, tambahkan kolom jika belum ada dan data tidak kosong
-        for column_name, (column_type, value) in columns_to_add.items():
-            if value is not None:  # Hanya tambahkan jika nilai tidak kosong
-                try:
-                    cursor.execute(f"ALTER TABLE recipes ADD COLUMN `{column_name}` {column_type}")
-                except sqlite3.OperationalError:
-                    # Kolom sudah ada
-                    pass
-
-                # Update data di kolom tersebut
-                cursor.execute(f"UPDATE recipes SET `{column_name}` = ? WHERE title = ?", (value, title_to_check))
-        print(f"Data berhasil ditambahkan untuk title: {title_to_check}")
-    else:
-        print(f"Title '{title_to_check}' tidak ditemukan di database.")
-
-# Commit perubahan dan tutup koneksi
-conn.commit()
-conn.close()
+# Columns filled from the JSON, with their SQLite types
+COLUMNS = {
+    "calories": "REAL",
+    "protein": "REAL",
+    "fat": "REAL",
+    "sodium": "REAL",
+    "ingredients": "TEXT",
+    "directions": "TEXT",
+    "categories": "TEXT",
+    "rating": "REAL",
+    "desc": "TEXT",
+    "date": "TEXT",
+}
+
+# List values are stored as JSON text
+JSON_COLUMNS = {"ingredients", "directions", "categories"}
+
+# Records staged per executemany/commit
+BATCH_SIZE = 5000
+
+# Unmatched titles printed at the end (all of them go to --unmatched-out)
+UNMATCHED_SHOWN = 20
+
+
+def staging_path(db_path):
+    """
+    Staging database next to the target. Rows are staged there, not in the
+    target, so the target's write lock is only taken for the final merge and
+    an interrupted import can resume from what was already staged.
+    """
+    root, _ = os.path.splitext(db_path)
+    return root + ".import.db"
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def ensure_columns(conn):
+    """
+    Add missing recipe columns once, before any data is written.
+    :return: Names of the columns that were added.
+    """
+    existing = {row[1] for row in conn.execute("PRAGMA main.table_info(recipes)")}
+    added = [column for column in COLUMNS if column not in existing]
+    for column in added:
+        conn.execute(f"ALTER TABLE main.recipes ADD COLUMN `{column}` {COLUMNS[column]}")
+    return added
+
+
+def prepare_staging(conn, stamp, resume):
+    """
+    Create (or, when resuming the same source file, reuse) the staging table.
+    :return: Number of records already staged by an interrupted run.
+    """
+    column_defs = ", ".join(f"`{column}` {column_type}" for column, column_type in COLUMNS.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS staging.recipe_import (title TEXT PRIMARY KEY, {column_defs})")
+    conn.execute("CREATE TABLE IF NOT EXISTS staging.import_progress (source TEXT, records INTEGER)")
+
+    progress = conn.execute("SELECT source, records FROM staging.import_progress").fetchone()
+    if resume and progress is not None and progress[0] == stamp:
+        return progress[1]
+
+    conn.execute("DELETE FROM staging.recipe_import")
+    conn.execute("DELETE FROM staging.import_progress")
+    conn.execute("INSERT INTO staging.import_progress (source, records) VALUES (?, 0)", (stamp,))
+    return 0
+
+
+def to_row(recipe_data):
+    """
+    Staging row for one JSON record, or None if it has no title.
+    """
+    if not isinstance(recipe_data, dict) or not recipe_data.get("title"):
+        return None
+    values = []
+    for column in COLUMNS:
+        value = recipe_data.get(column)
+        if column in JSON_COLUMNS:
+            value = json.dumps(value) if value else None
+        values.append(value)
+    return (recipe_data["title"].strip(), *values)
+
+
+def stage_records(conn, records, batch_size, started_at, skip):
+    """
+    Stream records into the staging table in committed batches.
+    A title seen twice keeps the latest non-null value of each column.
+    :return: (records read, records without title)
+    """
+    columns = ", ".join(f"`{column}`" for column in COLUMNS)
+    placeholders = ", ".join("?" for _ in range(len(COLUMNS) + 1))
+    merge = ", ".join(f"`{column}` = COALESCE(excluded.`{column}`, `{column}`)" for column in COLUMNS)
+    insert_sql = (
+        f"INSERT INTO staging.recipe_import (title, {columns}) VALUES ({placeholders}) "
+        f"ON CONFLICT(title) DO UPDATE SET {merge}"
+    )
+
+    read = skip
+    without_title = 0
+    records = islice(records, skip, None)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        rows = [to_row(recipe_data) for recipe_data in batch]
+        without_title += sum(row is None for row in rows)
+        read += len(batch)
+
+        conn.execute("BEGIN")
+        conn.executemany(insert_sql, [row for row in rows if row is not None])
+        conn.execute("UPDATE staging.import_progress SET records = ?", (read,))
+        conn.execute("COMMIT")
+
+        elapsed = time.perf_counter() - started_at
+        print(f"Staged {read} records ({(read - skip) / elapsed:.0f} records/s)")
+    return read, without_title
+
+
+def merge_staged(conn):
+    """
+    Apply the staged rows to recipes in one set-based UPDATE ... FROM,
+    inside a single write transaction. Null staged values keep the
+    current value, like the per-column updates this replaces.
+    :return: (recipes updated, unmatched titles)
+    """
+    assignments = ", ".join(
+        f"`{column}` = COALESCE(s.`{column}`, recipes.`{column}`)" for column in COLUMNS
+    )
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            f"UPDATE main.recipes SET {assignments} "
+            f"FROM staging.recipe_import AS s WHERE recipes.title = s.title"
+        )
+        updated = conn.execute("SELECT changes()").fetchone()[0]
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    unmatched = [
+        title for (title,) in conn.execute(
+            "SELECT title FROM staging.recipe_import "
+            "WHERE title NOT IN (SELECT title FROM main.recipes WHERE title IS NOT NULL) ORDER BY title"
+        )
+    ]
+    return updated, unmatched
+
+
+def import_recipe_details(json_path=json_file, db_path=db_file, batch_size=BATCH_SIZE, resume=True,
+                          unmatched_out=None):
+    """
+    Import recipe details from the JSON file into the recipes table.
+    Records are streamed with ijson, so memory use does not grow with the file.
+
+    :param json_path: JSON file holding a top-level list of recipes.
+    :param db_path: SQLite database with the recipes table.
+    :param batch_size: Records staged per batch.
+    :param resume: Continue a previously interrupted import of the same file.
+    :param unmatched_out: Optional file to write every unmatched title to.
+    """
+    started_at = time.perf_counter()
+
+    # Koneksi ke database SQLite
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("ATTACH DATABASE ? AS staging", (staging_path(db_path),))
+    conn.execute("PRAGMA staging.journal_mode = WAL")
+    conn.execute("PRAGMA staging.synchronous = OFF")  # Staging can always be rebuilt
+
+    added = ensure_columns(conn)
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+
+    skip = prepare_staging(conn, source_stamp(json_path), resume)
+    if skip:
+        print(f"Resuming after {skip} already staged records")
+
+    with open(json_path, "rb") as file:
+        records = ijson.items(file, "item", use_float=True)
+        read, without_title = stage_records(conn, records, batch_size, started_at, skip)
+
+    staged_at = time.perf_counter()
+    updated, unmatched = merge_staged(conn)
+    merge_seconds = time.perf_counter() - staged_at
+
+    conn.execute("DETACH DATABASE staging")
+    conn.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(staging_path(db_path) + suffix):
+            os.remove(staging_path(db_path) + suffix)
+
+    if unmatched_out:
+        with open(unmatched_out, "w", encoding="utf-8") as f:
+            f.writelines(title + "\n" for title in unmatched)
+    for title in unmatched[:UNMATCHED_SHOWN]:
+        print(f"Title '{title}' tidak ditemukan di database.")
+    if len(unmatched) > UNMATCHED_SHOWN:
+        print(f"... and {len(unmatched) - UNMATCHED_SHOWN} more unmatched titles")
+
+    elapsed = time.perf_counter() - started_at
+    print(f"Imported {read} records in {elapsed:.1f}s ({read / max(elapsed, 1e-9):.0f} records/s): "
+          f"{updated} recipes updated, {len(unmatched)} titles not found, {without_title} records without title. "
+          f"Write lock held for {merge_seconds:.2f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import Recipe_Details.json into the recipes table.")
+    parser.add_argument("--json", default=json_file, help="Recipe details JSON file")
+    parser.add_argument("--db", default=db_file, help="SQLite database")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Records staged per batch")
+    parser.add_argument("--restart", action="store_true", help="Ignore an interrupted import and start over")
+    parser.add_argument("--unmatched-out", help="Write all unmatched titles to this file")
+    args = parser.parse_args()
+
+    import_recipe_details(
+        args.json, args.db, batch_size=args.batch_size, resume=not args.restart,
+        unmatched_out=args.unmatched_out
+    )
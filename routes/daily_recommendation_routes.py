@@ -1,101 +1,40 @@
 from flask import Blueprint, jsonify, request
 from datetime import datetime
 import random
-from scripts.data_storage import get_db_connection
+from scripts.user_management import get_user_profile
+from scripts.recommendation_pools import get_recommendation_pools
+from scripts.dietary_restrictions import UnknownIngredient, restriction_mask
+from scripts.metrics import record_error
+from scripts.recipe_serializer import (
+    InvalidFieldSelection, field_selection_from_args, required_columns, select_fields, serialize_recipe
+)
 
 daily_recommendations_blueprint = Blueprint("daily_recommendations", __name__)
 
-def get_recommendations(meal_type, user_restrictions, num_recommendations=10):
+def get_recommendations(meal_type, user_restrictions, num_recommendations=10, view="full", fields=None,
+                        excluded_ingredients=None):
     """
     Fetch recommendations for the given meal type and user restrictions.
     :param meal_type: The type of meal (breakfast, lunch, dinner, snack, dessert)
-    :param user_restrictions: User's dietary restrictions
+    :param user_restrictions: User's profile, whose cons_* fields are dietary restrictions
     :param num_recommendations: Number of recipes to recommend
+    :param view: "full" or "summary" representation of each recipe
+    :param fields: Optional explicit list of fields to return (overrides view)
+    :param excluded_ingredients: Optional further ingredients to avoid (e.g. allergies)
     :return: List of recommended recipes
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    specs = select_fields("recommendation", view, fields)
 
-    # Build the base query with all necessary fields
-    base_query = """
-        SELECT title, image, is_breakfast, is_lunch, is_dinner, is_snack, is_dessert, 
-               is_vegetarian, is_vegan, is_pescatarian, is_paleo, is_dairy_free, 
-               is_fat_free, is_peanut_free, is_soy_free, is_wheat_free, is_low_carb,
-               is_low_cal, is_low_fat, is_low_sodium, is_low_sugar, is_low_cholesterol,
-               calories, protein, fat, sodium, ingredients, directions, rating,
-               categories, desc, date
-        FROM recipes
-        WHERE is_{} = 1
-    """.format(meal_type)
-
-    # Add restriction conditions
-    conditions = []
-    params = []
-
-    # Handle dietary restrictions
-    if user_restrictions:
-        for restriction, value in user_restrictions.items():
-            if value == 0:  # User doesn't allow this
-                if restriction == "cons_pork":
-                    conditions.append("(ingredients NOT LIKE ? OR ingredients IS NULL)")
-                    params.append("%pork%")
-                elif restriction == "cons_alcohol":
-                    conditions.append("(ingredients NOT LIKE ? OR ingredients IS NULL)")
-                    params.append("%alcohol%")
-                # Add more restrictions as needed
-
-    # Combine all conditions
-    if conditions:
-        base_query += " AND " + " AND ".join(conditions)
-
-    # Add randomization and limit
-    base_query += " ORDER BY RANDOM() LIMIT ?"
-    params.append(num_recommendations)
-
-    # Execute query
-    cursor.execute(base_query, params)
-    recipes = cursor.fetchall()
-    conn.close()
-
-    if not recipes:
+    # Sample from the pool for this meal type and restriction mask
+    pools = get_recommendation_pools()
+    excluded = restriction_mask(user_restrictions, excluded_ingredients)
+    positions = pools.sample(meal_type, excluded, num_recommendations)
+    if not positions:
         return []
 
-    # Format the recipes
-    formatted_recipes = []
-    for recipe in recipes:
-        # Get dietary tags
-        dietary = {
-            tag: recipe[f"is_{tag.replace(' ', '_')}"]
-            for tag in [
-                "vegetarian", "vegan", "pescatarian", "paleo", "dairy_free",
-                "fat_free", "peanut_free", "soy_free", "wheat_free", "low_carb",
-                "low_cal", "low_fat", "low_sodium", "low_sugar", "low_cholesterol"
-            ]
-            if recipe[f"is_{tag.replace(' ', '_')}"] == 1
-        }
-
-        # Format recipe data
-        formatted_recipe = {
-            "title": recipe["title"],
-            "image": recipe["image"],
-            "meal_type": meal_type,
-            "dietary": dietary,
-            "nutrition": {
-                "calories": recipe["calories"],
-                "protein": recipe["protein"],
-                "fat": recipe["fat"],
-                "sodium": recipe["sodium"]
-            },
-            "rating": recipe["rating"],
-            "ingredients": recipe["ingredients"],
-            "directions": recipe["directions"],
-            "categories": recipe["categories"],
-            "description": recipe["desc"],
-            "date_added": recipe["date"]
-        }
-        formatted_recipes.append(formatted_recipe)
-
-    return formatted_recipes
+    columns = required_columns(specs)
+    context = {"meal_type": meal_type}
+    return [serialize_recipe(pools.catalog.row(position, columns), specs, context) for position in positions]
 
 @daily_recommendations_blueprint.route("/", methods=["POST"])
 def recommend():
@@ -119,23 +58,11 @@ def recommend():
         except ValueError:
             return jsonify({"error": "Invalid current_time format. Expected HH:MM"}), 400
 
-        # Fetch user restrictions from database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT cons_pork, cons_alcohol
-            FROM users 
-            WHERE userId = ?
-        """, (user_id,))
-        user_restrictions = cursor.fetchone()
-        conn.close()
-
-        if not user_restrictions:
+        # Fetch user restrictions from the profile cache
+        profile = get_user_profile(user_id)
+        if profile is None:
             return jsonify({"error": "User not found"}), 404
 
-        # Convert to dictionary
-        user_restrictions = dict(user_restrictions)
-
         # Determine meal type based on user-provided current_time
         if 5 <= current_hour < 11:
             meal_type = "breakfast"
@@ -147,10 +74,14 @@ def recommend():
             meal_type = random.choice(["snack", "dessert"])
 
         # Get recommendations
+        view, fields = field_selection_from_args(request.args)
         recommendations = get_recommendations(
             meal_type=meal_type,
-            user_restrictions=user_restrictions,
-            num_recommendations=1
+            user_restrictions=profile,
+            num_recommendations=1,
+            view=view,
+            fields=fields,
+            excluded_ingredients=user_data.get("exclude_ingredients")
         )
 
         if not recommendations:
@@ -166,5 +97,8 @@ def recommend():
 
         return jsonify(response_data), 200
 
+    except (InvalidFieldSelection, UnknownIngredient) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
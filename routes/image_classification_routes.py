@@ -1,8 +1,13 @@
+import os
 from flask import Blueprint, request, jsonify
-from scripts.model_utils import predict_ingredient
+from scripts.model_utils import InvalidImage, predict_ingredient, predict_ingredients
+from scripts.metrics import record_error
 
 image_classification_blueprint = Blueprint("image_classification", __name__)
 
+# Images accepted by one batch request
+MAX_BATCH_IMAGES = int(os.environ.get("NUTRIDISH_CLASSIFY_MAX_IMAGES", 8))
+
 @image_classification_blueprint.route("/", methods=["POST"])
 def classify_image():
     """
@@ -22,5 +27,41 @@ def classify_image():
             "ingredient": predicted_label,
             "confidence": float(confidence)
         }), 200
+    except InvalidImage as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+@image_classification_blueprint.route("/batch", methods=["POST"])
+def classify_images():
+    """
+    Classify several images uploaded together as multipart "images" fields.
+    Each image gets its own prediction, or its own error if it is unusable.
+    """
+    try:
+        image_files = request.files.getlist("images")
+        if not image_files:
+            return jsonify({"error": "No images uploaded"}), 400
+        if len(image_files) > MAX_BATCH_IMAGES:
+            return jsonify({"error": f"At most {MAX_BATCH_IMAGES} images per request"}), 400
+
+        results = predict_ingredients([image_file.read() for image_file in image_files])
+
+        predictions = []
+        for image_file, result in zip(image_files, results):
+            if isinstance(result, InvalidImage):
+                predictions.append({"filename": image_file.filename, "error": str(result)})
+            else:
+                predicted_label, confidence = result
+                predictions.append({
+                    "filename": image_file.filename,
+                    "ingredient": predicted_label,
+                    "confidence": float(confidence)
+                })
+
+        return jsonify({"predictions": predictions}), 200
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 500
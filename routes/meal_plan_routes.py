@@ -3,6 +3,12 @@ from pathlib import Path
 from flask import Blueprint, request, jsonify
 from scripts.data_storage import get_db_connection
 from scripts.weekly_meal_plan import generate_meal_plan #update_meal_plan_with_cooldown
+from scripts.user_management import get_user_profile
+from scripts.dietary_restrictions import UnknownIngredient
+from scripts.metrics import record_error
+from scripts.recipe_serializer import (
+    InvalidFieldSelection, field_selection_from_args, required_columns, select_fields, serialize_recipe
+)
 
 meal_plan_blueprint = Blueprint("meal_plan", __name__)
 
@@ -11,6 +17,7 @@ def create_meal_plan():
     """
     Generate a weekly meal plan based on user preferences and tags.
     Request body should include: {"user_id": 1, "tags": {"vegetarian": true, "low carb": true}}
+    and may list "exclude_ingredients" (e.g. allergies) on top of the user's restrictions.
     """
     try:
         # Retrieve data from request body
@@ -18,33 +25,46 @@ def create_meal_plan():
         user_id = data["userId"]
         selected_tags = data.get("tags", {})
 
+        if get_user_profile(user_id) is None:
+            return jsonify({"error": "User not found"}), 404
+
         # Generate the meal plan
-        meal_plan = generate_meal_plan(user_id, selected_tags)
+        meal_plan = generate_meal_plan(user_id, selected_tags, data.get("exclude_ingredients"))
 
         # Save meal plan with cooldown information
         # update_meal_plan_with_cooldown(user_id, meal_plan)
 
         return jsonify({"message": "Meal plan generated successfully", "meal_plan": meal_plan}), 200
+    except UnknownIngredient as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 500
 
 @meal_plan_blueprint.route("/<string:user_id>/", methods=["GET"])
 def get_user_meal_plan(user_id):
     """
     Retrieve the meal plan for the given user.
+    Supports ?view=summary|full and ?fields=title,image,... like the search endpoints.
     """
     try:
+        specs = select_fields("meal_plan", *field_selection_from_args(request.args))
+        columns = required_columns(specs, extra=["mealType"])
+
         conn = get_db_connection()  # Use the centralized function
         cursor = conn.cursor()
 
+        # Only read the columns the requested representation needs
         cursor.execute("""
-            SELECT * FROM mealPlan WHERE userId = ?
-        """, (user_id,))
+            SELECT {} FROM mealPlan WHERE userId = ?
+        """.format(", ".join(f'"{column}"' for column in columns)), (user_id,))
         meal_plan = cursor.fetchall()
 
         conn.close()
 
         if not meal_plan:
+            if get_user_profile(user_id) is None:
+                return jsonify({"error": "User not found"}), 404
             return jsonify({"error": "No meal plan found for this user"}), 404
 
         # Format meal plan data
@@ -54,30 +74,11 @@ def get_user_meal_plan(user_id):
             meal_type = meal["mealType"]
             if meal_type not in formatted_meal_plan:
                 formatted_meal_plan[meal_type] = []
-            formatted_meal_plan[meal_type].append({
-                "title": meal["recipeTitle"],
-                "date_used": meal["dateUsed"],
-                "image": meal["image"],
-                "meal_type": {
-                    "breakfast": meal["is_breakfast"],
-                    "lunch": meal["is_lunch"],
-                    "dinner": meal["is_dinner"],
-                    "snack": meal["is_snack"],
-                    "dessert": meal["is_dessert"]
-                },
-                # "dietary": meal["dietary"],
-                "calories": meal["calories"],
-                "protein": meal["protein"],
-                "fat": meal["fat"],
-                "sodium": meal["sodium"],
-                "rating": meal["rating"],
-                "ingredients": meal["ingredients"],
-                "directions": meal["directions"],
-                "categories": meal["categories"],
-                "desc": meal["desc"],
-                "date": meal["date"]  
-                })
+            formatted_meal_plan[meal_type].append(serialize_recipe(meal, specs))
 
         return jsonify({"user_id": user_id, "meal_plan": formatted_meal_plan}), 200
+    except InvalidFieldSelection as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,59 @@
+from flask import Blueprint, current_app
+from scripts.metrics import CONTENT_TYPE, collect, registry, render
+from scripts.password_hashing import password_hasher
+from scripts.response_cache import MemoryBackend, response_cache
+from scripts.user_management import user_cache
+
+metrics_blueprint = Blueprint("metrics", __name__)
+
+
+def hashing_samples():
+    """
+    Password hashing pool statistics (see /auth/hash-metrics) as samples.
+    """
+    stats = password_hasher.metrics()
+    return [
+        ("nutridish_password_hash_workers", "gauge", "Hashing processes.", {}, stats["workers"]),
+        ("nutridish_password_hash_pending", "gauge", "Hashes queued or running.", {}, stats["pending"]),
+        ("nutridish_password_hash_submitted_total", "counter", "Hashes accepted.", {}, stats["submitted"]),
+        ("nutridish_password_hash_rejected_total", "counter", "Hashes refused while busy.", {},
+         stats["rejected"]),
+        ("nutridish_password_hash_failed_total", "counter", "Hashes that failed or timed out.", {},
+         stats["failed"]),
+        ("nutridish_password_hash_queue_wait_seconds_total", "counter", "Time hashes waited for a worker.", {},
+         stats["queue_wait"]["total_seconds"]),
+        ("nutridish_password_hash_seconds_total", "counter", "Time spent hashing.", {},
+         stats["execution"]["total_seconds"]),
+    ]
+
+
+def cache_samples():
+    """
+    Response cache hit/miss counters and the size of in-process caches.
+    """
+    stats = response_cache.stats()
+    samples = [
+        ("nutridish_response_cache_hits_total", "counter", "Responses served from the cache.", {}, stats["hits"]),
+        ("nutridish_response_cache_misses_total", "counter", "Responses computed on a cache miss.", {},
+         stats["misses"]),
+        ("nutridish_response_cache_errors_total", "counter", "Cache backend failures served uncached.", {},
+         stats["errors"]),
+    ]
+    for name, backend in (("user", user_cache), ("response", response_cache.backend)):
+        if isinstance(backend, MemoryBackend):
+            samples.append(("nutridish_cache_entries", "gauge", "Entries held by in-process caches.",
+                            {"cache": name}, len(backend)))
+    return samples
+
+
+registry.register_collector(hashing_samples)
+registry.register_collector(cache_samples)
+
+
+@metrics_blueprint.route("", methods=["GET"])
+def metrics():
+    """
+    All metrics in the Prometheus text format, summed over the gunicorn
+    workers sharing NUTRIDISH_METRICS_DIR.
+    """
+    return current_app.response_class(render(collect()), content_type=CONTENT_TYPE)
@@ -1,56 +1,67 @@
 from flask import Blueprint, jsonify
-import ijson
-from pathlib import Path
+from scripts.recipe_details_index import DETAILS_PATH, get_details_index, normalize_title
+from scripts.response_cache import cached_json_response
+from scripts.http_middleware import etag_version
+from scripts.metrics import record_error
 
 # Define the Blueprint
 recipe_details_blueprint = Blueprint("recipe_details_route", __name__)
 
 def get_recipe_details(title):
     """
-    Retrieve recipe details using a streaming parser.
+    Retrieve recipe details through the title index over Recipe_Details.json.
     """
     try:
-        # Path to the JSON file
-        json_path = Path(__file__).resolve().parent.parent / "data" / "Recipe_Details.json"
-
-        if not json_path.exists():
-            return {"error": f"Recipe_Details.json file not found at {json_path}"}, 404
-
-        # Open the JSON file and stream parse
-        with open(json_path, "r", encoding="utf-8") as f:
-            # ijson.items reads each top-level item as a Python dictionary
-            recipes = ijson.items(f, "item")
-
-            for recipe in recipes:
-                # Case-insensitive match for the title
-                if recipe["title"].strip().lower() == title.strip().lower():
-                    # Return only the matched recipe
-                    return {
-                        "title": recipe["title"],
-                        "description": recipe.get("desc", "No description"),
-                        "calories": recipe.get("calories", 0),
-                        "protein": recipe.get("protein", 0),
-                        "fat": recipe.get("fat", 0),
-                        "sodium": recipe.get("sodium", 0),
-                        "rating": recipe.get("rating", 0),
-                        "ingredients": recipe.get("ingredients", []),
-                        "directions": recipe.get("directions", []),
-                        "categories": recipe.get("categories", []),
-                        "date": recipe.get("date", "Unknown"),
-                    }
+        index = get_details_index()
+
+        if index is None:
+            return {"error": f"Recipe_Details.json file not found at {DETAILS_PATH}"}, 404
+
+        recipe = index.lookup(title)
+        if recipe is not None:
+            return {
+                "title": recipe["title"],
+                "description": recipe.get("desc", "No description"),
+                "calories": recipe.get("calories", 0),
+                "protein": recipe.get("protein", 0),
+                "fat": recipe.get("fat", 0),
+                "sodium": recipe.get("sodium", 0),
+                "rating": recipe.get("rating", 0),
+                "ingredients": recipe.get("ingredients", []),
+                "directions": recipe.get("directions", []),
+                "categories": recipe.get("categories", []),
+                "date": recipe.get("date", "Unknown"),
+            }
 
         # If no recipe is found, return an error
         return {"error": f"Recipe with title '{title}' not found"}, 404
 
     except Exception as e:
+        record_error(e)
         return {"error": str(e)}, 500
 
+def details_version():
+    """
+    Version stamp of Recipe_Details.json for cache keys and ETags.
+    """
+    index = get_details_index()
+    if index is None:
+        return "missing"
+    return f"{index.stamp['size']}-{index.stamp['mtime_ns']}"
+
+
 @recipe_details_blueprint.route("/<string:title>/", methods=["GET"])
+@etag_version(details_version)
 def details(title):
     """
     Fetch the full details of a recipe by title.
     """
-    recipe = get_recipe_details(title)
-    if "error" in recipe:
-        return jsonify(recipe), 404
-    return jsonify(recipe)
\ No newline at end of file
+    def compute():
+        recipe = get_recipe_details(title)
+        if isinstance(recipe, tuple):  # (error, status); only 404s are cached
+            return recipe[0], recipe[1]
+        return recipe, 200
+
+    return cached_json_response(
+        "recipe_details", {"title": normalize_title(title)}, details_version(), compute
+    )
\ No newline at end of file
@@ -1,42 +1,192 @@
 from flask import Blueprint, request, jsonify
 from scripts.recipe_search import search_recipes, search_recipes_by_query
+from scripts.pantry_search import InvalidPantry, pantry_recipes
+from scripts.dietary_restrictions import UnknownIngredient, UnknownUser, user_restriction_mask
+from scripts.pagination import InvalidCursor
+from scripts.recipe_serializer import InvalidFieldSelection, field_selection_from_args
+from scripts.data_storage import get_catalog_version
+from scripts.response_cache import cached_json_response
+from scripts.http_middleware import etag_version
+from scripts.metrics import record_error
 from routes.recipe_details_routes import get_recipe_details  # Import the new function
 
 recipe_blueprint = Blueprint("recipe", __name__)
 
+
+def paginated_payload(results, next_cursor):
+    """
+    Shape a page of search results.
+    Clients that opt into keyset pagination by sending a `cursor` parameter
+    (empty for the first page) get the results wrapped together with the
+    cursor for the next page; page/page_size clients get the plain list.
+    """
+    if "cursor" in request.args:
+        return {"recipes": results, "next_cursor": next_cursor}, 200
+    return results, 200
+
+
+def normalize_query(query):
+    """
+    Normalize a search string for use in a cache key.
+    """
+    return " ".join((query or "").lower().split())
+
+
+def page_params(page, page_size, cursor, view, fields):
+    """
+    The pagination and representation part of a search cache key.
+    """
+    return {
+        "page": page,
+        "page_size": page_size,
+        "cursor": cursor,
+        "cursor_mode": "cursor" in request.args,
+        "view": view,
+        "fields": fields,
+    }
+
 @recipe_blueprint.route("/", methods=["POST"])
 def search():
     """
     Search for recipes based on query and filters with pagination.
+    Pass ?cursor= (then the returned next_cursor) for keyset pagination,
+    and ?view=summary or ?fields=title,image,... for a lighter representation.
+    A "userId" applies that user's dietary restrictions (404 if there is no
+    such user) and "exclude_ingredients" rules out further ingredients (e.g. allergies).
     """
     try:
         user_input = request.get_json()
+        restricted = user_restriction_mask(user_input.get("userId"), user_input.get("exclude_ingredients"))
         page = int(request.args.get("page", 1))  # Default page = 1
         page_size = int(request.args.get("page_size", 100))  # Default page size = 100
-        results = search_recipes(user_input, page=page, page_size=page_size)
-        return jsonify(results), 200
+        cursor = request.args.get("cursor") or None
+        view, fields = field_selection_from_args(request.args)
+
+        cache_params = {
+            "query": normalize_query(user_input.get("query", "")),
+            "filters": sorted(
+                tag.strip().lower() for tag, value in user_input.get("filters", {}).items() if value
+            ),
+            "restricted": int(restricted),
+            **page_params(page, page_size, cursor, view, fields),
+        }
+        return cached_json_response(
+            "recipes", cache_params, get_catalog_version(),
+            lambda: paginated_payload(*search_recipes(
+                user_input, page=page, page_size=page_size, cursor=cursor, view=view, fields=fields,
+                restricted=restricted
+            ))
+        )
+    except (InvalidCursor, InvalidFieldSelection, UnknownIngredient) as e:
+        return jsonify({"error": str(e)}), 400
+    except UnknownUser as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 500
 
 
+def search_version():
+    """
+    Version stamp of GET /search responses for their ETag: the catalog
+    version, plus the user's restriction mask when a user_id is given,
+    since a profile change alters what the same URL returns.
+    """
+    version = get_catalog_version()
+    user_id = request.args.get("user_id")
+    if user_id in (None, ""):
+        return version
+    try:
+        return f"{version}|{int(user_restriction_mask(user_id))}"
+    except UnknownUser:
+        return f"{version}|unknown-user"  # Never matches a 200's ETag; the view answers 404
+
+
 @recipe_blueprint.route("/search", methods=["GET"])
+@etag_version(search_version)
 def search_get():
     """
     Search for recipes based on query and filters passed as URL parameters.
     Example: /search?query=salad&filters=lunch,vegan
+    Keyset pagination: /search?query=salad&cursor= then &cursor=<next_cursor>
+    List screens: /search?query=salad&view=summary or &fields=title,image,rating
+    Restrictions: &user_id=<id> for a user's dietary restrictions (404 if unknown), &exclude=peanut,shrimp
     """
     try:
+        restricted = user_restriction_mask(request.args.get("user_id"), request.args.get("exclude"))
         query = request.args.get("query", "").lower()
         filters = request.args.get("filters", "")
         page = int(request.args.get("page", 1))
         page_size = int(request.args.get("page_size", 100))
-        
-        results = search_recipes_by_query(
-            query=query,
-            filters=filters,
-            page=page,
-            page_size=page_size
+        cursor = request.args.get("cursor") or None
+        view, fields = field_selection_from_args(request.args)
+
+        cache_params = {
+            "query": normalize_query(query),
+            "filters": sorted({name.strip().lower() for name in filters.split(",") if name.strip()}),
+            "restricted": int(restricted),
+            **page_params(page, page_size, cursor, view, fields),
+        }
+        return cached_json_response(
+            "recipes_search", cache_params, get_catalog_version(),
+            lambda: paginated_payload(*search_recipes_by_query(
+                query=query,
+                filters=filters,
+                page=page,
+                page_size=page_size,
+                cursor=cursor,
+                view=view,
+                fields=fields,
+                restricted=restricted
+            ))
         )
-        return jsonify(results), 200
+    except (InvalidCursor, InvalidFieldSelection, UnknownIngredient) as e:
+        return jsonify({"error": str(e)}), 400
+    except UnknownUser as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+@recipe_blueprint.route("/pantry", methods=["POST"])
+def pantry():
+    """
+    "What can I cook": recipes ranked by how many of the given ingredients
+    they use, then by rating.
+    Body: {"ingredients": ["egg", "tomato"], "required": ["cheese"],
+           "excluded": ["pork"], "meal_type": "breakfast", "limit": 20}
+    An optional "userId" applies that user's dietary restrictions (404 if unknown).
+    Supports ?view=summary and ?fields=... like the search endpoints.
+    """
+    try:
+        user_input = request.get_json() or {}
+        restricted = user_restriction_mask(user_input.get("userId"))
+        view, fields = field_selection_from_args(request.args)
+
+        def names(key):
+            value = user_input.get(key) or []
+            value = value.split(",") if isinstance(value, str) else value
+            return sorted({str(name).strip().lower() for name in value if str(name).strip()})
+
+        cache_params = {
+            "ingredients": names("ingredients"),
+            "required": names("required"),
+            "excluded": names("excluded"),
+            "meal_type": (user_input.get("meal_type") or "").strip().lower(),
+            "limit": user_input.get("limit"),
+            "restricted": int(restricted),
+            "view": view,
+            "fields": fields,
+        }
+        return cached_json_response(
+            "recipes_pantry", cache_params, get_catalog_version(),
+            lambda: (pantry_recipes(user_input, view=view, fields=fields, restricted=restricted), 200)
+        )
+    except (InvalidPantry, InvalidFieldSelection) as e:
+        return jsonify({"error": str(e)}), 400
+    except UnknownUser as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 500
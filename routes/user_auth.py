@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from scripts.user_management import register_user, login_user
+from scripts.password_hashing import password_hasher
 from scripts.weekly_meal_plan import generate_meal_plan  # Import fungsi generate_meal_plan
+from scripts.metrics import record_error
 
 # Inisialisasi Blueprint
 auth_blueprint = Blueprint("auth", __name__)
@@ -27,9 +29,10 @@ def register():
             meal_plan = generate_meal_plan(user_id)
             response["meal_plan"] = meal_plan  # Sertakan meal plan dalam respons
         except Exception as e:
+            record_error(e)
             return jsonify({"error": "Failed to generate meal plan", "details": str(e)}), 500
 
-    return jsonify(response), status
+    return busy_response(response, status)
 
 
 @auth_blueprint.route("/login", methods=["POST"]) 
@@ -42,4 +45,23 @@ def login():
         return jsonify({"error": "Invalid input"}), 400
 
     response, status = login_user(user_data)
-    return jsonify(response), status
+    return busy_response(response, status)
+
+
+def busy_response(response, status):
+    """
+    JSON response, with a Retry-After header when hashing was refused (503).
+    """
+    retry_after = response.pop("retry_after", None) if status == 503 else None
+    response = jsonify(response)
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+    return response, status
+
+
+@auth_blueprint.route("/hash-metrics", methods=["GET"])
+def hash_metrics():
+    """
+    Password hashing pool statistics: pending/rejected counts, queue wait and execution time.
+    """
+    return jsonify(password_hasher.metrics())
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from scripts.user_management import create_user, get_user
+from scripts.metrics import record_error
 
 user_blueprint = Blueprint("user", __name__)
 
@@ -25,6 +26,7 @@ def create_or_update_user():
         response, status_code = create_user(user_data)
         return jsonify(response), status_code
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 500
 
 @user_blueprint.route("/<user_id>", methods=["GET"])
@@ -1,11 +1,266 @@
+import os
+import secrets
 import sqlite3
+import threading
+import time
 from pathlib import Path
+from scripts.metrics import record_fetch, record_query
+
+DB_PATH = Path(os.environ.get(
+    "NUTRIDISH_DB_PATH",
+    Path(__file__).resolve().parent.parent / "data" / "NutriDish.db"
+))
+
+# Busy timeout in seconds, applied when another process holds the write lock
+BUSY_TIMEOUT = float(os.environ.get("NUTRIDISH_DB_BUSY_TIMEOUT", 5.0))
+
+# Number of prepared statements each connection keeps around
+STATEMENT_CACHE_SIZE = 256
+
+# Per-connection tuning, applied once when a connection is opened.
+# WAL lets readers run while an import or meal-plan write is in progress,
+# and NORMAL sync is durable enough under WAL.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,        # 64 MB page cache (negative = KiB)
+    "mmap_size": 268435456,      # map up to 256 MB of the database file
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+# Rows read per step when iterating over a cursor
+ITER_BATCH_SIZE = 256
+
+_local = threading.local()
+
+
+def _open_connection():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    for pragma, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+class InstrumentedCursor:
+    """
+    sqlite3.Cursor that reports every statement, its time and the rows
+    fetched from it to scripts.metrics, per request.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _execute(self, method, *args):
+        started = time.perf_counter()
+        try:
+            method(*args)
+        finally:
+            record_query(time.perf_counter() - started)
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._execute(self._cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._execute(self._cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._execute(self._cursor.executescript, sql_script)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        record_fetch(time.perf_counter() - started, int(row is not None))
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+        record_fetch(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        record_fetch(time.perf_counter() - started, len(rows))
+        return rows
+
+    def __iter__(self):
+        # Fetched in batches, so timing does not cost two clock reads per row
+        while True:
+            rows = self.fetchmany(ITER_BATCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+
+class PooledConnection:
+    """
+    Handle to the calling thread's shared database connection.
+    Behaves like a sqlite3.Connection whose cursors are instrumented (see
+    InstrumentedCursor); close() only releases the handle, and
+    the underlying connection stays open for the next caller on this thread.
+    Used as a context manager it commits on success, rolls back on error and
+    then releases the handle.
+    """
+
+    def __init__(self, slot):
+        self._slot = slot
+        self._conn = slot.conn
+        self._released = False
+        slot.users += 1
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor())
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._slot.users -= 1
+        # Last handle out: drop anything left uncommitted, like a real close() would
+        if self._slot.users == 0 and self._conn.in_transaction:
+            self._conn.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # Callers that return early without close() must not pin the slot
+        try:
+            self.close()
+        except Exception:
+            pass
+
 
 def get_db_connection():
     """
-    Create a database connection to the NutriDish database.
+    Get a connection to the NutriDish database.
+    Connections are opened once per thread (and per process, so forked
+    gunicorn workers never share one) and reused across calls; nested
+    callers on the same thread share the same connection and transaction.
     """
-    db_path = Path(__file__).resolve().parent.parent / "data" / "NutriDish.db"
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    return conn
+    slot = _local
+    if getattr(slot, "conn", None) is None or slot.pid != os.getpid():
+        slot.conn = _open_connection()
+        slot.pid = os.getpid()
+        slot.users = 0
+    return PooledConnection(slot)
+
+
+def close_db_connection():
+    """
+    Close the calling thread's connection, e.g. when a worker shuts down
+    or after the database file has been replaced.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+
+def database_stamp():
+    """
+    Cheap fingerprint of the database contents, for invalidating in-memory
+    copies of it. Any committed write changes the size or mtime of either
+    the database file or, in WAL mode, its -wal file.
+    """
+    stamp = []
+    for path in (DB_PATH, Path(f"{DB_PATH}-wal")):
+        try:
+            stat = os.stat(path)
+            stamp.extend([stat.st_mtime_ns, stat.st_size])
+        except FileNotFoundError:
+            stamp.extend([0, 0])
+    return tuple(stamp)
+
+
+_version_lock = threading.Lock()
+_version_cache = {"stamp": None, "version": None}
+
+
+def _ensure_version_tracking(conn):
+    """
+    Install the catalog_meta table and the triggers that bump its counter on
+    every change to the recipes table. The generation is random per database
+    file, so a replaced file never reuses an old version string.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+    conn.execute(
+        "INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('generation', ?)",
+        (secrets.randbits(48),)
+    )
+    conn.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('recipes_version', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS catalog_meta_recipes_{event.lower()}
+            AFTER {event} ON recipes BEGIN
+                UPDATE catalog_meta SET value = value + 1 WHERE key = 'recipes_version';
+            END
+        """)
+    conn.commit()
+
+
+def get_catalog_version():
+    """
+    Version string of the recipes table, identical across worker processes.
+    Changes whenever a recipe is inserted, updated or deleted, but not on
+    writes to other tables (users, mealPlan). Only touches the database when
+    database_stamp() shows that something was written.
+    """
+    stamp = database_stamp()
+    if _version_cache["stamp"] == stamp:
+        return _version_cache["version"]
+
+    with _version_lock:
+        conn = get_db_connection()
+        try:
+            rows = dict(conn.execute("SELECT key, value FROM catalog_meta").fetchall())
+        except sqlite3.OperationalError:
+            rows = {}
+        if "generation" not in rows or "recipes_version" not in rows:
+            _ensure_version_tracking(conn)
+            rows = dict(conn.execute("SELECT key, value FROM catalog_meta").fetchall())
+            stamp = None  # Installing the triggers was itself a write
+        conn.close()
+
+        version = f"{rows['generation']:x}-{rows['recipes_version']}"
+        _version_cache["stamp"] = stamp
+        _version_cache["version"] = version
+        return version
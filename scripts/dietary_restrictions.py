@@ -0,0 +1,76 @@
+from scripts.recipe_flags import FLAG_BITS, flag_mask, resolve_ingredient
+from scripts.user_management import get_user_profile
+
+# Profile fields cons_<ingredient> set to 0 rule out recipes with has_<ingredient>.
+# The users table has cons_pork and cons_alcohol; a cons_* column added for any
+# other tagged ingredient is picked up without code changes.
+PREFERENCE_PREFIX = "cons_"
+
+
+class UnknownIngredient(ValueError):
+    """Raised for an excluded ingredient recipes are not tagged with."""
+
+
+class UnknownUser(LookupError):
+    """Raised for a user id with no profile."""
+
+
+def preference_columns(profile):
+    """
+    Flag columns ruled out by a user's preference fields.
+    :param profile: User profile (or any {field: value} dictionary); None for no user.
+    :return: Sorted list of has_* columns.
+    """
+    columns = set()
+    for field, value in (profile or {}).items():
+        if field.startswith(PREFERENCE_PREFIX) and value == 0:
+            column = "has_" + field[len(PREFERENCE_PREFIX):]
+            if column in FLAG_BITS:
+                columns.add(column)
+    return sorted(columns)
+
+
+def exclusion_columns(ingredients):
+    """
+    Flag columns of allergy-style exclusions, e.g. ["peanuts", "shrimp"].
+    :param ingredients: List or comma-separated string of ingredient names.
+    :raises UnknownIngredient: If a name has no has_* column.
+    """
+    if isinstance(ingredients, str):
+        ingredients = ingredients.split(",")
+    columns = set()
+    for name in ingredients or []:
+        name = str(name)
+        if not name.strip():
+            continue
+        column = resolve_ingredient(name)
+        if column is None:
+            raise UnknownIngredient(f"Unknown ingredient '{name.strip()}' cannot be excluded")
+        columns.add(column)
+    return sorted(columns)
+
+
+def restriction_mask(profile=None, excluded_ingredients=None):
+    """
+    Bitmask of the has_* flags a recipe must not have, combining the user's
+    preference fields with explicitly excluded ingredients. Applied with the
+    same AND/compare as every other flag filter, so the cost does not depend
+    on how many ingredients are excluded.
+    :return: np.uint64 mask (0 when nothing is restricted).
+    """
+    return flag_mask(preference_columns(profile) + exclusion_columns(excluded_ingredients))
+
+
+def user_restriction_mask(user_id=None, excluded_ingredients=None):
+    """
+    restriction_mask for a user id, reading the profile through the profile
+    cache. No user id means no preference restrictions.
+    :raises UnknownUser: If the id does not belong to a user.
+    """
+    profile = None
+    if user_id not in (None, ""):
+        profile = get_user_profile(user_id)
+        if profile is None:
+            raise UnknownUser("User not found")
+    return restriction_mask(profile, excluded_ingredients)
+
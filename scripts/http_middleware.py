@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import os
+from flask import current_app, g, request
+
+try:
+    import brotli  # Optional: br is only offered when the package is installed
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.environ.get("NUTRIDISH_COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html", "text/css", "application/javascript"}
+
+# ETag suffix per content coding; each encoding is its own representation
+ENCODING_SUFFIXES = {"": "", "gzip": "-gz", "br": "-br"}
+
+
+def etag_version(version_func):
+    """
+    Mark a GET view whose response is fully determined by its URL and the
+    version stamp returned by version_func. Its ETag is derived from those
+    two alone, so a matching If-None-Match is answered with 304 before the
+    view runs at all.
+    """
+    def decorator(view):
+        view.etag_version = version_func
+        return view
+    return decorator
+
+
+def _request_key():
+    args = sorted(request.args.items(multi=True))
+    return request.path + "?" + "&".join(f"{key}={value}" for key, value in args)
+
+
+def _versioned_etag(version_func):
+    digest = hashlib.sha1(f"{version_func()}|{_request_key()}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def check_not_modified():
+    """
+    before_request hook: short-circuit conditional GETs on versioned views.
+    """
+    if request.method not in ("GET", "HEAD") or request.endpoint is None:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    version_func = getattr(view, "etag_version", None)
+    if version_func is None:
+        return None
+
+    g.versioned_etag = _versioned_etag(version_func)
+    for suffix in ENCODING_SUFFIXES.values():
+        if g.versioned_etag + suffix in request.if_none_match:
+            return _not_modified(g.versioned_etag + suffix)
+    return None
+
+
+def _pick_encoding(response):
+    if response.direct_passthrough or response.status_code != 200:
+        return None
+    if "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return None
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_SIZE:
+        return None
+
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def finalize_response(response):
+    """
+    after_request hook: compress large bodies with the best encoding the
+    client accepts and, for GET and HEAD, add strong ETags and answer
+    If-None-Match with 304.
+    """
+    if response.status_code != 200:
+        return response
+    if response.direct_passthrough:
+        return response  # Files are streamed and handle conditionals themselves
+
+    response.vary.add("Accept-Encoding")
+    encoding = _pick_encoding(response)
+
+    etag = None
+    if request.method in ("GET", "HEAD"):
+        etag = getattr(g, "versioned_etag", None)
+        if etag is None and "ETag" not in response.headers:
+            etag = hashlib.sha1(response.get_data()).hexdigest()
+    if etag is not None:
+        etag += ENCODING_SUFFIXES[encoding or ""]
+        if etag in request.if_none_match:
+            return _not_modified(etag)
+        response.set_etag(etag)
+
+    if encoding == "br":
+        response.set_data(brotli.compress(response.get_data(), quality=BROTLI_QUALITY))
+    elif encoding == "gzip":
+        response.set_data(gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL, mtime=0))
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+
+    return response
+
+
+def init_app(app):
+    """
+    Install conditional GET and compression handling for every blueprint.
+    """
+    app.before_request(check_not_modified)
+    app.after_request(finalize_response)
@@ -0,0 +1,324 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from PIL import Image, ImageOps
+
+IMAGE_DIR = Path(__file__).resolve().parent.parent / "image"
+
+# Configuration (environment variables):
+#   NUTRIDISH_IMAGE_CACHE_DIR    where generated variants are stored
+#   NUTRIDISH_IMAGE_CACHE_BYTES  size the variant cache is kept under
+#   NUTRIDISH_IMAGE_SIZES        comma-separated WxH boxes clients may request
+CACHE_DIR = Path(os.environ.get("NUTRIDISH_IMAGE_CACHE_DIR", IMAGE_DIR.parent / "image_cache"))
+CACHE_MAX_BYTES = int(os.environ.get("NUTRIDISH_IMAGE_CACHE_BYTES", 512 * 1024 * 1024))
+VARIANT_SIZES = [
+    tuple(int(side) for side in size.split("x"))
+    for size in os.environ.get("NUTRIDISH_IMAGE_SIZES", "160x160,320x320,640x640").split(",")
+]
+
+# Output format -> (Pillow format, mimetype, extension, encoder options)
+FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", "image/webp", "webp", {"quality": 80, "method": 4}),
+}
+DEFAULT_FORMAT = "jpeg"
+
+# Pruning brings the cache down to this fraction of CACHE_MAX_BYTES
+PRUNE_TARGET = 0.9
+
+# A cache hit refreshes the file's mtime (its LRU position) at most this often
+TOUCH_INTERVAL = 3600
+
+# Variants produced ahead of time by GenerateImageVariants.py. They live
+# outside the LRU-managed part of the cache and are listed in the manifest.
+PREGENERATED_DIR = CACHE_DIR / "pregenerated"
+MANIFEST_PATH = CACHE_DIR / "manifest.json"
+
+# Seconds between checks of whether the manifest was rewritten
+MANIFEST_CHECK_INTERVAL = 30
+
+
+class InvalidVariant(ValueError):
+    """Raised for a size or format that is not served."""
+
+
+def source_path(filename):
+    """
+    Resolve a filename below IMAGE_DIR, refusing paths that escape it.
+    :return: The Path, or None if there is no such image.
+    """
+    path = (IMAGE_DIR / filename).resolve()
+    if IMAGE_DIR.resolve() not in path.parents or not path.is_file():
+        return None
+    return path
+
+
+def validate_variant(size, image_format):
+    """
+    Check a requested size and format.
+    :return: The format name to use.
+    """
+    if tuple(size) not in VARIANT_SIZES:
+        allowed = ", ".join(f"{width}x{height}" for width, height in VARIANT_SIZES)
+        raise InvalidVariant(f"Unsupported size {size[0]}x{size[1]}, expected one of {allowed}")
+    image_format = (image_format or DEFAULT_FORMAT).lower()
+    if image_format == "jpg":
+        image_format = "jpeg"
+    if image_format not in FORMATS:
+        raise InvalidVariant(f"Unsupported format '{image_format}', expected one of {', '.join(FORMATS)}")
+    return image_format
+
+
+def variant_name(size, image_format):
+    """
+    Name of a variant within a manifest entry, e.g. "320x320.webp".
+    """
+    return f"{size[0]}x{size[1]}.{image_format}"
+
+
+def variant_key(filename, size, image_format, stat):
+    """
+    Cache key of a variant. The source's size and mtime are part of it, so
+    replacing an image produces new variants instead of serving stale ones.
+    """
+    identity = f"{filename}|{size[0]}x{size[1]}|{image_format}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+def fit_image(path, size):
+    """
+    Decode an image and downscale it to fit within size (never upscaling).
+    JPEGs are decoded at reduced scale (draft mode) when the target allows it.
+    :return: A PIL image in RGB or RGBA mode.
+    """
+    with Image.open(path) as image:
+        image.draft("RGB", size)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        return image
+
+
+def encode_image(image, image_format):
+    """
+    Encode a PIL image in one of FORMATS.
+    :return: Encoded image bytes.
+    """
+    pillow_format, _, _, options = FORMATS[image_format]
+    if image.mode == "RGBA" and pillow_format == "JPEG":
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format=pillow_format, **options)
+    return output.getvalue()
+
+
+def render_variant(path, size, image_format):
+    """
+    Downscale an image to fit within size and encode it.
+    :return: Encoded image bytes.
+    """
+    return encode_image(fit_image(path, size), image_format)
+
+
+def write_atomically(path, data):
+    """
+    Write a file so that readers never see it half-written.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+class VariantCache:
+    """
+    On-disk store of generated variants, shared by every worker on a host.
+    Files are written atomically and evicted least-recently-used first (by
+    mtime, which hits refresh) once the directory grows past max_bytes.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._size = None
+        self._etags = {}
+        self._lock = threading.Lock()
+
+    def path(self, key, extension):
+        return self.root / key[:2] / f"{key}.{extension}"
+
+    def get(self, key, extension):
+        """
+        :return: Path of the cached variant, or None on a miss.
+        """
+        path = self.path(key, extension)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None  # Pruned by another worker just now
+        return path
+
+    def put(self, key, extension, data):
+        """
+        Store a variant and prune the cache if it grew too large.
+        :return: Path of the stored variant.
+        """
+        path = self.path(key, extension)
+        write_atomically(path, data)
+        self._etags[str(path)] = hashlib.sha1(data).hexdigest()
+
+        with self._lock:
+            if self._size is None:
+                self._size = self.disk_usage()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._size = self.prune()
+        return path
+
+    def etag(self, path):
+        """
+        Content hash of a cached variant, computed once per process.
+        """
+        etag = self._etags.get(str(path))
+        if etag is None:
+            etag = self._etags[str(path)] = hashlib.sha1(path.read_bytes()).hexdigest()
+        return etag
+
+    def _entries(self):
+        for path in self.root.glob("??/*"):  # Key-prefix directories only, not pregenerated/
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+    def disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def prune(self, target=None):
+        """
+        Delete least recently used variants until the cache is under target
+        (PRUNE_TARGET of max_bytes by default).
+        :return: Bytes left in the cache.
+        """
+        target = self.max_bytes * PRUNE_TARGET if target is None else target
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self._etags.pop(str(path), None)
+            total -= size
+        return total
+
+
+variant_cache = VariantCache()
+
+
+class VariantManifest:
+    """
+    Index of pregenerated variants written by GenerateImageVariants.py:
+    filename -> source stamp and, per variant name, its path (relative to
+    CACHE_DIR), dimensions, byte size and SHA-1. Lets the image route serve
+    those variants without rendering or hashing anything.
+    """
+
+    def __init__(self, images, mtime_ns=None):
+        self.images = images
+        self.mtime_ns = mtime_ns
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("images", {}), os.stat(path).st_mtime_ns)
+
+    def lookup(self, filename, size, image_format, stat):
+        """
+        :param stat: os.stat_result of the source image; variants generated
+                     from a different size or mtime are not returned.
+        :return: (path, etag, mimetype) of a pregenerated variant, or None.
+        """
+        entry = self.images.get(filename)
+        if entry is None or entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns:
+            return None
+        variant = entry.get("variants", {}).get(variant_name(size, image_format))
+        if variant is None:
+            return None
+        return CACHE_DIR / variant["path"], variant["sha1"], FORMATS[image_format][1]
+
+
+_manifest = None
+_manifest_checked_at = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest():
+    """
+    Get the current variant manifest, re-reading it when the file changed.
+    The file is checked at most every MANIFEST_CHECK_INTERVAL seconds.
+    :return: VariantManifest, or None if no manifest has been generated.
+    """
+    global _manifest, _manifest_checked_at
+    checked_at = _manifest_checked_at
+    if checked_at is not None and time.monotonic() - checked_at < MANIFEST_CHECK_INTERVAL:
+        return _manifest
+
+    with _manifest_lock:
+        if _manifest_checked_at is None or time.monotonic() - _manifest_checked_at >= MANIFEST_CHECK_INTERVAL:
+            try:
+                mtime_ns = os.stat(MANIFEST_PATH).st_mtime_ns
+                if _manifest is None or _manifest.mtime_ns != mtime_ns:
+                    _manifest = VariantManifest.load(MANIFEST_PATH)
+            except (OSError, ValueError):
+                _manifest = None
+            _manifest_checked_at = time.monotonic()
+        return _manifest
+
+
+def get_image_variant(filename, size, image_format=None):
+    """
+    Get a resized (and possibly re-encoded) copy of an image, generating and
+    caching it on first use. Variants listed in the pregenerated manifest
+    for the current version of the source are served straight from it.
+    :param filename: Image path relative to IMAGE_DIR.
+    :param size: (width, height) box the image is fitted into.
+    :param image_format: "jpeg" (default) or "webp".
+    :return: (path, etag, mimetype) of the cached variant.
+    :raises InvalidVariant: For a size or format that is not served.
+    :raises FileNotFoundError: If the source image does not exist.
+    """
+    image_format = validate_variant(size, image_format)
+    source = source_path(filename)
+    if source is None:
+        raise FileNotFoundError(filename)
+    stat = source.stat()
+
+    manifest = get_manifest()
+    pregenerated = manifest.lookup(filename, size, image_format, stat) if manifest is not None else None
+    if pregenerated is not None:
+        return pregenerated
+
+    _, mimetype, extension, _ = FORMATS[image_format]
+    key = variant_key(filename, size, image_format, stat)
+    path = variant_cache.get(key, extension)
+    if path is None:
+        path = variant_cache.put(key, extension, render_variant(source, size, image_format))
+    return path, variant_cache.etag(path), mimetype
@@ -0,0 +1,108 @@
+import json
+import re
+import secrets
+import time
+from flask.json.provider import DefaultJSONProvider
+from scripts.metrics import record_serialization
+
+try:
+    import orjson  # Optional: several times faster than the json module when installed
+except ImportError:
+    orjson = None
+
+
+class RawJSON:
+    """
+    An already-encoded JSON value, spliced verbatim into the output of
+    dumps() instead of being serialized again.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data if isinstance(data, str) else data.decode("utf-8")
+
+    def __repr__(self):
+        return f"RawJSON({self.data!r})"
+
+
+# Placeholder emitted for a RawJSON value, replaced by its text afterwards.
+# The random token keeps ordinary strings from ever looking like one.
+_MARKER = f"__rawjson_{secrets.token_hex(8)}_"
+_MARKER_PATTERN = re.compile(f'"{_MARKER}(\\d+)"')
+
+# Keyword arguments the orjson path understands; anything else uses json
+_ORJSON_KWARGS = {"indent", "separators", "ensure_ascii"}
+
+
+def _splice(text, fragments):
+    if not fragments:
+        return text
+    return _MARKER_PATTERN.sub(lambda match: fragments[int(match.group(1))], text)
+
+
+def _with_fragments(default, fragments):
+    def encode(value):
+        if isinstance(value, RawJSON):
+            fragments.append(value.data)
+            return f"{_MARKER}{len(fragments) - 1}"
+        return default(value)
+    return encode
+
+
+def _orjson_dumps(obj, default, sort_keys, indent):
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+
+
+def dumps(obj, default=DefaultJSONProvider.default, sort_keys=True, **kwargs):
+    """
+    Serialize obj to compact JSON text, with orjson when it is available.
+    RawJSON values anywhere in obj are inserted as-is.
+    :param default: Fallback for types neither encoder knows (Flask's by default).
+    :param kwargs: json.dumps options; unsupported ones select the json module.
+    Time spent is added to the current request's serialization time.
+    """
+    started = time.perf_counter()
+    try:
+        return _dumps(obj, default, sort_keys, **kwargs)
+    finally:
+        record_serialization(time.perf_counter() - started)
+
+
+def _dumps(obj, default, sort_keys, **kwargs):
+    fragments = []
+    encode = _with_fragments(default, fragments)
+    if orjson is not None and set(kwargs) <= _ORJSON_KWARGS:
+        try:
+            return _splice(_orjson_dumps(obj, encode, sort_keys, kwargs.get("indent")), fragments)
+        except TypeError:
+            fragments.clear()  # e.g. integers beyond 64 bits; json copes with those
+
+    kwargs.setdefault("separators", (",", ":"))
+    kwargs.setdefault("ensure_ascii", False)
+    return _splice(json.dumps(obj, default=encode, sort_keys=sort_keys, **kwargs), fragments)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson when installed, falling back to the
+    json module otherwise. Output stays compatible with the default provider
+    (sorted keys, same handling of dates, UUIDs and dataclasses) but is always
+    compact and UTF-8 rather than ASCII-escaped, and understands RawJSON.
+    """
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        kwargs.pop("ensure_ascii", None)
+        return dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
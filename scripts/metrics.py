@@ -0,0 +1,508 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import request
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots of exited workers are kept as they are
+    fcntl = None
+
+# Configuration (environment variables):
+#   NUTRIDISH_METRICS_DIR  directory shared by the gunicorn workers of one
+#                          deployment: every worker writes its metrics there and
+#                          /metrics adds them up. Start each deployment with an
+#                          empty directory. Only the serving process is reported
+#                          when unset.
+METRICS_DIR = os.environ.get("NUTRIDISH_METRICS_DIR", "")
+
+# Seconds between writes of a worker's metrics to METRICS_DIR, by a
+# background thread so idle workers are reported too
+FLUSH_INTERVAL = 1.0
+
+# Totals of exited workers, folded out of their snapshots when /metrics is
+# scraped so the directory does not grow with every restarted worker
+EXITED_FILE = "exited.json"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Endpoint label of database work done outside any request (startup, reloads)
+NO_ENDPOINT = "none"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    """
+    Monotonic per-label-set total.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Histogram:
+    """
+    Distribution of observations over fixed bucket bounds. Per-bucket counts
+    are stored and only made cumulative when rendered; the last slot holds
+    observations above the largest bound and the one after it their sum.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, labels, value):
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+
+class Registry:
+    """
+    The metrics of this process. Updated under one lock, once per request.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collect):
+        """
+        Add a callable returning extra samples at snapshot time, as a list of
+        (name, kind, documentation, labels dict, value); kind is "counter" or
+        "gauge". Lets modules export statistics they already keep.
+        """
+        self.collectors.append(collect)
+
+    def snapshot(self):
+        """
+        JSON-serializable copy of every metric, collector samples included.
+        """
+        with self.lock:
+            metrics = {
+                name: {
+                    "kind": metric.kind,
+                    "help": metric.documentation,
+                    "labelnames": list(metric.labelnames),
+                    "buckets": list(getattr(metric, "buckets", ())),
+                    "values": [[list(labels), value] for labels, value in metric.values.items()],
+                }
+                for name, metric in self.metrics.items()
+            }
+
+        for collect in self.collectors:
+            try:
+                samples = collect()
+            except Exception:
+                continue  # A failing collector must not take /metrics down with it
+            for name, kind, documentation, labels, value in samples:
+                entry = metrics.setdefault(name, {
+                    "kind": kind, "help": documentation, "labelnames": sorted(labels), "buckets": [], "values": []
+                })
+                entry["values"].append([[str(labels[key]) for key in entry["labelnames"]], value])
+        return metrics
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "nutridish_http_requests_total", "Requests handled.", ("endpoint", "method", "status"))
+http_duration = registry.histogram(
+    "nutridish_http_request_duration_seconds", "Time to produce a response.", ("endpoint", "method"))
+http_response_size = registry.histogram(
+    "nutridish_http_response_size_bytes", "Response body size as sent, after compression.", ("endpoint",),
+    SIZE_BUCKETS)
+http_errors = registry.counter(
+    "nutridish_http_errors_total", "Server errors by exception type.", ("endpoint", "type"))
+db_queries = registry.counter(
+    "nutridish_db_queries_total", "SQL statements executed.", ("endpoint",))
+db_seconds = registry.counter(
+    "nutridish_db_query_seconds_total", "Time spent executing SQL and fetching rows.", ("endpoint",))
+db_rows = registry.counter(
+    "nutridish_db_rows_fetched_total", "Rows fetched from SQL results.", ("endpoint",))
+db_queries_per_request = registry.histogram(
+    "nutridish_db_queries_per_request", "SQL statements executed per request.", ("endpoint",),
+    QUERY_COUNT_BUCKETS)
+db_request_duration = registry.histogram(
+    "nutridish_db_request_duration_seconds", "Time spent in SQL per request.", ("endpoint",))
+serialization_duration = registry.histogram(
+    "nutridish_serialization_duration_seconds", "Time spent encoding JSON per request.", ("endpoint",))
+
+
+class RequestStats:
+    """
+    What one request spent, accumulated without locking on the handling
+    thread and added to the registry when the request ends.
+    """
+
+    __slots__ = ("started", "queries", "query_seconds", "rows", "serialization_seconds", "response_bytes",
+                 "status", "errors")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.rows = 0
+        self.serialization_seconds = 0.0
+        self.response_bytes = None
+        self.status = 500
+        self.errors = []
+
+
+_local = threading.local()
+_state = {"pid": os.getpid(), "token": uuid.uuid4().hex[:8], "flusher": None}
+_flush_lock = threading.Lock()
+
+
+def _after_fork():
+    # A forked worker starts from a copy of the parent's values, and maybe of
+    # a lock another parent thread was holding; start over with fresh ones
+    global _flush_lock
+    registry.lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    for metric in registry.metrics.values():
+        metric.values.clear()
+    _state.update(pid=os.getpid(), token=uuid.uuid4().hex[:8], flusher=None)
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def record_query(seconds):
+    """
+    Account for one executed SQL statement.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += seconds
+        return
+    with registry.lock:
+        db_queries.inc((NO_ENDPOINT,))
+        db_seconds.inc((NO_ENDPOINT,), seconds)
+
+
+def record_fetch(seconds, rows):
+    """
+    Account for rows read from an executed statement.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.rows += rows
+        stats.query_seconds += seconds
+        return
+    with registry.lock:
+        db_rows.inc((NO_ENDPOINT,), rows)
+        db_seconds.inc((NO_ENDPOINT,), seconds)
+
+
+def record_serialization(seconds):
+    """
+    Account for time spent encoding a JSON payload.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.serialization_seconds += seconds
+
+
+def record_error(error):
+    """
+    Count an exception turned into a 500 response by a handler, which would
+    otherwise only surface as its message in the response body.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.errors.append(type(error).__name__)
+        return
+    with registry.lock:
+        http_errors.inc((NO_ENDPOINT, type(error).__name__))
+
+
+def start_request():
+    """
+    before_request hook: start accounting for the request, and this
+    worker's flusher on its first one.
+    """
+    if METRICS_DIR and _state["flusher"] != _state["pid"]:
+        _start_flusher()
+    _local.stats = RequestStats()
+
+
+def finish_response(response):
+    """
+    after_request hook: note the status and the size of the body as sent.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.status = response.status_code
+        stats.response_bytes = response.content_length
+    return response
+
+
+def end_request(error=None):
+    """
+    teardown_request hook: add the request's totals to the registry.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        return
+    _local.stats = None
+    if error is not None:
+        stats.errors.append(type(error).__name__)
+
+    endpoint = (request.endpoint or "unmatched",)
+    method = request.method
+    elapsed = time.perf_counter() - stats.started
+
+    with registry.lock:
+        http_requests.inc((endpoint[0], method, str(stats.status)))
+        http_duration.observe((endpoint[0], method), elapsed)
+        if stats.response_bytes is not None:
+            http_response_size.observe(endpoint, stats.response_bytes)
+        for error_type in stats.errors:
+            http_errors.inc((endpoint[0], error_type))
+        if stats.queries:
+            db_queries.inc(endpoint, stats.queries)
+            db_seconds.inc(endpoint, stats.query_seconds)
+        if stats.rows:
+            db_rows.inc(endpoint, stats.rows)
+        db_queries_per_request.observe(endpoint, stats.queries)
+        db_request_duration.observe(endpoint, stats.query_seconds)
+        serialization_duration.observe(endpoint, stats.serialization_seconds)
+
+
+def _snapshot_path(pid, token):
+    return os.path.join(METRICS_DIR, f"metrics-{pid}-{token}.json")
+
+
+def flush():
+    """
+    Write this process's metrics to METRICS_DIR, atomically, for the worker
+    that serves /metrics to add up. Skipped while another thread is at it.
+    """
+    if not METRICS_DIR or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        pid, token = _state["pid"], _state["token"]
+        snapshot = {"pid": pid, "metrics": registry.snapshot()}
+
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = _snapshot_path(pid, token)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass  # Metrics are best effort; the next flush tries again
+    finally:
+        _flush_lock.release()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def _start_flusher():
+    # Started on the first request rather than at import: a thread does not
+    # survive the fork from a preloading gunicorn master
+    with registry.lock:
+        if _state["flusher"] == _state["pid"]:
+            return
+        _state["flusher"] = _state["pid"]
+    threading.Thread(target=_flush_periodically, name="metrics-flush", daemon=True).start()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(merged, metrics, alive):
+    for name, entry in metrics.items():
+        # Gauges describe the present, so only live processes count; counters
+        # and histograms of exited workers are kept so totals never go down
+        if entry["kind"] == "gauge" and not alive:
+            continue
+        target = merged.setdefault(name, dict(entry, values={}))
+        for labels, value in entry["values"]:
+            key = tuple(labels)
+            current = target["values"].get(key)
+            if current is None:
+                target["values"][key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                target["values"][key] = [a + b for a, b in zip(current, value)]
+            else:
+                target["values"][key] = current + value
+
+
+def _load_snapshot(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # Replaced or removed while listing
+
+
+@contextmanager
+def _directory_lock():
+    # Held while collecting, so two workers serving /metrics at once never
+    # fold the same snapshot twice or read one both folded and unfolded.
+    # Yields whether folding is possible.
+    if fcntl is None:
+        yield False
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(os.path.join(METRICS_DIR, "metrics.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield True
+
+
+def _fold_exited(exited, paths):
+    """
+    Replace the snapshots of exited workers by their sum in EXITED_FILE.
+    :param exited: Merged counters and histograms, as built by _merge.
+    """
+    snapshot = {
+        "pid": None,
+        "metrics": {
+            name: dict(entry, values=[[list(labels), value] for labels, value in entry["values"].items()])
+            for name, entry in exited.items()
+        },
+    }
+    path = os.path.join(METRICS_DIR, EXITED_FILE)
+    try:
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+        for dead in paths:
+            os.remove(dead)
+    except OSError:
+        pass  # Folded on a later scrape
+
+
+def collect():
+    """
+    Metrics of every worker sharing METRICS_DIR, or of this process alone.
+    :return: {name: {"kind", "help", "labelnames", "buckets", "values": {labels: value}}}
+    """
+    merged = {}
+    if not METRICS_DIR:
+        _merge(merged, registry.snapshot(), True)
+        return merged
+
+    flush()
+    with _directory_lock() as can_fold:
+        exited = {}
+        snapshot = _load_snapshot(os.path.join(METRICS_DIR, EXITED_FILE))
+        if snapshot is not None:
+            _merge(exited, snapshot["metrics"], False)
+        dead = []
+        for path in sorted(glob.glob(os.path.join(METRICS_DIR, "metrics-*.json"))):
+            snapshot = _load_snapshot(path)
+            if snapshot is None:
+                continue
+            if _pid_alive(snapshot["pid"]):
+                _merge(merged, snapshot["metrics"], True)
+            else:
+                _merge(exited, snapshot["metrics"], False)
+                dead.append(path)
+        if can_fold and dead:
+            _fold_exited(exited, dead)
+    _merge(merged, {name: dict(entry, values=list(entry["values"].items())) for name, entry in exited.items()},
+           False)
+    return merged
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def _series(name, labelnames, labels, extra=()):
+    pairs = [f'{key}="{_escape(value)}"' for key, value in list(zip(labelnames, labels)) + list(extra)]
+    return f"{name}{{{','.join(pairs)}}}" if pairs else name
+
+
+def render(metrics):
+    """
+    Prometheus text exposition format (version 0.0.4) of collected metrics.
+    """
+    lines = []
+    for name in sorted(metrics):
+        entry = metrics[name]
+        labelnames = entry["labelnames"]
+        lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {entry['kind']}")
+        for labels, value in sorted(entry["values"].items()):
+            if entry["kind"] != "histogram":
+                lines.append(f"{_series(name, labelnames, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(entry["buckets"] + [float("inf")], value[:-1]):
+                cumulative += count
+                le = _format_value(float(bound))
+                lines.append(f"{_series(name + '_bucket', labelnames, labels, [('le', le)])} {cumulative}")
+            lines.append(f"{_series(name + '_sum', labelnames, labels)} {_format_value(value[-1])}")
+            lines.append(f"{_series(name + '_count', labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """
+    Account for every request: latency, status, response size, SQL work,
+    JSON encoding time and errors. Install before any hook that may answer
+    a request early, so that those responses are timed as well.
+    """
+    app.before_request(start_request)
+    app.after_request(finish_response)
+    app.teardown_request(end_request)
+    if METRICS_DIR:
+        atexit.register(flush)
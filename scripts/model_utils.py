@@ -1,12 +1,30 @@
-import tensorflow as tf
+import io
+import os
+import queue
+import threading
+import time
 import numpy as np
 from pathlib import Path
 from PIL import Image
-import io
 
-# Load the model once at startup
 model_path = Path(__file__).resolve().parent.parent / "model" / "model.h5"
-model = tf.keras.models.load_model(model_path)
+
+# Configuration (environment variables):
+#   NUTRIDISH_MODEL_BACKEND         "numpy" (no TensorFlow, weights from ExportNumpyModel.py),
+#                                   "keras", or "auto" (numpy when exported weights exist)
+#   NUTRIDISH_CLASSIFY_MAX_BATCH    images per forward pass
+#   NUTRIDISH_CLASSIFY_MAX_WAIT_MS  how long the first queued image waits for company
+MODEL_BACKEND = os.environ.get("NUTRIDISH_MODEL_BACKEND", "auto").lower()
+MAX_BATCH_SIZE = int(os.environ.get("NUTRIDISH_CLASSIFY_MAX_BATCH", 16))
+MAX_WAIT = float(os.environ.get("NUTRIDISH_CLASSIFY_MAX_WAIT_MS", 10)) / 1000
+
+# Seconds a request waits for its prediction before giving up
+PREDICT_TIMEOUT = 30
+
+INPUT_SIZE = (128, 128)
+
+# Uploads with more pixels are rejected before decoding (phone photos are ~12 MP)
+MAX_PIXELS = int(os.environ.get("NUTRIDISH_CLASSIFY_MAX_PIXELS", 50_000_000))
 
 # Define class labels (update based on your trained model)
 class_labels = [
@@ -15,17 +33,202 @@ class_labels = [
     "peanut", "pork", "potato", "rice", "shrimp", "tofu", "tomato", "zucchini"
 ]
 
+_model = None
+_model_pid = None
+_model_lock = threading.Lock()
+
+
+def _load_model():
+    from scripts.numpy_model import WEIGHTS_PATH, NumpyModel
+    if MODEL_BACKEND == "numpy" or (MODEL_BACKEND == "auto" and WEIGHTS_PATH.exists()):
+        return NumpyModel.load()
+    if MODEL_BACKEND not in ("auto", "keras"):
+        raise ValueError(f"Unknown NUTRIDISH_MODEL_BACKEND '{MODEL_BACKEND}'")
+    import tensorflow as tf  # Heavy; only imported when a prediction is needed
+    return tf.keras.models.load_model(model_path)
+
+
+def get_model():
+    """
+    Load the model on first use, once per process.
+    Importing this module stays cheap, so workers boot fast and only the
+    ones that classify images pay for loading it. With the NumPy backend
+    TensorFlow is never imported. A model loaded before a fork is not
+    reused by the child.
+    """
+    global _model, _model_pid
+    if _model is not None and _model_pid == os.getpid():
+        return _model
+
+    with _model_lock:
+        if _model is None or _model_pid != os.getpid():
+            _model = _load_model()
+            _model_pid = os.getpid()
+        return _model
+
+
+def predict_batch(images):
+    """
+    Run one forward pass.
+    :param images: Array of shape (n, 128, 128, 3).
+    :return: Array of shape (n, len(class_labels)) with class probabilities.
+    """
+    return np.asarray(get_model().predict_on_batch(images))
+
+
+class PendingPrediction:
+    """
+    Result slot of one submitted request, filled in by the batching thread.
+    """
+
+    def __init__(self, images):
+        self.images = images
+        self.result = None
+        self.error = None
+        self.queued_at = time.monotonic()
+        self._done = threading.Event()
+
+    def set_result(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=PREDICT_TIMEOUT):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Timed out waiting for the image classifier")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class MicroBatcher:
+    """
+    Groups concurrent prediction requests into batched forward passes.
+    A background thread takes the first waiting request, then keeps
+    collecting until the batch holds max_batch_size images or max_wait has
+    passed, runs one forward pass and hands every caller its own rows.
+    Requests are only grouped when they run concurrently in one process
+    (threaded server or gunicorn gthread workers); otherwise each is served
+    after at most max_wait.
+    """
+
+    def __init__(self, predict=predict_batch, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.images = 0
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork; start one per process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, args=(self._queue,), daemon=True,
+                                 name="classifier-batcher").start()
+                self._pid = os.getpid()
+
+    def submit(self, images):
+        """
+        Queue images (array of shape (n, 128, 128, 3)) for prediction.
+        :return: PendingPrediction; wait() returns the (n, classes) probabilities.
+        """
+        self._ensure_worker()
+        pending = PendingPrediction(images)
+        self._queue.put(pending)
+        return pending
+
+    def _collect(self, pending_queue):
+        batch = [pending_queue.get()]
+        size = len(batch[0].images)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = pending_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            size += len(pending.images)
+        return batch
+
+    def _run(self, pending_queue):
+        while True:
+            batch = self._collect(pending_queue)
+            try:
+                outputs = self.predict(np.concatenate([pending.images for pending in batch]))
+            except Exception as e:
+                for pending in batch:
+                    pending.set_result(error=e)
+                continue
+
+            self.batches += 1
+            start = 0
+            for pending in batch:
+                end = start + len(pending.images)
+                pending.set_result(outputs[start:end])
+                start = end
+            self.images += start
+
+
+batcher = MicroBatcher()
+
+_buffers = threading.local()
+
+
+class InvalidImage(ValueError):
+    """Raised for uploads that cannot be decoded or are too large."""
+
+
+def _buffer(count):
+    """
+    Per-thread float32 input buffer with room for at least count images,
+    reused across requests instead of allocating a fresh array each time.
+    """
+    buffer = getattr(_buffers, "images", None)
+    if buffer is None or len(buffer) < count:
+        buffer = _buffers.images = np.empty((max(count, 1), *INPUT_SIZE, 3), dtype=np.float32)
+    return buffer[:count]
+
+
+def decode_image(image_bytes, out):
+    """
+    Decode one upload into an (128, 128, 3) float32 slot scaled to [0, 1].
+    JPEGs are decoded at reduced scale (draft mode) since only 128x128 is
+    needed, and every upload is converted to RGB (RGBA/grayscale/palette).
+    :raises InvalidImage: If the bytes are not an image or exceed MAX_PIXELS.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            width, height = image.size
+            if width * height > MAX_PIXELS:
+                raise InvalidImage(f"Image of {width}x{height} pixels exceeds the limit of {MAX_PIXELS}")
+            image.draft("RGB", INPUT_SIZE)
+            image = image.convert("RGB").resize(INPUT_SIZE)  # Match your model's input size
+    except InvalidImage:
+        raise
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f"Could not decode image: {e}")
+    np.divide(np.asarray(image), 255.0, out=out, dtype=np.float32)  # Normalize to [0, 1] range
+
+
 def preprocess_image(image_bytes):
     """
     Preprocess the uploaded image for the CNN model.
     :param image_bytes: The raw image bytes.
-    :return: Preprocessed image ready for prediction.
+    :return: Preprocessed image ready for prediction, shape (1, 128, 128, 3).
+             It lives in this thread's reusable buffer, valid until the next call.
     """
-    image = Image.open(io.BytesIO(image_bytes))
-    image = image.resize((128, 128))  # Match your model's input size
-    image = np.array(image) / 255.0  # Normalize to [0, 1] range
-    image = np.expand_dims(image, axis=0)  # Add batch dimension
-    return image
+    images = _buffer(1)
+    decode_image(image_bytes, images[0])
+    return images
 
 
 def predict_ingredient(image_bytes):
@@ -35,8 +238,33 @@ def predict_ingredient(image_bytes):
     :return: Predicted ingredient and confidence score.
     """
     image = preprocess_image(image_bytes)
-    predictions = model.predict(image)
-    predicted_index = np.argmax(predictions)
+    predictions = batcher.submit(image).wait()
+    predicted_index = np.argmax(predictions[0])
     confidence = predictions[0][predicted_index]
     predicted_label = class_labels[predicted_index]
     return predicted_label, confidence
+
+
+def predict_ingredients(images_bytes):
+    """
+    Predict the ingredient in each of several images with one forward pass.
+    :param images_bytes: List of raw image bytes.
+    :return: List aligned with images_bytes of (label, confidence), or an
+             InvalidImage for uploads that could not be used.
+    """
+    images = _buffer(len(images_bytes))
+    results = [None] * len(images_bytes)
+    valid = []
+    for i, image_bytes in enumerate(images_bytes):
+        try:
+            decode_image(image_bytes, images[len(valid)])
+            valid.append(i)
+        except InvalidImage as e:
+            results[i] = e
+
+    if valid:
+        predictions = batcher.submit(images[:len(valid)]).wait()
+        for i, probabilities in zip(valid, predictions):
+            predicted_index = int(np.argmax(probabilities))
+            results[i] = (class_labels[predicted_index], probabilities[predicted_index])
+    return results
@@ -0,0 +1,340 @@
+import json
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pathlib import Path
+
+MODEL_DIR = Path(__file__).resolve().parent.parent / "model"
+ARCHITECTURE_PATH = MODEL_DIR / "model.json"
+WEIGHTS_PATH = MODEL_DIR / "model_weights.npz"
+
+# Names under which each layer type's get_weights() arrays are exported,
+# stored as "<layer name>/<weight name>" in the weights file
+WEIGHT_NAMES = {
+    "Conv2D": ["kernel", "bias"],
+    "DepthwiseConv2D": ["depthwise_kernel", "bias"],
+    "BatchNormalization": ["gamma", "beta", "moving_mean", "moving_variance"],
+    "Dense": ["kernel", "bias"],
+}
+
+# Layers that do nothing at inference time
+PASSTHROUGH_LAYERS = {"InputLayer", "Dropout"}
+
+# Tensor name of the model input
+MODEL_INPUT = "input"
+
+
+class UnsupportedLayer(ValueError):
+    """Raised when the architecture uses a layer or option the runtime lacks."""
+
+
+def _same_padding(size, kernel, stride):
+    # TensorFlow's "same": pad so that out = ceil(in / stride), extra at the end
+    out = -(-size // stride)
+    total = max((out - 1) * stride + kernel - size, 0)
+    return total // 2, total - total // 2
+
+
+def _pad(x, kernel_size, strides, padding):
+    if padding == "valid":
+        return x
+    top, bottom = _same_padding(x.shape[1], kernel_size[0], strides[0])
+    left, right = _same_padding(x.shape[2], kernel_size[1], strides[1])
+    if not (top or bottom or left or right):
+        return x
+    return np.pad(x, ((0, 0), (top, bottom), (left, right), (0, 0)))
+
+
+def _activate(x, activation):
+    if activation == "relu6":
+        return np.clip(x, 0, 6, out=x)
+    if activation == "relu":
+        return np.maximum(x, 0, out=x)
+    if activation == "softmax":
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return np.divide(x, x.sum(axis=-1, keepdims=True), out=x)
+    if activation in ("linear", None):
+        return x
+    raise UnsupportedLayer(f"Unsupported activation '{activation}'")
+
+
+class Conv:
+    """
+    Conv2D or DepthwiseConv2D (NHWC, float32) with a bias and a fused
+    activation. A following BatchNormalization is folded into the kernel
+    and bias, so it costs nothing at inference time.
+    """
+
+    def __init__(self, kernel, bias, strides, padding, depthwise, activation="linear"):
+        self.kernel = np.ascontiguousarray(kernel, dtype=np.float32)
+        self.strides = tuple(strides)
+        self.padding = padding
+        self.depthwise = depthwise
+        self.activation = activation
+
+        height, width, channels, filters = self.kernel.shape  # filters: multiplier if depthwise
+        out_channels = channels * filters if depthwise else filters
+        self.bias = np.zeros(out_channels, np.float32) if bias is None else bias.astype(np.float32)
+
+    def fold_batch_norm(self, gamma, beta, mean, variance, epsilon):
+        scale = (gamma / np.sqrt(variance + epsilon)).astype(np.float32)
+        if self.depthwise:
+            height, width, channels, multiplier = self.kernel.shape
+            self.kernel = self.kernel * scale.reshape(channels, multiplier)
+        else:
+            self.kernel = self.kernel * scale
+        self.bias = ((self.bias - mean) * scale + beta).astype(np.float32)
+
+    def __call__(self, x):
+        kernel_size = self.kernel.shape[:2]
+        x = _pad(x, kernel_size, self.strides, self.padding)
+        stride_h, stride_w = self.strides
+        if self.depthwise:
+            out = self._depthwise(x, kernel_size, stride_h, stride_w)
+        elif kernel_size == (1, 1):
+            x = x[:, ::stride_h, ::stride_w, :]
+            out = x.reshape(-1, x.shape[-1]) @ self.kernel.reshape(x.shape[-1], -1)
+            out = out.reshape(*x.shape[:3], -1)
+        else:
+            # im2col through a strided view, then one matrix product
+            windows = sliding_window_view(x, kernel_size, axis=(1, 2))[:, ::stride_h, ::stride_w]
+            batch, out_h, out_w = windows.shape[:3]
+            columns = windows.transpose(0, 1, 2, 4, 5, 3).reshape(batch * out_h * out_w, -1)
+            out = (columns @ self.kernel.reshape(columns.shape[1], -1)).reshape(batch, out_h, out_w, -1)
+        out += self.bias
+        return _activate(out, self.activation)
+
+    def _depthwise(self, x, kernel_size, stride_h, stride_w):
+        height, width, channels, multiplier = self.kernel.shape
+        if multiplier != 1:
+            x = np.repeat(x, multiplier, axis=-1)
+        kernel = self.kernel.reshape(height, width, channels * multiplier)
+        out_h = (x.shape[1] - height) // stride_h + 1
+        out_w = (x.shape[2] - width) // stride_w + 1
+        out = np.zeros((x.shape[0], out_h, out_w, kernel.shape[-1]), np.float32)
+        # One vectorized multiply-add per kernel tap
+        for i in range(height):
+            for j in range(width):
+                out += x[:, i:i + out_h * stride_h:stride_h, j:j + out_w * stride_w:stride_w, :] * kernel[i, j]
+        return out
+
+
+class BatchNorm:
+    """
+    Inference-mode BatchNormalization that could not be folded into a conv.
+    """
+
+    def __init__(self, gamma, beta, mean, variance, epsilon):
+        self.scale = (gamma / np.sqrt(variance + epsilon)).astype(np.float32)
+        self.shift = (beta - mean * self.scale).astype(np.float32)
+
+    def __call__(self, x):
+        return x * self.scale + self.shift
+
+
+class Dense:
+    def __init__(self, kernel, bias, activation):
+        self.kernel = kernel.astype(np.float32)
+        self.bias = np.zeros(kernel.shape[1], np.float32) if bias is None else bias.astype(np.float32)
+        self.activation = activation
+
+    def __call__(self, x):
+        return _activate(x @ self.kernel + self.bias, self.activation)
+
+
+class ZeroPadding:
+    def __init__(self, padding):
+        (top, bottom), (left, right) = padding
+        self.pad_width = ((0, 0), (top, bottom), (left, right), (0, 0))
+
+    def __call__(self, x):
+        return np.pad(x, self.pad_width)
+
+
+def _relu_activation(config):
+    if config.get("negative_slope") or config.get("threshold"):
+        raise UnsupportedLayer("Leaky or thresholded ReLU is not supported")
+    max_value = config.get("max_value")
+    if max_value is None:
+        return "relu"
+    if float(max_value) == 6.0:
+        return "relu6"
+    raise UnsupportedLayer(f"ReLU with max_value {max_value} is not supported")
+
+
+def _flatten_layers(config):
+    """
+    Flatten a Sequential (possibly wrapping Functional models) into a list of
+    (name, class_name, config, input names), in execution order.
+    """
+    layers = []
+    previous = None
+    for layer in config["config"]["layers"]:
+        class_name, layer_config = layer["class_name"], layer["config"]
+        if class_name in ("Functional", "Sequential", "Model"):
+            nested = _flatten_layers(layer) if class_name == "Sequential" else _functional_layers(layer)
+            if previous is not None:
+                nested[0] = (nested[0][0], nested[0][1], nested[0][2], [previous])
+            layers.extend(nested)
+        else:
+            layers.append((layer_config["name"], class_name, layer_config, [previous] if previous else []))
+        previous = layers[-1][0]
+    return layers
+
+
+def _inbound_names(node):
+    names = []
+
+    def collect(value):
+        if isinstance(value, dict) and value.get("class_name") == "__keras_tensor__":
+            names.append(value["config"]["keras_history"][0])
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+
+    collect(node.get("args", []))
+    return names
+
+
+def _functional_layers(config):
+    layers = []
+    for layer in config["config"]["layers"]:
+        nodes = layer.get("inbound_nodes") or [{}]
+        if len(nodes) > 1:
+            raise UnsupportedLayer(f"Shared layer '{layer['config']['name']}' is not supported")
+        layers.append((layer["config"]["name"], layer["class_name"], layer["config"], _inbound_names(nodes[0])))
+    output_name = config["config"]["output_layers"][0][0]
+    if layers[-1][0] != output_name:
+        raise UnsupportedLayer("The functional output must be its last layer")
+    return layers
+
+
+class NumpyModel:
+    """
+    Inference engine for the ingredient classifier in pure NumPy.
+    Reads the Keras architecture (model/model.json) and weights exported
+    with ExportNumpyModel.py, folds every BatchNormalization into the
+    preceding convolution and ReLU6 into its activation, and runs batched
+    float32 forward passes without TensorFlow.
+    """
+
+    def __init__(self, architecture, weights):
+        layers = _flatten_layers(architecture)
+
+        # Input and Dropout layers are aliases of the tensor they receive
+        aliases = {}
+        for name, class_name, _, inputs in layers:
+            if class_name in PASSTHROUGH_LAYERS:
+                aliases[name] = inputs[0] if inputs else MODEL_INPUT
+
+        def resolve(name):
+            while name in aliases:
+                name = aliases[name]
+            return name
+
+        consumers = {}
+        for name, class_name, _, inputs in layers:
+            if class_name not in PASSTHROUGH_LAYERS:
+                for input_name in inputs:
+                    consumers[resolve(input_name)] = consumers.get(resolve(input_name), 0) + 1
+
+        self.steps = []  # (tensor name, op, input tensor names)
+        producer = {}  # layer name -> step computing its value (fused layers share one)
+        for name, class_name, config, inputs in layers:
+            if class_name in PASSTHROUGH_LAYERS:
+                continue
+            inputs = [resolve(input_name) for input_name in inputs]
+            source = producer.get(inputs[0]) if len(inputs) == 1 else None
+            if source is not None and consumers.get(inputs[0]) == 1:
+                fused = self._fuse(source[1], class_name, config, name, weights)
+                if fused:
+                    producer[name] = source
+                    continue
+
+            step = (name, self._build(class_name, config, name, weights), [
+                producer[input_name][0] if input_name in producer else input_name for input_name in inputs
+            ])
+            producer[name] = step
+            self.steps.append(step)
+
+        self.output = producer[resolve(layers[-1][0])][0]
+
+        # After its last use a tensor can be released
+        self._last_use = {}
+        for index, (_, _, inputs) in enumerate(self.steps):
+            for input_name in inputs:
+                self._last_use[input_name] = index
+
+    @staticmethod
+    def _batch_norm_params(config, name, weights):
+        if config.get("axis", -1) not in (-1, 3, [-1], [3]):
+            raise UnsupportedLayer(f"BatchNormalization '{name}' is not over channels")
+        return (
+            weights.get(f"{name}/gamma", np.float32(1)), weights.get(f"{name}/beta", np.float32(0)),
+            weights[f"{name}/moving_mean"], weights[f"{name}/moving_variance"],
+            config.get("epsilon", 1e-3),
+        )
+
+    def _fuse(self, op, class_name, config, name, weights):
+        """
+        Merge a layer into the op producing its only input, when possible.
+        :return: True if the layer was fused.
+        """
+        if not isinstance(op, (Conv, Dense)) or op.activation not in ("linear", None):
+            return False
+        if class_name == "BatchNormalization" and isinstance(op, Conv):
+            op.fold_batch_norm(*self._batch_norm_params(config, name, weights))
+            return True
+        if class_name == "ReLU":
+            op.activation = _relu_activation(config)
+            return True
+        if class_name == "Activation":
+            op.activation = config["activation"]
+            return True
+        return False
+
+    def _build(self, class_name, config, name, weights):
+        if class_name in ("Conv2D", "DepthwiseConv2D"):
+            depthwise = class_name == "DepthwiseConv2D"
+            if tuple(config.get("dilation_rate", (1, 1))) != (1, 1) or config.get("groups", 1) != 1:
+                raise UnsupportedLayer(f"Dilated or grouped convolution '{name}' is not supported")
+            kernel = weights.get(f"{name}/depthwise_kernel" if depthwise else f"{name}/kernel")
+            if kernel is None:
+                kernel = weights[f"{name}/kernel"]
+            return Conv(kernel, weights.get(f"{name}/bias"), config["strides"], config["padding"],
+                        depthwise, config.get("activation", "linear"))
+        if class_name == "BatchNormalization":
+            return BatchNorm(*self._batch_norm_params(config, name, weights))
+        if class_name in ("ReLU", "Activation"):
+            activation = _relu_activation(config) if class_name == "ReLU" else config["activation"]
+            return lambda x: _activate(x.copy(), activation)
+        if class_name == "Add":
+            return lambda *tensors: sum(tensors[1:], tensors[0])
+        if class_name == "ZeroPadding2D":
+            return ZeroPadding(config["padding"])
+        if class_name == "GlobalAveragePooling2D":
+            if config.get("keepdims") or config.get("data_format", "channels_last") != "channels_last":
+                raise UnsupportedLayer("Only channels_last GlobalAveragePooling2D is supported")
+            return lambda x: x.mean(axis=(1, 2), dtype=np.float32)
+        if class_name == "Dense":
+            return Dense(weights[f"{name}/kernel"], weights.get(f"{name}/bias"), config.get("activation"))
+        raise UnsupportedLayer(f"Layer type {class_name} ('{name}') is not supported")
+
+    @classmethod
+    def load(cls, architecture_path=ARCHITECTURE_PATH, weights_path=WEIGHTS_PATH):
+        with open(architecture_path, "r", encoding="utf-8") as f:
+            architecture = json.load(f)
+        with np.load(weights_path) as weights:
+            return cls(architecture, {key: weights[key] for key in weights.files})
+
+    def predict_on_batch(self, images):
+        """
+        :param images: Array of shape (n, 128, 128, 3), scaled to [0, 1].
+        :return: float32 array of shape (n, classes) with class probabilities.
+        """
+        tensors = {MODEL_INPUT: np.asarray(images, dtype=np.float32)}
+        for index, (name, op, inputs) in enumerate(self.steps):
+            tensors[name] = op(*[tensors[input_name] for input_name in inputs])
+            for input_name in inputs:
+                if self._last_use[input_name] == index and input_name != self.output:
+                    del tensors[input_name]
+        return tensors[self.output]
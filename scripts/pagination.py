@@ -0,0 +1,51 @@
+import base64
+import json
+import math
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(kind, sort_key):
+    """
+    Encode the sort key of the last row on a page into an opaque cursor.
+    :param kind: Which ordering the key belongs to ("ranked" or "table").
+    :param sort_key: List of values making up the sort key.
+    :return: URL-safe cursor string.
+    """
+    payload = json.dumps([kind] + list(sort_key), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _valid_value(value, value_type):
+    if isinstance(value, bool):
+        return False  # JSON true/false would pass as int
+    if value_type is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, value_type)
+
+
+def decode_cursor(cursor, kind, key_types):
+    """
+    Decode a cursor produced by encode_cursor.
+    :param cursor: The cursor string sent by the client.
+    :param kind: The ordering the caller expects the cursor to belong to.
+    :param key_types: Expected type of each sort key value, e.g. (float, int);
+        float accepts any finite number.
+    :return: The sort key as a list.
+    :raises InvalidCursor: If the cursor is malformed or its key does not match key_types.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise InvalidCursor("Malformed cursor")
+
+    if not isinstance(payload, list) or not payload or payload[0] != kind:
+        raise InvalidCursor("Cursor does not belong to this search")
+
+    sort_key = payload[1:]
+    if len(sort_key) != len(key_types) or not all(map(_valid_value, sort_key, key_types)):
+        raise InvalidCursor("Malformed cursor")
+    return sort_key
@@ -0,0 +1,164 @@
+import numpy as np
+from scripts.recipe_catalog import get_catalog
+from scripts.recipe_flags import FLAG_BITS, INGREDIENTS, MEAL_TYPES, flag_mask, resolve_ingredient
+from scripts.recipe_serializer import required_columns, select_fields, serialize_recipe
+
+# Recipes returned when the request does not say
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+_INGREDIENT_BITS = [(ingredient, FLAG_BITS[f"has_{ingredient}"]) for ingredient in INGREDIENTS]
+INGREDIENT_MASK = flag_mask(f"has_{ingredient}" for ingredient in INGREDIENTS)
+
+
+class InvalidPantry(ValueError):
+    """Raised for a pantry request that cannot be answered."""
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(masks):
+        """
+        Number of set bits of every uint64 in masks.
+        """
+        return np.bitwise_count(masks).astype(np.int64)
+else:  # NumPy < 2.0
+    def popcount(masks):
+        """
+        Number of set bits of every uint64 in masks.
+        """
+        bits = np.unpackbits(np.ascontiguousarray(masks).view(np.uint8).reshape(-1, 8), axis=1)
+        return bits.sum(axis=1, dtype=np.int64)
+
+
+def ingredient_names(mask):
+    """
+    Ingredients whose bits are set in a flag mask, in INGREDIENTS order.
+    """
+    mask = int(mask)
+    return [ingredient for ingredient, bit in _INGREDIENT_BITS if mask & bit]
+
+
+def _columns(names, what):
+    """
+    Resolve a list (or comma-separated string) of ingredient names.
+    :param what: Name used in the error for unknown ingredients, or None to
+                 return them instead.
+    :return: (columns, unknown names)
+    """
+    if isinstance(names, str):
+        names = [name for name in names.split(",") if name.strip()]
+    columns, unknown = [], []
+    for name in names or []:
+        column = resolve_ingredient(str(name))
+        if column is None:
+            unknown.append(str(name).strip().lower())
+        elif column not in columns:
+            columns.append(column)
+    if what and unknown:
+        raise InvalidPantry(f"Unknown {what} ingredient(s): {', '.join(map(str, unknown))}")
+    return columns, unknown
+
+
+def rank_pantry(masks, ratings, pantry, required=0, excluded=0, limit=DEFAULT_LIMIT):
+    """
+    Rank recipes by how many pantry ingredients they use.
+    Coverage is the popcount of each recipe's flag bits ANDed with the
+    pantry bitmap, so the cost is one pass over the catalog however many
+    ingredients are in the pantry. Ties are broken by rating (missing
+    ratings last), then by position.
+    :param masks: uint64 flag masks of the catalog (RecipeFlagIndex.masks).
+    :param ratings: float64 ratings aligned with masks (NaN for NULL).
+    :param pantry: Bitmask of the ingredients at hand.
+    :param required: Bitmask of flags every recipe must have.
+    :param excluded: Bitmask of flags no recipe may have.
+    :param limit: Number of recipes to return.
+    :return: (positions, coverage), best first; only recipes using at least
+             one pantry ingredient are returned.
+    """
+    required, excluded, pantry = np.uint64(required), np.uint64(excluded), np.uint64(pantry)
+    coverage = popcount(masks & pantry)
+    eligible = (coverage > 0) & ((masks & required) == required) & ((masks & excluded) == 0)
+    candidates = np.flatnonzero(eligible)
+    if len(candidates) > limit:
+        # Only recipes tying with the limit-th best coverage can make the cut
+        threshold = np.partition(coverage[candidates], -limit)[-limit]
+        candidates = candidates[coverage[candidates] >= threshold]
+
+    candidate_ratings = np.nan_to_num(ratings[candidates], nan=-np.inf)
+    order = np.lexsort((candidates, -candidate_ratings, -coverage[candidates]))[:limit]
+    positions = candidates[order]
+    return positions, coverage[positions]
+
+
+def search_pantry(ingredients, required=None, excluded=None, meal_type=None, limit=DEFAULT_LIMIT, restricted=0):
+    """
+    Find the recipes that make the most of the ingredients at hand.
+    :param ingredients: Ingredient names available (typed or detected).
+    :param required: Ingredient names every recipe must contain; they count as available.
+    :param excluded: Ingredient names no recipe may contain.
+    :param meal_type: Optional meal type (breakfast, lunch, dinner, snack, dessert).
+    :param limit: Number of recipes to return (at most MAX_LIMIT).
+    :param restricted: Restriction bitmask of ingredients to avoid (see scripts.dietary_restrictions).
+    :return: (catalog, positions, coverage, pantry, unknown) where pantry is
+             the bitmask of available ingredients and unknown lists the
+             ingredients recipes are not tagged with (they are ignored).
+    :raises InvalidPantry: For unknown required/excluded ingredients or meal type.
+    """
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_LIMIT:
+        raise InvalidPantry(f"limit must be between 1 and {MAX_LIMIT}")
+    available, unknown = _columns(ingredients, None)
+    must_have, _ = _columns(required, "required")
+    must_not_have, _ = _columns(excluded, "excluded")
+    if set(must_have) & set(must_not_have):
+        raise InvalidPantry("An ingredient cannot be both required and excluded")
+
+    required_flags = list(must_have)
+    if meal_type:
+        meal_type = meal_type.strip().lower()
+        if meal_type not in MEAL_TYPES:
+            raise InvalidPantry(f"Unknown meal type '{meal_type}', expected one of {', '.join(MEAL_TYPES)}")
+        required_flags.append(f"is_{meal_type}")
+
+    catalog = get_catalog()
+    pantry = flag_mask(available + must_have)
+    if not pantry:
+        return catalog, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), pantry, unknown
+
+    positions, coverage = rank_pantry(
+        catalog.flags.masks, catalog.numeric["rating"], pantry,
+        flag_mask(required_flags), flag_mask(must_not_have) | np.uint64(restricted), limit
+    )
+    return catalog, positions, coverage, pantry, unknown
+
+
+def pantry_recipes(user_input, view="full", fields=None, restricted=0):
+    """
+    Answer a pantry request body.
+    :param user_input: {"ingredients": [...], "required": [...], "excluded": [...],
+                        "meal_type": "dinner", "limit": 20}; only ingredients is needed.
+    :param view: "full" or "summary" representation of each recipe.
+    :param fields: Optional explicit list of fields to return (overrides view).
+    :param restricted: Restriction bitmask of the requesting user.
+    :return: {"recipes": [...], "unknown_ingredients": [...]}
+    """
+    specs = select_fields("pantry", view, fields)
+    catalog, positions, coverage, pantry, unknown = search_pantry(
+        user_input.get("ingredients") or [],
+        required=user_input.get("required"),
+        excluded=user_input.get("excluded"),
+        meal_type=user_input.get("meal_type"),
+        limit=user_input.get("limit", DEFAULT_LIMIT),
+        restricted=restricted,
+    )
+
+    columns = required_columns(specs)
+    recipes = []
+    for position, count in zip(positions, coverage):
+        ingredients = catalog.flags.masks[position] & INGREDIENT_MASK
+        context = {
+            "coverage": int(count),
+            "matched": ingredient_names(ingredients & pantry),
+            "missing": ingredient_names(ingredients & ~pantry),
+        }
+        recipes.append(serialize_recipe(catalog.row(position, columns), specs, context))
+    return {"recipes": recipes, "unknown_ingredients": unknown}
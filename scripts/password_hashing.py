@@ -0,0 +1,326 @@
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+try:
+    import fcntl
+except ImportError:  # Windows: the limits below apply to each server process
+    fcntl = None
+
+# Configuration (environment variables):
+#   NUTRIDISH_BCRYPT_ROUNDS     bcrypt work factor for new hashes; existing
+#                               hashes are upgraded on the next login
+#   NUTRIDISH_HASH_WORKERS      hashes running at once, summed over all server
+#                               processes sharing NUTRIDISH_HASH_SLOT_DIR
+#   NUTRIDISH_HASH_MAX_PENDING  hashes queued or running, summed the same way,
+#                               before new ones are refused
+#   NUTRIDISH_HASH_SLOT_DIR     directory of the lock files that carry both limits
+#                               across gunicorn workers (default: the temp dir)
+BCRYPT_ROUNDS = int(os.environ.get("NUTRIDISH_BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.environ.get("NUTRIDISH_HASH_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+MAX_PENDING = int(os.environ.get("NUTRIDISH_HASH_MAX_PENDING", HASH_WORKERS * 4))
+HASH_SLOT_DIR = os.environ.get(
+    "NUTRIDISH_HASH_SLOT_DIR", os.path.join(tempfile.gettempdir(), "nutridish-hash-slots")
+)
+
+# Seconds a request waits for its hash before giving up
+HASH_TIMEOUT = 30
+
+
+class HashingBusy(Exception):
+    """
+    Raised when too many hashes are pending; the request should be retried
+    after retry_after seconds.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Too many login requests, please retry shortly")
+        self.retry_after = retry_after
+
+
+class HostSlots:
+    """
+    A counting semaphore shared by every process on the host that uses the
+    same directory: holding a slot means holding an exclusive flock on one
+    of `count` files, so a slot is freed even if its holder dies. Without
+    fcntl the slots only count within the current process.
+    """
+
+    def __init__(self, directory, name, count):
+        self.directory = directory
+        self.name = name
+        self.count = count
+        self._files = None
+        self._held = set()
+        self._pid = None
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    def _slot_files(self):
+        # Descriptors inherited over a fork share their locks with the parent
+        if self._pid != os.getpid():
+            self._files = [None] * self.count
+            self._held = set()
+            self._pid = os.getpid()
+            if fcntl is not None:
+                os.makedirs(self.directory, exist_ok=True)
+        return self._files
+
+    def _claim(self):
+        # Called with self._lock held
+        files = self._slot_files()
+        for slot in range(self.count):
+            if slot in self._held:
+                continue
+            if fcntl is not None:
+                if files[slot] is None:
+                    path = os.path.join(self.directory, f"{self.name}-{slot}.lock")
+                    files[slot] = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(files[slot], fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+            self._held.add(slot)
+            return slot
+        return None
+
+    def try_acquire(self):
+        """
+        Claim a free slot without waiting.
+        :return: The slot number, or None if every slot is taken.
+        """
+        with self._lock:
+            return self._claim()
+
+    def acquire(self):
+        """
+        Claim a slot, waiting for one to be released. When every slot is
+        busy the caller sleeps in a blocking flock on one held by another
+        process (picked by pid, so waiters spread over the slots) rather
+        than polling; it may then wait for that one while another frees up.
+        :return: The slot number.
+        """
+        with self._lock:
+            slot = self._claim()
+            while slot is None:
+                others = [] if fcntl is None else [other for other in range(self.count) if other not in self._held]
+                if others:
+                    slot = others[os.getpid() % len(others)]
+                    self._held.add(slot)  # Reserved, so other threads here do not wait on it too
+                    break
+                self._released.wait()  # Every slot is held by this process's own threads
+                slot = self._claim()
+            else:
+                return slot
+        try:
+            fcntl.flock(self._files[slot], fcntl.LOCK_EX)
+        except BaseException:
+            with self._lock:
+                self._held.discard(slot)
+                self._released.notify()
+            raise
+        return slot
+
+    def release(self, slot):
+        with self._lock:
+            if slot not in self._held or self._pid != os.getpid():
+                return
+            if fcntl is not None:
+                fcntl.flock(self._files[slot], fcntl.LOCK_UN)
+            self._held.discard(slot)
+            self._released.notify()
+
+
+# Running slots of a pool process, opened on its first job
+_running_slots = {}
+
+
+def _timed(slot_dir, workers, function, *args):
+    # Runs in the pool; wall-clock times so the parent can compare them with its own.
+    # The wait for a running slot counts as queue wait.
+    running = _running_slots.get((slot_dir, workers))
+    if running is None:
+        running = _running_slots[(slot_dir, workers)] = HostSlots(slot_dir, "running", workers)
+    slot = running.acquire()
+    try:
+        started = time.time()
+        result = function(*args)
+        return result, started, time.time()
+    finally:
+        running.release(slot)
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_rounds(hashed):
+    """
+    Work factor of a bcrypt hash ($2b$<rounds>$...), or None if it is not one.
+    """
+    try:
+        return int(hashed.split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class Timing:
+    """
+    Count, total and maximum of a duration, in seconds.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 6),
+            "mean_seconds": round(self.total / self.count, 6) if self.count else 0.0,
+            "max_seconds": round(self.max, 6),
+        }
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small process pool so request workers never spend
+    their own CPU on it, with admission control: once max_pending hashes
+    are queued or running, new requests are refused with HashingBusy
+    instead of piling up behind them. Both limits are host-wide slots, so
+    they hold for the sum of all gunicorn workers rather than each one.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=MAX_PENDING, rounds=BCRYPT_ROUNDS,
+                 slot_dir=HASH_SLOT_DIR):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.slot_dir = slot_dir
+        self.pending_slots = HostSlots(slot_dir, "pending", max_pending)
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.queue_wait = Timing()
+        self.execution = Timing()
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # A pool does not survive a fork; start one per process. It can grow
+        # to `workers` processes, but the running slots keep the host-wide
+        # total of busy ones at `workers`. Workers are spawned rather than
+        # forked: forking a threaded server (gthread) can copy a lock held
+        # by another request thread and hang the child.
+        if self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self._pid = os.getpid()
+            self.pending = 0
+        return self._executor
+
+    def retry_after(self):
+        """
+        Seconds until a full backlog should have drained.
+        """
+        mean = self.execution.total / self.execution.count if self.execution.count else 0.25
+        return max(1, math.ceil(self.max_pending * mean / self.workers))
+
+    def _finished(self, slot):
+        # Called once the job is really over, including after a timeout in
+        # the request, so jobs still running keep their slot.
+        self.pending_slots.release(slot)
+        with self._lock:
+            self.pending -= 1
+
+    def _run(self, function, *args):
+        slot = self.pending_slots.try_acquire()
+        with self._lock:
+            if slot is None:
+                self.rejected += 1
+                raise HashingBusy(self.retry_after())
+            executor = self._get_executor()
+            self.pending += 1
+            self.submitted += 1
+
+        submitted_at = time.time()
+        try:
+            future = executor.submit(_timed, self.slot_dir, self.workers, function, *args)
+        except Exception:
+            self._finished(slot)
+            with self._lock:
+                self.failed += 1
+            raise
+        future.add_done_callback(lambda _: self._finished(slot))
+        try:
+            result, started, finished = future.result(HASH_TIMEOUT)
+        except Exception:
+            # A queued job is dropped; one already running holds its slots until it ends
+            future.cancel()
+            with self._lock:
+                self.failed += 1
+            raise
+
+        with self._lock:
+            self.queue_wait.add(max(started - submitted_at, 0.0))
+            self.execution.add(finished - started)
+        return result
+
+    def hash(self, password):
+        """
+        Hash a password with the configured work factor.
+        :raises HashingBusy: If too many hashes are pending.
+        """
+        return self._run(_hashpw, password.encode("utf-8"), self.rounds)
+
+    def check(self, password, hashed):
+        """
+        Check a password against a stored bcrypt hash.
+        :raises HashingBusy: If too many hashes are pending.
+        """
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+        return self._run(_checkpw, password.encode("utf-8"), hashed)
+
+    def needs_rehash(self, hashed):
+        """
+        Whether a stored hash uses a different work factor than configured.
+        """
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+        return hash_rounds(hashed) != self.rounds
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "queue_wait": self.queue_wait.as_dict(),
+                "execution": self.execution.as_dict(),
+            }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,154 @@
+import json
+import mmap
+import os
+import re
+import threading
+from pathlib import Path
+
+# Configuration (environment variables):
+#   NUTRIDISH_DETAILS_PATH  recipe details JSON to serve (default:
+#                           data/Recipe_Details.json); the index sits next to it
+DETAILS_PATH = Path(os.environ.get(
+    "NUTRIDISH_DETAILS_PATH",
+    Path(__file__).resolve().parent.parent / "data" / "Recipe_Details.json"
+))
+
+# Sidecar holding title -> (byte offset, length) for every record in DETAILS_PATH
+INDEX_PATH = DETAILS_PATH.with_suffix(".idx.json")
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def normalize_title(title):
+    """
+    Normalize a recipe title into its index key (case-insensitive, trimmed).
+    """
+    return " ".join(title.split()).lower()
+
+
+def _source_stamp(json_path):
+    stat = os.stat(json_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build_index(json_path):
+    """
+    Scan the details file once and record where each record lives.
+    :param json_path: Path to a JSON file holding a top-level list of recipes.
+    :return: Dictionary mapping normalized title -> [byte offset, byte length].
+    """
+    with open(json_path, "rb") as f:
+        text = f.read().decode("utf-8-sig")
+
+    decoder = json.JSONDecoder()
+    entries = {}
+
+    pos = _SEPARATORS.match(text, 0).end()
+    if text[pos:pos + 1] != "[":
+        raise ValueError(f"{json_path} does not contain a JSON list")
+    pos += 1
+
+    # Character positions from the decoder are converted into byte offsets
+    # by encoding only the stretch of text since the previous record
+    byte_pos = len(text[:pos].encode("utf-8"))
+    char_pos = pos
+
+    while True:
+        pos = _SEPARATORS.match(text, pos).end()
+        if pos >= len(text) or text[pos] == "]":
+            break
+
+        record, end = decoder.raw_decode(text, pos)
+
+        byte_pos += len(text[char_pos:pos].encode("utf-8"))
+        length = len(text[pos:end].encode("utf-8"))
+
+        title = record.get("title") if isinstance(record, dict) else None
+        if title:
+            # First occurrence wins, as with the old linear scan
+            entries.setdefault(normalize_title(title), [byte_pos, length])
+
+        byte_pos += length
+        char_pos = end
+        pos = end
+
+    return entries
+
+
+class RecipeDetailsIndex:
+    """
+    Title index over Recipe_Details.json.
+    Records are read straight out of a memory-mapped view of the file, so a
+    lookup costs one dictionary probe plus parsing a single record.
+    """
+
+    def __init__(self, json_path, entries, stamp):
+        self.json_path = json_path
+        self.entries = entries
+        self.stamp = stamp
+        with open(json_path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stamp["size"] else b""
+
+    def lookup(self, title):
+        """
+        Fetch the record for a title.
+        :param title: The recipe title, in any case.
+        :return: The recipe dictionary, or None if the title is not indexed.
+        """
+        entry = self.entries.get(normalize_title(title))
+        if entry is None:
+            return None
+        offset, length = entry
+        return json.loads(self._data[offset:offset + length])
+
+
+def load_index(json_path=DETAILS_PATH, index_path=INDEX_PATH):
+    """
+    Load the index from its sidecar file, rebuilding (and re-saving) it when
+    the sidecar is missing or was built from a different version of the JSON.
+    """
+    stamp = _source_stamp(json_path)
+
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("source") == stamp:
+            return RecipeDetailsIndex(json_path, saved["entries"], stamp)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    entries = build_index(json_path)
+    try:
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"source": stamp, "entries": entries}, f)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        pass  # Read-only deployments just rebuild on every start
+
+    return RecipeDetailsIndex(json_path, entries, stamp)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_details_index():
+    """
+    Get the process-wide index, reloading it if Recipe_Details.json changed.
+    :return: The RecipeDetailsIndex, or None if the JSON file does not exist.
+    """
+    global _index
+    try:
+        stamp = _source_stamp(DETAILS_PATH)
+    except FileNotFoundError:
+        return None
+
+    index = _index
+    if index is not None and index.stamp == stamp:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.stamp != stamp:
+            _index = load_index()
+        return _index
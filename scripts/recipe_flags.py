@@ -0,0 +1,145 @@
+import numpy as np
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack", "dessert"]
+
+DIETARY_TAGS = [
+    "vegetarian", "vegan", "pescatarian", "paleo", "dairy_free",
+    "fat_free", "peanut_free", "soy_free", "wheat_free", "low_carb",
+    "low_cal", "low_fat", "low_sodium", "low_sugar", "low_cholesterol"
+]
+
+SEASONS = ["winter", "spring", "summer", "fall"]
+
+INGREDIENTS = [
+    'pork', 'alcohol', 'beef', 'bread', 'butter', 'cabbage', 'carrot', 'cheese',
+    'chicken', 'egg', 'eggplant', 'fish', 'onion', 'pasta', 'peanut', 'potato',
+    'rice', 'shrimp', 'tofu', 'tomato', 'zucchini'
+]
+
+MEAL_TYPE_COLUMNS = [f"is_{meal_type}" for meal_type in MEAL_TYPES]
+DIETARY_COLUMNS = [f"is_{tag}" for tag in DIETARY_TAGS]
+SEASON_COLUMNS = [f"is_{season}" for season in SEASONS]
+INGREDIENT_COLUMNS = [f"has_{ingredient}" for ingredient in INGREDIENTS]
+
+# Every boolean column of the recipes table, in bit order (45 bits -> one uint64)
+FLAG_COLUMNS = MEAL_TYPE_COLUMNS + DIETARY_COLUMNS + SEASON_COLUMNS + INGREDIENT_COLUMNS
+FLAG_BITS = {column: 1 << bit for bit, column in enumerate(FLAG_COLUMNS)}
+
+
+def resolve_flag_column(tag):
+    """
+    Map a tag to its flag column.
+    Accepts column names ("is_low_carb") as well as the friendly names used by
+    the search filters and meal plans ("low carb", "low_carb").
+    :return: The column name, or None if the tag is unknown.
+    """
+    tag = tag.strip().lower()
+    if tag in FLAG_BITS:
+        return tag
+    column = "is_" + tag.replace(" ", "_")
+    return column if column in FLAG_BITS else None
+
+
+def resolve_ingredient(name):
+    """
+    Map an ingredient name, as typed or as predicted by the image
+    classifier, to its has_* flag column ("Eggs" -> "has_egg").
+    :return: The column name, or None if recipes are not tagged with it.
+    """
+    name = name.strip().lower().replace(" ", "_")
+    candidates = [name]
+    if name.endswith("es"):
+        candidates.append(name[:-2])  # tomatoes, potatoes
+    if name.endswith("s"):
+        candidates.append(name[:-1])  # eggs, carrots
+    for candidate in candidates:
+        if f"has_{candidate}" in FLAG_BITS:
+            return f"has_{candidate}"
+    return None
+
+
+def flag_mask(columns):
+    """
+    OR together the bits of the given flag columns.
+    """
+    mask = 0
+    for column in columns:
+        mask |= FLAG_BITS[column]
+    return np.uint64(mask)
+
+
+def tags_to_masks(tags):
+    """
+    Split a {tag: value} dictionary into required and excluded bitmasks.
+    Truthy values require the flag, falsy values exclude it.
+    :return: (required_mask, excluded_mask), or None if a tag is unknown.
+    """
+    required, excluded = [], []
+    for tag, value in (tags or {}).items():
+        column = resolve_flag_column(tag)
+        if column is None:
+            return None
+        (required if value else excluded).append(column)
+    return flag_mask(required), flag_mask(excluded)
+
+
+def pack_flags(rows):
+    """
+    Pack rows of FLAG_COLUMNS values (0/1/None) into one uint64 per row.
+    """
+    values = np.array(
+        [[1 if value else 0 for value in row] for row in rows], dtype=np.uint64
+    ).reshape(-1, len(FLAG_COLUMNS))
+    shifts = np.arange(len(FLAG_COLUMNS), dtype=np.uint64)
+    return np.bitwise_or.reduce(values << shifts, axis=1) if len(values) else np.zeros(0, np.uint64)
+
+
+class RecipeFlagIndex:
+    """
+    Packed flag bits for every recipe, sorted by recipe id.
+    Any combination of required and excluded flags is answered with one
+    vectorized AND/compare over the whole catalog, whatever the tag count.
+    """
+
+    def __init__(self, recipe_ids, masks, version=None):
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.masks = np.asarray(masks, dtype=np.uint64)
+        self.version = version
+
+    def _matching(self, masks, required, excluded):
+        required = np.uint64(required)
+        excluded = np.uint64(excluded)
+        return ((masks & required) == required) & ((masks & excluded) == 0)
+
+    def select(self, required=0, excluded=0):
+        """
+        Ids of every recipe having all required flags and none of the excluded ones.
+        :param required: Bitmask (see flag_mask) of flags that must be set.
+        :param excluded: Bitmask of flags that must be clear.
+        :return: Sorted int64 array of recipe ids.
+        """
+        if not required and not excluded:
+            return self.recipe_ids
+        return self.recipe_ids[self._matching(self.masks, required, excluded)]
+
+    def matches(self, recipe_ids, required=0, excluded=0):
+        """
+        Check given recipe ids against required/excluded flags.
+        :return: Boolean array aligned with recipe_ids (False for unknown ids).
+        """
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        if not len(self.recipe_ids):
+            return np.zeros(len(recipe_ids), dtype=bool)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids)
+        positions = np.minimum(positions, len(self.recipe_ids) - 1)
+        known = self.recipe_ids[positions] == recipe_ids
+        return known & self._matching(self.masks[positions], required, excluded)
+
+
+def get_flag_index():
+    """
+    Get the flag index of the current recipe catalog (reloaded with it when
+    the recipes table changes).
+    """
+    from scripts.recipe_catalog import get_catalog
+    return get_catalog().flags
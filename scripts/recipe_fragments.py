@@ -0,0 +1,70 @@
+import threading
+from scripts.json_provider import RawJSON, dumps
+from scripts.recipe_catalog import get_catalog
+from scripts.recipe_serializer import required_columns, select_fields, serialize_recipe
+
+
+class RecipeFragments:
+    """
+    Pre-rendered JSON of catalog recipes for one catalog version, per layout
+    and view; only for layouts whose output depends on the recipe alone.
+    Each recipe is rendered the first time it is served and its encoded text
+    reused until the catalog reloads, so list responses are assembled by
+    splicing fragments instead of building and encoding dicts.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.version = catalog.version
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def _slots(self, layout, view):
+        key = (layout, view)
+        slots = self._rendered.get(key)
+        if slots is None:
+            with self._lock:
+                slots = self._rendered.setdefault(key, [None] * len(self.catalog))
+        return slots
+
+    def render(self, layout, view, recipe_ids):
+        """
+        JSON fragments for the given recipes, in the order of recipe_ids.
+        Unknown ids are skipped.
+        :return: List of RawJSON, to be encoded with scripts.json_provider.dumps.
+        """
+        slots = self._slots(layout, view)
+        specs = select_fields(layout, view)
+        columns = required_columns(specs)
+
+        fragments = []
+        for position in self.catalog.positions(recipe_ids):
+            if position < 0:
+                continue
+            fragment = slots[position]
+            if fragment is None:
+                recipe = serialize_recipe(self.catalog.row(position, columns), specs)
+                fragment = slots[position] = RawJSON(dumps(recipe))
+            fragments.append(fragment)
+        return fragments
+
+
+_fragments = None
+_fragments_lock = threading.Lock()
+
+
+def get_recipe_fragments():
+    """
+    Get the fragment store of the current catalog, starting a fresh one when
+    the catalog reloads.
+    """
+    global _fragments
+    catalog = get_catalog()
+    fragments = _fragments
+    if fragments is not None and fragments.catalog is catalog:
+        return fragments
+
+    with _fragments_lock:
+        if _fragments is None or _fragments.catalog is not catalog:
+            _fragments = RecipeFragments(catalog)
+        return _fragments
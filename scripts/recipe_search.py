@@ -1,120 +1,135 @@
+import numpy as np
 from scripts.data_storage import get_db_connection
+from scripts.search_index import ensure_search_index, build_match_query, ranked_matches_sql
+from scripts.pagination import encode_cursor, decode_cursor
+from scripts.recipe_flags import flag_mask, resolve_flag_column
+from scripts.recipe_catalog import get_catalog
+from scripts.recipe_serializer import required_columns, select_fields, serialize_recipe
+from scripts.recipe_fragments import get_recipe_fragments
 
-def search_recipes(user_input, page=1, page_size=100):
+
+def _ordered_candidates(query, required, excluded=0):
+    """
+    Resolve a search to the full, ordered list of matching recipe ids.
+    Flag filters are applied in one vectorized pass over the packed flag
+    index. With a text query the ids come from the FTS5 index ranked by BM25;
+    without one they are in table (rowid) order. Either way the ordering is
+    total, so a cursor can seek straight past the last row of the previous page.
+    :param query: The raw search string.
+    :param required: Bitmask of flags every result must have.
+    :param excluded: Bitmask of flags no result may have (dietary restrictions).
+    :return: (kind, recipe_ids, scores) where scores is None for table order.
+    """
+    index = get_catalog().flags
+    match_query = build_match_query(query)
+    if not match_query:
+        return "table", index.select(required, excluded), None
+
+    conn = get_db_connection()
+    ensure_search_index(conn)
+    db_cursor = conn.cursor()
+    db_cursor.execute(ranked_matches_sql() + " ORDER BY score, hit_id", (match_query,))
+    hits = db_cursor.fetchall()
+    conn.close()
+    recipe_ids = np.fromiter((hit[0] for hit in hits), dtype=np.int64, count=len(hits))
+    scores = np.fromiter((hit[1] for hit in hits), dtype=np.float64, count=len(hits))
+
+    keep = index.matches(recipe_ids, required, excluded)
+    return "ranked", recipe_ids[keep], scores[keep]
+
+
+def _page_of(kind, recipe_ids, scores, page, page_size, cursor=None):
+    """
+    Slice one page out of the ordered candidates.
+    :return: (page_ids, next_cursor) where next_cursor is None on the last page.
+    """
+    if cursor and kind == "ranked":
+        last_score, last_id = decode_cursor(cursor, kind, (float, int))
+        after = (scores > last_score) | ((scores == last_score) & (recipe_ids > last_id))
+        start = int(np.argmax(after)) if after.any() else len(recipe_ids)
+    elif cursor:
+        (last_id,) = decode_cursor(cursor, kind, (int,))
+        start = int(np.searchsorted(recipe_ids, last_id, side="right"))
+    else:
+        start = max(page - 1, 0) * page_size
+
+    end = start + page_size
+    page_ids = [int(recipe_id) for recipe_id in recipe_ids[start:end]]
+    if end >= len(recipe_ids) or not page_ids:
+        return page_ids, None
+
+    if kind == "ranked":
+        return page_ids, encode_cursor(kind, [float(scores[end - 1]), page_ids[-1]])
+    return page_ids, encode_cursor(kind, [page_ids[-1]])
+
+
+def _fetch_in_order(columns, recipe_ids):
+    """
+    Fetch the given recipes from the in-memory catalog, in the order of recipe_ids.
+    """
+    return get_catalog().rows(recipe_ids, columns)
+
+
+def _render_page(layout, view, fields, specs, recipe_ids):
+    """
+    Render a page of recipes. The summary and full views are spliced from
+    pre-rendered per-recipe fragments; explicit field selections are built
+    per request.
+    """
+    if fields:
+        recipes = _fetch_in_order(required_columns(specs), recipe_ids)
+        return [serialize_recipe(recipe, specs) for recipe in recipes]
+    return get_recipe_fragments().render(layout, view, recipe_ids)
+
+
+def search_recipes(user_input, page=1, page_size=100, cursor=None, view="full", fields=None, restricted=0):
     """
     Search for recipes based on a query and user-defined filters with pagination.
     :param user_input: Dictionary containing the search query and filter criteria.
-    :param page: Page number to retrieve.
+    :param page: Page number to retrieve (ignored when a cursor is given).
     :param page_size: Number of results per page.
-    :return: A list of recipes matching the search query and filters.
+    :param cursor: Cursor returned with the previous page, for keyset pagination.
+    :param view: "full" or "summary" representation of each recipe.
+    :param fields: Optional explicit list of fields to return (overrides view).
+    :param restricted: Restriction bitmask of ingredients to avoid (see scripts.dietary_restrictions).
+    :return: (recipes, next_cursor) where next_cursor is None on the last page.
+             Recipes are pre-rendered RawJSON unless fields is given.
     """
     query = user_input.get("query", "").lower()
     filters = user_input.get("filters", {})
+    specs = select_fields("search", view, fields)
 
-    filter_column_mapping = {
-        "vegetarian": "is_vegetarian",
-        "vegan": "is_vegan",
-        "pescatarian": "is_pescatarian",
-        "paleo": "is_paleo",
-        "dairy free": "is_dairy_free",
-        "fat free": "is_fat_free",
-        "peanut free": "is_peanut_free",
-        "soy free": "is_soy_free",
-        "wheat free": "is_wheat_free",
-        "low carb": "is_low_carb",
-        "low cal": "is_low_cal",
-        "low fat": "is_low_fat",
-        "low sodium": "is_low_sodium",
-        "low sugar": "is_low_sugar",
-        "low cholesterol": "is_low_cholesterol"
-    }
+    filter_columns = []
+    for tag, value in filters.items():
+        if value:
+            column_name = resolve_flag_column(tag)
+            if column_name is None:
+                return [], None  # Unknown filter: nothing can match
+            filter_columns.append(column_name)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    kind, recipe_ids, scores = _ordered_candidates(query, flag_mask(filter_columns), restricted)
+    page_ids, next_cursor = _page_of(kind, recipe_ids, scores, page, page_size, cursor)
 
-    query_conditions = []
-    params = []
+    return _render_page("search", view, fields, specs, page_ids), next_cursor
 
-    if query:
-        query_conditions.append("(title LIKE ? OR ingredients LIKE ?)")
-        params.extend([f"%{query}%", f"%{query}%"])
 
-    for tag, value in filters.items():
-        if value:
-            column_name = filter_column_mapping.get(tag, tag)
-            query_conditions.append(f"{column_name} = 1")
-
-    where_clause = " AND ".join(query_conditions) if query_conditions else "1 = 1"
-    sql_query = f"SELECT title, image, is_breakfast, is_lunch, is_dinner, is_snack, is_dessert, " \
-                f"is_vegetarian, is_vegan, is_pescatarian, is_paleo, is_dairy_free, is_fat_free, " \
-                f"is_peanut_free, is_soy_free, is_wheat_free, is_low_carb, is_low_cal, is_low_fat, " \
-                f"calories, protein, fat, sodium, ingredients, directions, rating, directions, categories, desc, date" \
-                f"is_low_sodium, is_low_sugar, is_low_cholesterol FROM recipes WHERE {where_clause} " \
-                f"LIMIT ? OFFSET ?"
-
-    # Calculate offset
-    offset = (page - 1) * page_size
-    params.extend([page_size, offset])
-
-    cursor.execute(sql_query, params)
-    recipes = cursor.fetchall()
-    conn.close()
-
-    formatted_recipes = []
-    for recipe in recipes:
-        dietary = {key: recipe[val] for key, val in {
-            "vegetarian": "is_vegetarian",
-            "vegan": "is_vegan",
-            "pescatarian": "is_pescatarian",
-            "paleo": "is_paleo",
-            "dairy free": "is_dairy_free",
-            "fat free": "is_fat_free",
-            "peanut free": "is_peanut_free",
-            "soy free": "is_soy_free",
-            "wheat free": "is_wheat_free",
-            "low carb": "is_low_carb",
-            "low cal": "is_low_cal",
-            "low fat": "is_low_fat",
-            "low sodium": "is_low_sodium",
-            "low sugar": "is_low_sugar",
-            "low cholesterol": "is_low_cholesterol"
-        }.items() if recipe[val] == 1}
-
-        formatted_recipes.append({
-            "title": recipe["title"],
-            "image": recipe["image"],  # Path image langsung dari database
-            "meal_type": {
-                "breakfast": recipe["is_breakfast"],
-                "lunch": recipe["is_lunch"],
-                "dinner": recipe["is_dinner"],
-                "snack": recipe["is_snack"],
-                "dessert": recipe["is_dessert"]
-            },
-            "dietary": dietary,
-            "calories": recipe["calories"],
-            "protein": recipe["protein"],
-            "fat": recipe["fat"],
-            "sodium": recipe["sodium"],
-            "rating": recipe["rating"],
-            "ingredients": recipe["ingredients"],
-            "directions": recipe["directions"],
-            "categories": recipe["categories"],
-            "desc": recipe["desc"],
-            "date": recipe["date"]
-        })
-
-    return formatted_recipes
-
-
-def search_recipes_by_query(query, filters=None, page=1, page_size=100):
+def search_recipes_by_query(query, filters=None, page=1, page_size=100, cursor=None, view="full", fields=None,
+                           restricted=0):
     """
     Search for recipes based on a query string and filters with pagination.
     :param query: The search query string
     :param filters: String of comma-separated filter names (e.g., "lunch,vegan")
-    :param page: Page number to retrieve
+    :param page: Page number to retrieve (ignored when a cursor is given)
     :param page_size: Number of results per page
-    :return: A list of recipes matching the search query and filters
+    :param cursor: Cursor returned with the previous page, for keyset pagination
+    :param view: "full" or "summary" representation of each recipe
+    :param fields: Optional explicit list of fields to return (overrides view)
+    :param restricted: Restriction bitmask of ingredients to avoid (see scripts.dietary_restrictions)
+    :return: (recipes, next_cursor) where next_cursor is None on the last page.
+             Recipes are pre-rendered RawJSON unless fields is given
     """
+    specs = select_fields("search_by_query", view, fields)
+
     # Define filter mapping at the start of the function
     filter_mapping = {
         "breakfast": "is_breakfast",
@@ -139,77 +154,17 @@ def search_recipes_by_query(query, filters=None, page=1, page_size=100):
         "low_cholesterol": "is_low_cholesterol"
     }
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    query_conditions = []
-    params = []
-
-    # Add search query condition
-    if query:
-        query_conditions.append("(title LIKE ? OR ingredients LIKE ?)")
-        params.extend([f"%{query}%", f"%{query}%"])
-
     # Add filter conditions
+    filter_columns = []
     if filters:
         filter_list = filters.split(',')
         for filter_name in filter_list:
             filter_name = filter_name.strip().lower()
             if filter_name in filter_mapping:
-                query_conditions.append(f"{filter_mapping[filter_name]} = 1")
-
-    # Construct WHERE clause
-    where_clause = " AND ".join(query_conditions) if query_conditions else "1=1"
-    
-    # Calculate offset for pagination
-    offset = (page - 1) * page_size
-
-    sql_query = """
-        SELECT title, image, is_breakfast, is_lunch, is_dinner, is_snack, is_dessert,
-               calories, protein, fat, sodium, ingredients, directions, rating, 
-               categories, desc, date, is_vegetarian, is_vegan, is_pescatarian, 
-               is_paleo, is_dairy_free, is_fat_free, is_peanut_free, is_soy_free, 
-               is_wheat_free, is_low_carb, is_low_cal, is_low_fat, is_low_sodium, 
-               is_low_sugar, is_low_cholesterol
-        FROM recipes 
-        WHERE {} 
-        LIMIT ? OFFSET ?
-    """.format(where_clause)
-
-    params.extend([page_size, offset])
-    cursor.execute(sql_query, params)
-    recipes = cursor.fetchall()
-    conn.close()
+                filter_columns.append(filter_mapping[filter_name])
+
+    # Resolve the ordered matches, then load only the rows on this page
+    kind, recipe_ids, scores = _ordered_candidates(query, flag_mask(filter_columns), restricted)
+    page_ids, next_cursor = _page_of(kind, recipe_ids, scores, page, page_size, cursor)
 
-    formatted_recipes = []
-    for recipe in recipes:
-        # Get all dietary flags that are True (1)
-        dietary = {}
-        for key, val in filter_mapping.items():
-            if val in recipe and recipe[val] == 1:
-                dietary[key] = True
-
-        formatted_recipes.append({
-            "title": recipe["title"],
-            "image": recipe["image"],
-            "meal_type": {
-                "breakfast": recipe["is_breakfast"],
-                "lunch": recipe["is_lunch"],
-                "dinner": recipe["is_dinner"],
-                "snack": recipe["is_snack"],
-                "dessert": recipe["is_dessert"]
-            },
-            "dietary": dietary,
-            "calories": recipe["calories"],
-            "protein": recipe["protein"],
-            "fat": recipe["fat"],
-            "sodium": recipe["sodium"],
-            "rating": recipe["rating"],
-            "ingredients": recipe["ingredients"],
-            "directions": recipe["directions"],
-            "categories": recipe["categories"],
-            "desc": recipe["desc"],
-            "date": recipe["date"]
-        })
-
-    return formatted_recipes
\ No newline at end of file
+    return _render_page("search_by_query", view, fields, specs, page_ids), next_cursor
@@ -0,0 +1,170 @@
+from scripts.recipe_flags import MEAL_TYPES, DIETARY_TAGS
+
+VIEWS = ("summary", "full")
+
+
+class InvalidFieldSelection(ValueError):
+    """Raised for an unknown view= value or unknown names in fields=."""
+
+
+class Field:
+    """
+    One output key of a recipe representation.
+    :param name: Key in the response object.
+    :param columns: Source columns the value is built from.
+    :param build: Callable(row, context) returning the value.
+    :param summary: Whether the field is part of the summary view.
+    """
+
+    def __init__(self, name, columns, build, summary=True):
+        self.name = name
+        self.columns = columns
+        self.build = build
+        self.summary = summary
+
+
+def _column(name, column=None, summary=True):
+    column = column or name
+    return Field(name, [column], lambda row, context: row[column], summary)
+
+
+def _meal_type_flags():
+    columns = [f"is_{meal_type}" for meal_type in MEAL_TYPES]
+    return Field(
+        "meal_type", columns,
+        lambda row, context: {meal_type: row[f"is_{meal_type}"] for meal_type in MEAL_TYPES}
+    )
+
+
+def _dietary(tags, key_style, value=None):
+    """
+    Map of the dietary tags set on a recipe.
+    :param tags: Tag names, in output order.
+    :param key_style: "space" ("dairy free") or "underscore" ("dairy_free").
+    :param value: Fixed value for every set tag, or None for the raw column value.
+    """
+    keys = {tag: tag.replace("_", " ") if key_style == "space" else tag for tag in tags}
+    columns = [f"is_{tag}" for tag in tags]
+
+    def build(row, context):
+        return {
+            keys[tag]: row[f"is_{tag}"] if value is None else value
+            for tag in tags if row[f"is_{tag}"] == 1
+        }
+    return Field("dietary", columns, build)
+
+
+def _nutrition():
+    columns = ["calories", "protein", "fat", "sodium"]
+    return Field("nutrition", columns, lambda row, context: {column: row[column] for column in columns})
+
+
+_TEXT_FIELDS = [
+    _column("ingredients", summary=False),
+    _column("directions", summary=False),
+    _column("categories", summary=False),
+]
+
+# Representation of a recipe per endpoint, in output key order
+LAYOUTS = {
+    # POST /recipes/
+    "search": [
+        _column("title"), _column("image"), _meal_type_flags(),
+        _dietary(DIETARY_TAGS, "space"),
+        _column("calories"), _column("protein"), _column("fat"), _column("sodium"), _column("rating"),
+        *_TEXT_FIELDS,
+        _column("desc", summary=False), _column("date", summary=False),
+    ],
+    # GET /recipes/search
+    "search_by_query": [
+        _column("title"), _column("image"), _meal_type_flags(),
+        _dietary(MEAL_TYPES + DIETARY_TAGS, "underscore", value=True),
+        _column("calories"), _column("protein"), _column("fat"), _column("sodium"), _column("rating"),
+        *_TEXT_FIELDS,
+        _column("desc", summary=False), _column("date", summary=False),
+    ],
+    # POST /daily-recommendations/
+    "recommendation": [
+        _column("title"), _column("image"),
+        Field("meal_type", [], lambda row, context: context["meal_type"]),
+        _dietary(DIETARY_TAGS, "underscore"),
+        _nutrition(), _column("rating"),
+        *_TEXT_FIELDS,
+        _column("description", "desc", summary=False), _column("date_added", "date", summary=False),
+    ],
+    # POST /recipes/pantry (context holds the recipe's pantry match)
+    "pantry": [
+        _column("title"), _column("image"), _meal_type_flags(),
+        _dietary(DIETARY_TAGS, "underscore"),
+        _nutrition(), _column("rating"),
+        Field("coverage", [], lambda row, context: context["coverage"]),
+        Field("matched_ingredients", [], lambda row, context: context["matched"]),
+        Field("missing_ingredients", [], lambda row, context: context["missing"]),
+        *_TEXT_FIELDS,
+        _column("desc", summary=False), _column("date", summary=False),
+    ],
+    # GET /meal_plan/<user_id>/ (rows come from the mealPlan table)
+    "meal_plan": [
+        _column("title", "recipeTitle"), _column("date_used", "dateUsed"), _column("image"),
+        _meal_type_flags(),
+        _column("calories"), _column("protein"), _column("fat"), _column("sodium"), _column("rating"),
+        *_TEXT_FIELDS,
+        _column("desc", summary=False), _column("date", summary=False),
+    ],
+}
+
+
+def select_fields(layout, view="full", fields=None):
+    """
+    Pick the fields of a layout to render.
+    :param layout: Key of LAYOUTS.
+    :param view: "full" (everything) or "summary" (what list screens show).
+    :param fields: Optional explicit field names; overrides view.
+    :return: List of Field.
+    :raises InvalidFieldSelection: For an unknown view or field name.
+    """
+    if view not in VIEWS:
+        raise InvalidFieldSelection(f"Unknown view '{view}', expected one of {', '.join(VIEWS)}")
+    specs = LAYOUTS[layout]
+    if fields:
+        wanted = set(fields)
+        unknown = wanted.difference(spec.name for spec in specs)
+        if unknown:
+            raise InvalidFieldSelection(
+                f"Unknown field(s) {', '.join(sorted(unknown))}, expected any of "
+                f"{', '.join(spec.name for spec in specs)}"
+            )
+        return [spec for spec in specs if spec.name in wanted]
+    if view == "summary":
+        return [spec for spec in specs if spec.summary]
+    return list(specs)
+
+
+def required_columns(specs, extra=()):
+    """
+    Source columns needed to render the given fields, without duplicates.
+    """
+    columns = list(extra)
+    for spec in specs:
+        for column in spec.columns:
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def serialize_recipe(row, specs, context=None):
+    """
+    Render one recipe row with the given fields.
+    """
+    return {spec.name: spec.build(row, context) for spec in specs}
+
+
+def field_selection_from_args(args):
+    """
+    Read ?view=summary|full and ?fields=a,b,c from request arguments.
+    :return: (view, fields) where fields is a tuple or None.
+    """
+    view = args.get("view", "full").strip().lower()
+    fields = args.get("fields", "")
+    fields = tuple(sorted({name.strip() for name in fields.split(",") if name.strip()})) or None
+    return view, fields
@@ -0,0 +1,86 @@
+import random
+import threading
+from collections import OrderedDict
+import numpy as np
+from scripts.recipe_catalog import get_catalog
+from scripts.recipe_flags import MEAL_TYPES, flag_mask
+
+# Restricted pools kept per catalog version; most users share a handful of
+# restriction masks (none, pork, alcohol, both), so this is rarely reached
+MAX_RESTRICTED_POOLS = 256
+
+
+class RecommendationPools:
+    """
+    Candidate catalog positions per meal type, computed once per catalog
+    version, and per (meal type, restriction mask) on first use: one
+    vectorized AND over the meal type's flag masks, kept in a bounded LRU.
+    """
+
+    def __init__(self, catalog, max_restricted_pools=MAX_RESTRICTED_POOLS):
+        self.catalog = catalog
+        self.version = catalog.version
+        self.max_restricted_pools = max_restricted_pools
+
+        self.pools = {
+            (meal_type, 0): np.flatnonzero((catalog.flags.masks & flag_mask([f"is_{meal_type}"])) != 0)
+            for meal_type in MEAL_TYPES
+        }
+        self._restricted = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pool(self, meal_type, excluded=0):
+        """
+        Positions of the recipes of a meal type having none of the excluded flags.
+        :param excluded: Restriction bitmask (see scripts.dietary_restrictions).
+        :return: int64 array of catalog positions, or None for an unknown meal type.
+        """
+        excluded = int(excluded)
+        unrestricted = self.pools.get((meal_type, 0))
+        if not excluded or unrestricted is None:
+            return unrestricted
+
+        key = (meal_type, excluded)
+        with self._lock:
+            pool = self._restricted.get(key)
+            if pool is not None:
+                self._restricted.move_to_end(key)
+                return pool
+
+        allowed = (self.catalog.flags.masks[unrestricted] & np.uint64(excluded)) == 0
+        pool = unrestricted[allowed]
+        with self._lock:
+            self._restricted[key] = pool
+            while len(self._restricted) > self.max_restricted_pools:
+                self._restricted.popitem(last=False)
+        return pool
+
+    def sample(self, meal_type, excluded, k):
+        """
+        Pick up to k distinct catalog positions uniformly from a pool in O(k).
+        """
+        pool = self.pool(meal_type, excluded)
+        if pool is None or not len(pool):
+            return []
+        picks = random.sample(range(len(pool)), min(k, len(pool)))
+        return [int(pool[pick]) for pick in picks]
+
+
+_pools = None
+_pools_lock = threading.Lock()
+
+
+def get_recommendation_pools():
+    """
+    Get the pools for the current catalog, rebuilding them when it reloads.
+    """
+    global _pools
+    catalog = get_catalog()
+    pools = _pools
+    if pools is not None and pools.catalog is catalog:
+        return pools
+
+    with _pools_lock:
+        if _pools is None or _pools.catalog is not catalog:
+            _pools = RecommendationPools(catalog)
+        return _pools
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# Configuration (environment variables):
+#   NUTRIDISH_CACHE_URL   redis://host:port/db to share entries between
+#                         gunicorn workers and nodes; in-process when unset.
+#                         Needs the optional redis package (pip install redis).
+#   NUTRIDISH_CACHE_SIZE  maximum entries kept by the in-process backend
+#   NUTRIDISH_CACHE_TTL   seconds an entry stays valid (0 disables caching)
+CACHE_URL = os.environ.get("NUTRIDISH_CACHE_URL", "")
+CACHE_SIZE = int(os.environ.get("NUTRIDISH_CACHE_SIZE", 2048))
+CACHE_TTL = float(os.environ.get("NUTRIDISH_CACHE_TTL", 300))
+
+# Seconds to wait for Redis before serving the request uncached
+REDIS_TIMEOUT = 0.25
+
+
+class CacheBackendError(Exception):
+    """Raised when a shared cache backend cannot be reached."""
+
+
+class MemoryBackend:
+    """
+    In-process LRU cache with per-entry expiry.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared cache in Redis, visible to every worker and node.
+    Entries expire through Redis TTLs; size is bounded by the server's
+    maxmemory with an LRU eviction policy (e.g. allkeys-lru).
+    Connection errors and timeouts are raised as CacheBackendError.
+    """
+
+    def __init__(self, url, prefix="nutridish:"):
+        import redis  # Optional dependency, only needed for the shared backend
+        self.client = redis.Redis.from_url(url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
+        self.prefix = prefix
+        self._errors = redis.RedisError
+
+    def _call(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except self._errors as e:
+            raise CacheBackendError(str(e)) from e
+
+    def get(self, key):
+        return self._call(self.client.get, self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self._call(self.client.set, self.prefix + key, value, px=max(int(ttl * 1000), 1))
+
+    def delete(self, key):
+        self._call(self.client.delete, self.prefix + key)
+
+    def clear(self):
+        def delete_all():
+            for key in self.client.scan_iter(match=self.prefix + "*"):
+                self.client.delete(key)
+        self._call(delete_all)
+
+
+def make_cache_key(namespace, params, version):
+    """
+    Build a cache key from already-normalized request parameters.
+    The data version is part of the key, so entries computed before an
+    import can never be served after it.
+    """
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+    return f"{namespace}:{version}:{digest}"
+
+
+class ResponseCache:
+    """
+    Cache of rendered JSON responses keyed by normalized request parameters
+    and data version, with hit/miss counters. When the backend is unreachable
+    responses are computed and served uncached, and counted as errors.
+    """
+
+    def __init__(self, backend, ttl=CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._versions = {}
+
+    def _expire_old_versions(self, namespace, version):
+        # Memory entries of an old version can never be hit again; drop them
+        # eagerly instead of waiting for LRU to push them out
+        if self._versions.get(namespace) != version:
+            if namespace in self._versions and isinstance(self.backend, MemoryBackend):
+                self.backend.clear()
+            self._versions[namespace] = version
+
+    def get_or_compute(self, namespace, params, version, compute):
+        """
+        Return the cached (body, status) for a request, or compute, store and
+        return it. Only 200 and 404 responses are cached.
+        :param compute: Callable returning (payload, status).
+        :return: (body bytes, status, hit)
+        """
+        if self.ttl <= 0:
+            payload, status = compute()
+            return _encode(payload), status, False
+
+        self._expire_old_versions(namespace, version)
+        key = make_cache_key(namespace, params, version)
+
+        try:
+            cached = self.backend.get(key)
+        except CacheBackendError:
+            self.errors += 1
+            payload, status = compute()
+            return _encode(payload), status, False
+        if cached is not None:
+            self.hits += 1
+            status, _, body = cached.partition(b"\n")
+            return body, int(status), True
+
+        self.misses += 1
+        payload, status = compute()
+        body = _encode(payload)
+        if status in (200, 404):
+            try:
+                self.backend.set(key, str(status).encode("ascii") + b"\n" + body, self.ttl)
+            except CacheBackendError:
+                self.errors += 1
+        return body, status, False
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+def _encode(payload):
+    return current_app.json.dumps(payload).encode("utf-8")
+
+
+def create_cache_backend(max_entries=CACHE_SIZE, prefix="nutridish:"):
+    """
+    Build the backend configured by NUTRIDISH_CACHE_URL: Redis when it is
+    set, otherwise an in-process LRU.
+    :param max_entries: Size of the in-process backend.
+    :param prefix: Key prefix in Redis, keeping caches apart.
+    """
+    if CACHE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(CACHE_URL, prefix)
+    return MemoryBackend(max_entries)
+
+
+def create_response_cache():
+    """
+    Build the response cache configured by the NUTRIDISH_CACHE_* variables.
+    """
+    return ResponseCache(create_cache_backend(CACHE_SIZE))
+
+
+response_cache = create_response_cache()
+
+
+def cached_json_response(namespace, params, version, compute):
+    """
+    Serve a JSON response through the response cache.
+    :param namespace: Name of the endpoint, kept apart in the key space.
+    :param params: Normalized request parameters identifying the response.
+    :param version: Version stamp of the data the response is built from.
+    :param compute: Callable returning (payload, status) on a miss.
+    """
+    body, status, hit = response_cache.get_or_compute(namespace, params, version, compute)
+    response = current_app.response_class(body, status=status, mimetype="application/json")
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return response
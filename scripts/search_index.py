@@ -0,0 +1,93 @@
+import re
+
+# FTS5 index over the searchable text columns of the recipes table.
+# It is an external-content table, so the text itself is only stored once
+# (in recipes) and the triggers below keep the index in sync with it.
+FTS_TABLE = "recipes_fts"
+FTS_COLUMNS = ["title", "ingredients", "categories", "desc"]
+
+# BM25 column weights, in FTS_COLUMNS order: a hit in the title matters
+# far more than one buried in the ingredient list or the description.
+BM25_WEIGHTS = (10.0, 2.0, 3.0, 1.0)
+
+_index_ready = False
+
+
+def _quoted_columns(prefix=""):
+    return ", ".join(f'{prefix}"{column}"' for column in FTS_COLUMNS)
+
+
+def ensure_search_index(conn):
+    """
+    Create the FTS5 index and its sync triggers if they do not exist yet.
+    The index is populated from the recipes table the first time it is created.
+    :param conn: An open database connection.
+    """
+    global _index_ready
+    if _index_ready:
+        return
+
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    )
+    if not cursor.fetchone():
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+                {_quoted_columns()},
+                content='recipes', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recipes BEGIN
+                INSERT INTO {FTS_TABLE} (rowid, {_quoted_columns()})
+                VALUES (new.rowid, {_quoted_columns("new.")});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recipes BEGIN
+                INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_quoted_columns()})
+                VALUES ('delete', old.rowid, {_quoted_columns("old.")});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+            AFTER UPDATE OF {_quoted_columns()} ON recipes BEGIN
+                INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_quoted_columns()})
+                VALUES ('delete', old.rowid, {_quoted_columns("old.")});
+                INSERT INTO {FTS_TABLE} (rowid, {_quoted_columns()})
+                VALUES (new.rowid, {_quoted_columns("new.")});
+            END
+        """)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+        conn.commit()
+
+    _index_ready = True
+
+
+def build_match_query(query):
+    """
+    Turn free text typed by a user into an FTS5 MATCH expression.
+    Every word becomes a quoted prefix term and all terms must match,
+    so "chick sal" finds "Chicken Salad".
+    :param query: The raw search string.
+    :return: The MATCH expression, or None if the query has no searchable words.
+    """
+    terms = re.findall(r"\w+", (query or "").lower())
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def ranked_matches_sql():
+    """
+    SQL for a subquery yielding (hit_id, score) for every recipe matching the
+    MATCH expression bound to its single parameter. Lower scores rank higher.
+    """
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    return (
+        f"SELECT rowid AS hit_id, bm25({FTS_TABLE}, {weights}) AS score "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?"
+    )
@@ -1,7 +1,96 @@
 from scripts.data_storage import get_db_connection
 import json
+import os
 from datetime import datetime
-import bcrypt  # Install dengan: pip install bcrypt
+from scripts.password_hashing import HashingBusy, password_hasher
+from scripts.response_cache import CacheBackendError, create_cache_backend
+from scripts.metrics import record_error
+
+# Configuration (environment variables):
+#   NUTRIDISH_USER_CACHE_SIZE  user profiles cached per process when
+#                              NUTRIDISH_CACHE_URL is unset; with it set,
+#                              profiles are cached in Redis and shared by
+#                              every worker, so writes are seen at once
+#   NUTRIDISH_USER_CACHE_TTL   seconds a cached profile stays valid. Without
+#                              Redis, other workers see writes within the TTL.
+USER_CACHE_SIZE = int(os.environ.get("NUTRIDISH_USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = float(os.environ.get("NUTRIDISH_USER_CACHE_TTL", 60))
+
+# Unknown ids are remembered for a shorter time
+NEGATIVE_CACHE_TTL = min(USER_CACHE_TTL, 10)
+
+# Seconds a user's cache generation is kept after a write. A read that
+# started before the write must finish within this to be recognized as stale.
+GENERATION_TTL = 24 * 3600
+
+# Every user has a profile entry and a generation entry
+user_cache = create_cache_backend(2 * USER_CACHE_SIZE, prefix="nutridish-user:")
+
+
+def normalize_user_id(user_id):
+    """
+    Canonical form of a user id, used for both the cache key and the query:
+    5, "5", " 5" and "05" all name user 5.
+    """
+    user_id = str(user_id).strip()
+    try:
+        return str(int(user_id))
+    except ValueError:
+        return user_id
+
+
+def get_user_profile(user_id):
+    """
+    Read a user's profile through the cache.
+    Each write gives the user a new generation, and an entry only counts if
+    it was read under the current one, so a read racing a write cannot put
+    the old row back. The database is read directly while the cache is down.
+    :return: Dictionary of the users columns except the password, or None
+             if there is no such user.
+    """
+    user_id = normalize_user_id(user_id)
+    generation = None
+    if USER_CACHE_TTL > 0:
+        try:
+            generation = (user_cache.get(f"{user_id}:generation") or b"").decode("ascii")
+            cached = user_cache.get(f"{user_id}:profile")
+        except CacheBackendError:
+            generation = cached = None
+        if cached is not None:
+            entry = json.loads(cached)
+            if entry["generation"] == generation:
+                return entry["user"]
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE userId = ?", (user_id,))
+    user = cursor.fetchone()
+    conn.close()
+    if user is not None:
+        user = dict(user)
+        user.pop("password", None)
+
+    if generation is not None:
+        entry = json.dumps({"generation": generation, "user": user}).encode("utf-8")
+        try:
+            user_cache.set(f"{user_id}:profile", entry, USER_CACHE_TTL if user is not None else NEGATIVE_CACHE_TTL)
+        except CacheBackendError:
+            pass
+    return user
+
+
+def invalidate_user(user_id):
+    """
+    Drop a user's cached profile (or cached absence) after a write, in every
+    worker sharing the cache.
+    """
+    user_id = normalize_user_id(user_id)
+    try:
+        user_cache.set(f"{user_id}:generation", os.urandom(8).hex().encode("ascii"), GENERATION_TTL)
+        user_cache.delete(f"{user_id}:profile")
+    except CacheBackendError:
+        pass  # Entries written before the outage can outlive it by up to the TTL
+
 
 def create_user(user_data):
     """
@@ -23,28 +112,23 @@ def create_user(user_data):
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Check if user already exists
-        cursor.execute("SELECT * FROM users WHERE userId = ?", (user_id,))
-        existing_user = cursor.fetchone()
-
-        if existing_user:
-            # Update existing user
-            cursor.execute("""
-                UPDATE users 
-                SET userName = ?, email = ?, password = ?, dateBirth = ?, age = ?, loc = ?, temp = ?, cons_pork = ?, cons_alcohol = ?
-                WHERE userId = ?
-            """, (user_name, email, password, date_birth, age, loc, temp, cons_pork, cons_alcohol, user_id))
-        else:
-            # Insert new user
-            cursor.execute("""
-                INSERT INTO users (userId, dateReg, userName, email, password, dateBirth, age, loc, temp, cons_pork, cons_alcohol)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (user_id, date_reg, user_name, email, password, date_birth, age, loc, temp, cons_pork, cons_alcohol))
+        # Insert the user, or update everything but the registration date if it exists
+        cursor.execute("""
+            INSERT INTO users (userId, dateReg, userName, email, password, dateBirth, age, loc, temp, cons_pork, cons_alcohol)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(userId) DO UPDATE SET
+                userName = excluded.userName, email = excluded.email, password = excluded.password,
+                dateBirth = excluded.dateBirth, age = excluded.age, loc = excluded.loc, temp = excluded.temp,
+                cons_pork = excluded.cons_pork, cons_alcohol = excluded.cons_alcohol
+        """, (user_id, date_reg, user_name, email, password, date_birth, age, loc, temp, cons_pork, cons_alcohol))
+        user_id = user_id if user_id is not None else cursor.lastrowid
 
         conn.commit()
         conn.close()
+        invalidate_user(user_id)
         return {"message": "User information updated successfully"}, 200
     except Exception as e:
+        record_error(e)
         return {"error": str(e)}, 500
     
 def calculate_age(dob):
@@ -66,28 +150,14 @@ def get_user(user_id):
     Retrieve user details by userId.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM users WHERE userId = ?", (user_id,))
-        user = cursor.fetchone()
-        conn.close()
-
-        if not user:
+        # The cached profile never includes the password
+        user_dict = get_user_profile(user_id)
+        if user_dict is None:
             return {"error": f"User with ID {user_id} not found"}, 404
 
-        # Convert user data to dictionary and handle bytes
-        user_dict = dict(user)
-        
-        # Convert password bytes to string if it exists
-        if 'password' in user_dict and isinstance(user_dict['password'], bytes):
-            user_dict['password'] = user_dict['password'].decode('utf-8', errors='ignore')
-            
-        # Remove password from response for security
-        user_dict.pop('password', None)
-
         return user_dict, 200
     except Exception as e:
+        record_error(e)
         return {"error": str(e)}, 500
 
     
@@ -106,16 +176,21 @@ def register_user(user_data):
         if not (email and password):
             return {"error": "Email and password are required"}, 400
 
-        hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Check if email is already registered
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+        # Check if email is already registered (before paying for the hash)
+        cursor.execute("SELECT 1 FROM users WHERE email = ?", (email,))
         if cursor.fetchone():
+            conn.close()
             return {"error": "Email is already registered"}, 409
 
+        try:
+            hashed_password = password_hasher.hash(password)
+        except HashingBusy as e:
+            conn.close()
+            return {"error": str(e), "retry_after": e.retry_after}, 503
+
         # Insert new user
         cursor.execute("""
             INSERT INTO users (dateReg, userName, email, password, dateBirth, age)
@@ -127,8 +202,10 @@ def register_user(user_data):
 
         conn.commit()
         conn.close()
+        invalidate_user(new_user_id)  # The id may have been cached as unknown
         return {"message": "User registered successfully", "userId": new_user_id}, 201
     except Exception as e:
+        record_error(e)
         return {"error": str(e)}, 500
 
 
@@ -157,9 +234,35 @@ def login_user(user_data):
         stored_password = user["password"]
 
         # Verify password
-        if not bcrypt.checkpw(password.encode("utf-8"), stored_password):
-            return {"error": "Invalid email or password"}, 401
+        try:
+            if not password_hasher.check(password, stored_password):
+                return {"error": "Invalid email or password"}, 401
+        except HashingBusy as e:
+            return {"error": str(e), "retry_after": e.retry_after}, 503
+
+        if password_hasher.needs_rehash(stored_password):
+            rehash_password(user["userId"], password)
 
         return {"message": "Login successful", "userId": user["userId"]}, 200
     except Exception as e:
-        return {"error": str(e)}, 500
\ No newline at end of file
+        record_error(e)
+        return {"error": str(e)}, 500
+
+
+def rehash_password(user_id, password):
+    """
+    Re-hash a password with the configured work factor after a successful
+    login. Skipped while the hashing pool is saturated; the next login retries.
+    :return: True if the stored hash was replaced.
+    """
+    try:
+        hashed_password = password_hasher.hash(password)
+    except HashingBusy:
+        return False
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET password = ? WHERE userId = ?", (hashed_password, user_id))
+    conn.commit()
+    conn.close()
+    return True
\ No newline at end of file
@@ -1,190 +1,169 @@
 import random
+from itertools import islice
 from scripts.data_storage import get_db_connection
-
-def get_recipes_not_in_cooldown(user_id, meal_type, selected_tags=None, cooldown_days=7):
+from scripts.recipe_flags import (
+    MEAL_TYPES, DIETARY_COLUMNS, INGREDIENTS, FLAG_COLUMNS,
+    flag_mask, get_flag_index, tags_to_masks
+)
+from scripts.recipe_catalog import get_catalog
+from scripts.dietary_restrictions import user_restriction_mask
+
+# Recipe columns copied into every mealPlan row, in insert order
+MEAL_PLAN_RECIPE_COLUMNS = (
+    ["image", "calories", "protein", "fat", "sodium"]
+    + FLAG_COLUMNS
+    + ["ingredients", "directions", "categories", "rating", "date", "desc"]
+)
+
+INSERT_MEAL_PLAN_SQL = """
+    INSERT INTO mealPlan (
+        userId, recipeTitle, mealType, dateUsed, {}
+    ) VALUES (
+        ?, ?, ?, DATE('now'), {}
+    )
+""".format(
+    ", ".join(MEAL_PLAN_RECIPE_COLUMNS),
+    ", ".join("?" for _ in MEAL_PLAN_RECIPE_COLUMNS)
+)
+
+DAYS_PER_PLAN = 7
+
+
+def get_cooldown_titles(cursor, user_id, cooldown_days=7):
     """
-    Fetch recipes that are not in cooldown and match selected tags for a specific user and meal type.
+    Fetch the recipes a user was served recently, grouped by meal type.
+    :return: Dictionary of meal type -> set of recipe titles in cooldown.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Query to exclude recipes in cooldown
     cursor.execute("""
-        SELECT * FROM recipes
-        WHERE title NOT IN (
-            SELECT recipeTitle
-            FROM mealPlan
-            WHERE userId = ? AND mealType = ? AND dateUsed > DATE('now', ?)
-        )
-        AND is_{} = 1
-    """.format(meal_type), (user_id, meal_type, f"-{cooldown_days} days"))
+        SELECT DISTINCT mealType, recipeTitle
+        FROM mealPlan
+        WHERE userId = ? AND dateUsed > DATE('now', ?)
+    """, (user_id, f"-{cooldown_days} days"))
+
+    cooldown = {}
+    for row in cursor.fetchall():
+        cooldown.setdefault(row["mealType"], set()).add(row["recipeTitle"])
+    return cooldown
 
-    recipes = cursor.fetchall()
-    conn.close()
 
-    # Convert sqlite3.Row objects to dictionaries
-    recipes = [dict(row) for row in recipes]
+def get_candidate_ids(meal_type, selected_tags=None, restricted=0):
+    """
+    Resolve a meal type plus selected tags to candidate recipe ids in one
+    vectorized pass over the packed flag index.
+    :param restricted: Restriction bitmask of ingredients to avoid (see scripts.dietary_restrictions).
+    :return: Sorted int64 array of recipe ids.
+    """
+    masks = tags_to_masks(selected_tags)
+    if masks is None:
+        return []  # Unknown tag: nothing can match
+    required, excluded = masks
+    return get_flag_index().select(required | flag_mask([f"is_{meal_type}"]), excluded | restricted)
+
+
+def fetch_recipes_by_id(recipe_ids):
+    """
+    Fetch full recipe rows by id from the in-memory catalog.
+    :return: Dictionary of recipe id -> recipe dictionary.
+    """
+    columns = ["title"] + MEAL_PLAN_RECIPE_COLUMNS
+    return {row["recipe_id"]: row for row in get_catalog().rows(recipe_ids, columns)}
 
-    # Filter recipes by selected tags if any
-    if selected_tags:
-        recipes = filter_recipes_by_tags(recipes, selected_tags)
 
-    return recipes
+def _shuffled_positions(count):
+    """
+    Yield 0..count-1 in random order, lazily: a Fisher-Yates shuffle that only
+    remembers the swapped slots, so taking k positions costs O(k).
+    """
+    swapped = {}
+    for i in range(count):
+        j = random.randrange(i, count)
+        yield swapped.get(j, j)
+        swapped[j] = swapped.get(i, i)
 
 
-def filter_recipes_by_tags(recipes, tags):
+def sample_week(candidate_ids, cooldown_titles, days=DAYS_PER_PLAN):
     """
-    Filters recipes by the selected tags.
-    :param recipes: The list of recipes (as dictionaries).
-    :param tags: The selected tags for filtering.
-    :return: A filtered list of recipes based on selected tags.
+    Pick one recipe per day, without repeats unless the pool is too small.
+    Draws distinct ids in random order and drops the ones in cooldown until
+    days allowed recipes are found or the pool runs out, which leaves a
+    uniform sample of the allowed recipes while only loading a handful of
+    rows. Titles can repeat across ids, so the number of ids in cooldown is
+    not bounded by len(cooldown_titles).
+    :return: List of recipe dictionaries, one per day (empty if nothing is allowed).
     """
-    filtered_recipes = []
-    for recipe in recipes:
-        match = True
-        for tag, value in tags.items():
-            if recipe.get(tag) != value:
-                match = False
-                break
-        if match:
-            filtered_recipes.append(recipe)
-    return filtered_recipes
-
-
-def generate_meal_plan(user_id, selected_tags=None):
+    positions = _shuffled_positions(len(candidate_ids))
+    allowed = []
+    while len(allowed) < days:
+        batch = days - len(allowed) + len(cooldown_titles)
+        drawn_ids = [int(candidate_ids[position]) for position in islice(positions, batch)]
+        if not drawn_ids:
+            break
+        recipes = fetch_recipes_by_id(drawn_ids)
+        allowed += [recipes[recipe_id] for recipe_id in drawn_ids
+                    if recipe_id in recipes and recipes[recipe_id]["title"] not in cooldown_titles]
+    if not allowed:
+        return []
+
+    picks = allowed[:days]
+    picks += [random.choice(allowed) for _ in range(days - len(picks))]
+    return picks
+
+
+def generate_meal_plan(user_id, selected_tags=None, excluded_ingredients=None):
     """
     Generate a weekly meal plan for a user, respecting cooldowns and filtering by tags.
+    Each meal type's candidate pool comes from the flag index, the user's
+    cooldown set is loaded once, and the whole week is written in a single
+    transaction.
+    :param excluded_ingredients: Ingredients to avoid on top of the user's
+                                 dietary restrictions (e.g. allergies).
     """
-    meal_types = ["breakfast", "lunch", "dinner", "snack", "dessert"]
-    meal_plan = {f"Day {day + 1}": {} for day in range(7)}  # Initialize a 7-day plan
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    for day in range(7):
-        daily_meals = {}
-        for meal_type in meal_types:
-            recipes = get_recipes_not_in_cooldown(user_id, meal_type, selected_tags)
-
-            if not recipes:
-                continue
-
-            # Select a random recipe
-            selected_recipe = random.choice(recipes)
-
-            # Insert into mealPlan table
-            cursor.execute("""
-                INSERT INTO mealPlan (
-                    userId, recipeTitle, mealType, dateUsed, image,
-                    calories, protein, fat, sodium, 
-                    is_breakfast, is_lunch, is_dinner, is_snack, is_dessert,
-                    is_vegetarian, is_vegan, is_pescatarian, is_paleo, 
-                    is_dairy_free, is_fat_free, is_peanut_free, is_soy_free, is_wheat_free,
-                    is_low_carb, is_low_cal, is_low_fat, is_low_sodium, is_low_sugar, is_low_cholesterol,
-                    is_winter, is_spring, is_summer, is_fall,
-                    has_pork, has_alcohol, has_beef, has_bread, has_butter, 
-                    has_cabbage, has_carrot, has_cheese, has_chicken, has_egg, has_eggplant, has_fish, 
-                    has_onion, has_pasta, has_peanut, has_potato, has_rice, has_shrimp, has_tofu, 
-                    has_tomato, has_zucchini, ingredients, directions, 
-                    categories, rating, date, desc
-                ) VALUES (
-                    ?, ?, ?, DATE('now'), ?,
-                    ?, ?, ?, ?, 
-                    ?, ?, ?, ?, ?, 
-                    ?, ?, ?, ?, 
-                    ?, ?, ?, ?, ?, 
-                    ?, ?, ?, ?, ?, ?, 
-                    ?, ?, ?, ?, 
-                    ?, ?, ?, ?, ?, 
-                    ?, ?, ?, ?, ?, ?, ?, 
-                    ?, ?, ?, ?, ?, ?, ?, 
-                    ?, ?, ?, ?, 
-                    ?, ?, ?, ?
+    restricted = user_restriction_mask(user_id, excluded_ingredients)
+    meal_plan = {f"Day {day + 1}": {} for day in range(DAYS_PER_PLAN)}  # Initialize a 7-day plan
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cooldown = get_cooldown_titles(cursor, user_id)
+
+        weekly_picks = {}
+        for meal_type in MEAL_TYPES:
+            picks = sample_week(
+                get_candidate_ids(meal_type, selected_tags, restricted), cooldown.get(meal_type, set())
+            )
+            if picks:
+                weekly_picks[meal_type] = picks
+
+        rows = []
+        for day in range(DAYS_PER_PLAN):
+            daily_meals = {}
+            for meal_type, picks in weekly_picks.items():
+                selected_recipe = picks[day]
+
+                rows.append(
+                    (user_id, selected_recipe["title"], meal_type)
+                    + tuple(selected_recipe[column] for column in MEAL_PLAN_RECIPE_COLUMNS)
                 )
-            """, (
-                user_id, selected_recipe["title"], meal_type, selected_recipe["image"],
-                selected_recipe["calories"],
-                selected_recipe["protein"],
-                selected_recipe["fat"],
-                selected_recipe["sodium"],
-                selected_recipe["is_breakfast"],
-                selected_recipe["is_lunch"],
-                selected_recipe["is_dinner"],
-                selected_recipe["is_snack"],
-                selected_recipe["is_dessert"],
-                selected_recipe["is_vegetarian"],
-                selected_recipe["is_vegan"],
-                selected_recipe["is_pescatarian"],
-                selected_recipe["is_paleo"],
-                selected_recipe["is_dairy_free"],
-                selected_recipe["is_fat_free"],
-                selected_recipe["is_peanut_free"],
-                selected_recipe["is_soy_free"],
-                selected_recipe["is_wheat_free"],
-                selected_recipe["is_low_carb"],
-                selected_recipe["is_low_cal"],
-                selected_recipe["is_low_fat"],
-                selected_recipe["is_low_sodium"],
-                selected_recipe["is_low_sugar"],
-                selected_recipe["is_low_cholesterol"],
-                selected_recipe["is_winter"],
-                selected_recipe["is_spring"],
-                selected_recipe["is_summer"],
-                selected_recipe["is_fall"],
-                selected_recipe["has_pork"],
-                selected_recipe["has_alcohol"],
-                selected_recipe["has_beef"],
-                selected_recipe["has_bread"],
-                selected_recipe["has_butter"],
-                selected_recipe["has_cabbage"],
-                selected_recipe["has_carrot"],
-                selected_recipe["has_cheese"],
-                selected_recipe["has_chicken"],
-                selected_recipe["has_egg"],
-                selected_recipe["has_eggplant"],
-                selected_recipe["has_fish"],
-                selected_recipe["has_onion"],
-                selected_recipe["has_pasta"],
-                selected_recipe["has_peanut"],
-                selected_recipe["has_potato"],
-                selected_recipe["has_rice"],
-                selected_recipe["has_shrimp"],
-                selected_recipe["has_tofu"],
-                selected_recipe["has_tomato"],
-                selected_recipe["has_zucchini"],
-                selected_recipe["ingredients"],
-                selected_recipe["directions"],
-                selected_recipe["categories"],
-                selected_recipe["rating"],
-                selected_recipe["date"], 
-                selected_recipe["desc"], 
-            ))
-
-            dietary = {key: selected_recipe[key] for key in [
-                "is_vegetarian", "is_vegan", "is_pescatarian", "is_paleo", 
-                "is_dairy_free", "is_fat_free", "is_peanut_free", "is_soy_free",
-                "is_wheat_free", "is_low_carb", "is_low_cal", "is_low_fat",
-                "is_low_sodium", "is_low_sugar", "is_low_cholesterol"
-            ] if selected_recipe[key] == 1}
-
-            ingredients = {ingredient: selected_recipe[f'has_{ingredient}'] for ingredient in [
-                'pork', 'alcohol', 'beef', 'bread', 'butter', 'cabbage', 'carrot', 'cheese',
-                'chicken', 'egg', 'eggplant', 'fish', 'onion', 'pasta', 'peanut', 'potato',
-                'rice', 'shrimp', 'tofu', 'tomato', 'zucchini'
-            ] if selected_recipe[f'has_{ingredient}'] == 1}
-
-            dietary = dict(list(dietary.items())[:2])
-            ingredients = dict(list(ingredients.items())[:3])
-
-            daily_meals[meal_type] = {
-                "title": selected_recipe["title"],
-                "meal_type": meal_type,
-                "dietary": dietary,
-                "ingredients": ingredients,
-            }
-
-        meal_plan[f"Day {day + 1}"] = daily_meals
-
-    conn.commit()
-    conn.close()
+
+                dietary = {key: selected_recipe[key] for key in DIETARY_COLUMNS
+                           if selected_recipe[key] == 1}
+
+                ingredients = {ingredient: selected_recipe[f'has_{ingredient}'] for ingredient in INGREDIENTS
+                               if selected_recipe[f'has_{ingredient}'] == 1}
+
+                dietary = dict(list(dietary.items())[:2])
+                ingredients = dict(list(ingredients.items())[:3])
+
+                daily_meals[meal_type] = {
+                    "title": selected_recipe["title"],
+                    "meal_type": meal_type,
+                    "dietary": dietary,
+                    "ingredients": ingredients,
+                }
+
+            meal_plan[f"Day {day + 1}"] = daily_meals
+
+        # Insert the whole week into the mealPlan table at once
+        cursor.executemany(INSERT_MEAL_PLAN_SQL, rows)
+
     return meal_plan